@@ -0,0 +1,31 @@
+import functools
+from langchain_core.tools import StructuredTool
+from app.db.sqlite_async import run_in_db_executor
+
+
+def to_async_tool(sync_tool: StructuredTool) -> StructuredTool:
+    """Tao ban sao cua tool co them coroutine chay tren thread pool DB.
+
+    Khi graph chay bat dong bo (``ainvoke``/``astream``), truy van SQLite cua tool
+    duoc day sang thread pool co gioi han thay vi chan event loop. Khi chay dong
+    bo, tool van goi ham goc nhu cu.
+    """
+    func = sync_tool.func
+
+    @functools.wraps(func)
+    async def coroutine(*args, **kwargs):
+        return await run_in_db_executor(func, *args, **kwargs)
+
+    return StructuredTool(
+        name=sync_tool.name,
+        description=sync_tool.description,
+        args_schema=sync_tool.args_schema,
+        func=func,
+        coroutine=coroutine,
+        return_direct=sync_tool.return_direct,
+        response_format=sync_tool.response_format,
+    )
+
+
+def to_async_tools(tools: list) -> list:
+    return [to_async_tool(t) for t in tools]
@@ -1,10 +1,133 @@
 import sqlite3
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from app.db.sqlite import sqlite_connection, fetch_all, fetch_one
+from app.db.sqlite_writer import WriteCommand, execute_write
+from app.db.idempotency import idempotent
+from app.db.catalog_snapshot import catalog_connection
+from app.services.airport_resolver import get_airport_resolver
+from app.services.booking_context_cache import bump_booking_version
+from app.services.route_search import get_route_graph, itinerary_row
+from app.services.seat_inventory import (
+    ensure_flight_seats,
+    format_availability,
+    free_seats,
+    release_seat,
+    reserve_seat,
+    seat_availability,
+)
+from app.services.tool_cache import cached_tool, invalidate_tool_cache
 from app.config import settings
+from app.utils.time_utils import end_epoch, from_epoch, to_epoch
 from datetime import date, datetime
-from typing import Optional
-from langchain_core.tools import tool
+from typing import Annotated, Collection, Optional
+from langchain_core.tools import InjectedToolCallId, tool
 from langchain_core.runnables import RunnableConfig
-import pytz
+
+FETCH_USER_FLIGHTS_QUERY = """
+    SELECT 
+        t.ticket_no, t.book_ref,
+        f.flight_id, f.flight_no,
+        f.status,
+        f.scheduled_departure, f.scheduled_arrival,
+        f.actual_departure, f.actual_arrival,
+        f.departure_airport, f.arrival_airport,
+        bp.seat_no,
+        tf.fare_conditions,
+        dep_airport.airport_name AS departure_airport_name,
+        dep_airport.city AS departure_city,
+        arr_airport.airport_name AS arrival_airport_name,
+        arr_airport.city AS arrival_city
+    FROM tickets t
+    JOIN ticket_flights tf ON t.ticket_no = tf.ticket_no
+    JOIN flights f ON tf.flight_id = f.flight_id
+    LEFT JOIN boarding_passes bp 
+        ON bp.ticket_no = t.ticket_no 
+        AND bp.flight_id = f.flight_id
+    LEFT JOIN airports_data dep_airport 
+        ON f.departure_airport = dep_airport.airport_code
+    LEFT JOIN airports_data arr_airport 
+        ON f.arrival_airport = arr_airport.airport_code
+    WHERE t.user_id = ?
+    ORDER BY f.scheduled_departure_epoch ASC
+"""
+
+# Cac cau lenh cua tool ghi (dung chung voi kiem tra query plan)
+FLIGHT_BY_ID_QUERY = """
+SELECT departure_airport, arrival_airport, scheduled_departure, scheduled_departure_epoch
+FROM flights WHERE flight_id = ?
+"""
+TICKET_FLIGHT_QUERY = "SELECT flight_id, fare_conditions FROM ticket_flights WHERE ticket_no = ?"
+TICKET_OWNER_QUERY = "SELECT * FROM tickets WHERE ticket_no = ? AND user_id = ?"
+UPDATE_TICKET_FLIGHT_QUERY = "UPDATE ticket_flights SET flight_id = ? WHERE ticket_no = ?"
+TICKET_BOOK_REF_QUERY = "SELECT ticket_no, book_ref FROM tickets WHERE ticket_no = ? AND user_id = ?"
+DELETE_BOARDING_PASSES_QUERY = "DELETE FROM boarding_passes WHERE ticket_no = ?"
+DELETE_TICKET_FLIGHTS_QUERY = "DELETE FROM ticket_flights WHERE ticket_no = ?"
+DELETE_TICKET_QUERY = "DELETE FROM tickets WHERE ticket_no = ?"
+COUNT_BOOKING_TICKETS_QUERY = "SELECT COUNT(*) FROM tickets WHERE book_ref = ?"
+DELETE_FLIGHT_BOOKING_QUERY = "DELETE FROM flight_bookings WHERE book_ref = ?"
+
+# Chi duoc doi sang chuyen bay khoi hanh sau it nhat 3 gio
+MIN_CHANGE_NOTICE_SECONDS = 3 * 3600
+
+# Khoang khoi hanh mac dinh cua search_flight_routes khi khong co end_time
+ROUTE_DEFAULT_WINDOW_SECONDS = 3 * 86400
+
+def _in_clause(values: Collection[str]) -> str:
+    return ", ".join("?" for _ in values)
+
+def build_search_flights_query(
+    departure_codes: Optional[Collection[str]] = None,
+    arrival_codes: Optional[Collection[str]] = None,
+    start_time: Optional[date | datetime] = None,
+    end_time: Optional[date | datetime] = None,
+    limit: int = 20,
+) -> tuple[str, list]:
+    """Dung cau truy van cho search_flights (dung chung voi kiem tra query plan).
+
+    San bay duoc truyen vao duoi dang tap ma da resolve, nen dieu kien la
+    ``IN (...)`` tren cot ma va dung duoc index cua bang flights.
+    """
+    # Query voi JOIN de lay ten san bay
+    query = """
+    SELECT
+        f.flight_id, f.flight_no,
+        f.scheduled_departure, f.scheduled_arrival,
+        f.departure_airport, f.arrival_airport,
+        f.status, f.aircraft_code,
+        dep_airport.airport_name as departure_airport_name,
+        dep_airport.city as departure_city,
+        arr_airport.airport_name as arrival_airport_name,
+        arr_airport.city as arrival_city
+    FROM flights f
+    LEFT JOIN airports_data dep_airport ON f.departure_airport = dep_airport.airport_code
+    LEFT JOIN airports_data arr_airport ON f.arrival_airport = arr_airport.airport_code
+    WHERE 1 = 1
+    """
+    params = []
+
+    if departure_codes:
+        codes = sorted(departure_codes)
+        query += f" AND f.departure_airport IN ({_in_clause(codes)})"
+        params.extend(codes)
+
+    if arrival_codes:
+        codes = sorted(arrival_codes)
+        query += f" AND f.arrival_airport IN ({_in_clause(codes)})"
+        params.extend(codes)
+
+    # So sanh tren epoch UTC; end_time la ngay thi lay het ngay do
+    if start_time:
+        query += " AND f.scheduled_departure_epoch >= ?"
+        params.append(to_epoch(start_time))
+    if end_time:
+        query += " AND f.scheduled_departure_epoch < ?"
+        params.append(end_epoch(end_time))
+    query += " LIMIT ?"
+    params.append(limit)
+
+    return query, params
 
 @tool
 def fetch_user_flight_information(config: RunnableConfig) -> list[dict]:
@@ -14,40 +137,8 @@ def fetch_user_flight_information(config: RunnableConfig) -> list[dict]:
     if not user_id:
         raise ValueError("Khong co ID hanh khach duoc cau hinh.")
 
-    conn = sqlite3.connect(settings.SQLITE_DB_PATH)
-    cursor = conn.cursor()
-
-    query = """
-        SELECT 
-            t.ticket_no, t.book_ref,
-            f.flight_id, f.flight_no,
-            f.status,
-            f.scheduled_departure, f.scheduled_arrival,
-            f.actual_departure, f.actual_arrival,
-            f.departure_airport, f.arrival_airport,
-            bp.seat_no,
-            tf.fare_conditions,
-            dep_airport.airport_name AS departure_airport_name,
-            dep_airport.city AS departure_city,
-            arr_airport.airport_name AS arrival_airport_name,
-            arr_airport.city AS arrival_city
-        FROM tickets t
-        JOIN ticket_flights tf ON t.ticket_no = tf.ticket_no
-        JOIN flights f ON tf.flight_id = f.flight_id
-        LEFT JOIN boarding_passes bp 
-            ON bp.ticket_no = t.ticket_no 
-            AND bp.flight_id = f.flight_id
-        LEFT JOIN airports_data dep_airport 
-            ON f.departure_airport = dep_airport.airport_code
-        LEFT JOIN airports_data arr_airport 
-            ON f.arrival_airport = arr_airport.airport_code
-        WHERE t.user_id = ?
-        ORDER BY f.scheduled_departure ASC
-    """
-    cursor.execute(query, (user_id,))
-    rows = cursor.fetchall()
-    column_names = [column[0] for column in cursor.description]
-    results = [dict(zip(column_names, row)) for row in rows]
+    with sqlite_connection() as conn:
+        results = fetch_all(conn, FETCH_USER_FLIGHTS_QUERY, (user_id,))
 
     # Format ket qua voi ten san bay
     for result in results:
@@ -65,11 +156,10 @@ def fetch_user_flight_information(config: RunnableConfig) -> list[dict]:
         else:
             result['arrival_display'] = result['arrival_airport']
 
-    cursor.close()
-    conn.close()
     return results
 
 @tool
+@cached_tool("flights", "airports_data", "flight_seat_inventory")
 def search_flights(
     departure_airport: Optional[str] = None,
     arrival_airport: Optional[str] = None,
@@ -77,61 +167,140 @@ def search_flights(
     end_time: Optional[date | datetime] = None,
     limit: int = 20,
 ) -> list[dict]:
-    """Tim kiem chuyen bay dua tren san bay khoi hanh, san bay den va khoang thoi gian khoi hanh."""
-    conn = sqlite3.connect(settings.SQLITE_DB_PATH)
-    cursor = conn.cursor()
+    """Tim kiem chuyen bay dua tren san bay khoi hanh, san bay den va khoang thoi gian khoi hanh.
 
-    # Query voi JOIN de lay ten san bay
-    query = """
-    SELECT 
-        f.*,
-        dep_airport.airport_name as departure_airport_name,
-        dep_airport.city as departure_city,
-        arr_airport.airport_name as arrival_airport_name,
-        arr_airport.city as arrival_city
-    FROM flights f
-    LEFT JOIN airports_data dep_airport ON f.departure_airport = dep_airport.airport_code
-    LEFT JOIN airports_data arr_airport ON f.arrival_airport = arr_airport.airport_code
-    WHERE 1 = 1
+    departure_airport/arrival_airport co the la ma san bay, ten san bay, ten thanh pho
+    hoac ten goi thong dung (vd. "Sai Gon", "Ha Noi"), co dau hoac khong dau.
+    available_seats cho biet so ghe con trong theo hang ve.
     """
-    params = []
-
-    if departure_airport:
-        # Tim kiem ca ma san bay va ten
-        query += """ AND (f.departure_airport = ? 
-                        OR UPPER(dep_airport.airport_name) LIKE UPPER(?) 
-                        OR UPPER(dep_airport.city) LIKE UPPER(?))"""
-        search_term = f"%{departure_airport}%"
-        params.extend([departure_airport.upper(), search_term, search_term])
-        
-    if arrival_airport:
-        query += """ AND (f.arrival_airport = ? 
-                        OR UPPER(arr_airport.airport_name) LIKE UPPER(?) 
-                        OR UPPER(arr_airport.city) LIKE UPPER(?))"""
-        search_term = f"%{arrival_airport}%"
-        params.extend([arrival_airport.upper(), search_term, search_term])
-        
-    if start_time:
-        query += " AND f.scheduled_departure >= ?"
-        params.append(start_time)
-    if end_time:
-        query += " AND f.scheduled_departure <= ?"
-        params.append(end_time)
-    query += " LIMIT ?"
-    params.append(limit)
+    resolver = get_airport_resolver()
+    departure_codes = resolver.resolve(departure_airport)
+    arrival_codes = resolver.resolve(arrival_airport)
+    if (departure_airport and not departure_codes) or (arrival_airport and not arrival_codes):
+        return []
 
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    column_names = [column[0] for column in cursor.description]
-    results = [dict(zip(column_names, row)) for row in rows]
+    query, params = build_search_flights_query(
+        departure_codes, arrival_codes, start_time, end_time, limit
+    )
+    with catalog_connection() as conn:
+        results = fetch_all(conn, query, params)
 
-    cursor.close()
-    conn.close()
+    # Ton kho ghe thay doi theo booking nen doc tu file goc, khong tu ban sao danh muc
+    with sqlite_connection() as conn:
+        availability = seat_availability(conn, [r["flight_id"] for r in results])
+    for result in results:
+        seats = availability.get(result["flight_id"])
+        result["available_seats"] = format_availability(seats) if seats else None
     return results
 
+@cached_tool("flights", "airports_data")
+def _search_flight_routes(
+    departure_airport: str,
+    arrival_airport: str,
+    start: int,
+    end: int,
+    max_connections: int,
+    min_layover_minutes: int,
+    limit: int,
+) -> list[dict]:
+    resolver = get_airport_resolver()
+    departure_codes = resolver.resolve(departure_airport)
+    arrival_codes = resolver.resolve(arrival_airport)
+    if not departure_codes or not arrival_codes:
+        return []
+
+    itineraries = get_route_graph().search(
+        departure_codes,
+        arrival_codes,
+        start,
+        end,
+        max_connections=max(0, min(max_connections, settings.ROUTE_MAX_CONNECTIONS)),
+        min_layover=max(0, min_layover_minutes) * 60,
+        max_layover=int(settings.ROUTE_MAX_LAYOVER_HOURS * 3600),
+        limit=max(1, min(limit, 20)),
+        max_expansions=settings.ROUTE_MAX_EXPANSIONS,
+    )
+    return [itinerary_row(legs) for legs in itineraries]
+
+@tool
+def search_flight_routes(
+    departure_airport: str,
+    arrival_airport: str,
+    start_time: Optional[date | datetime] = None,
+    end_time: Optional[date | datetime] = None,
+    max_connections: int = 1,
+    min_layover_minutes: Optional[int] = None,
+    limit: int = 5,
+) -> list[dict]:
+    """Tim hanh trinh tu departure_airport den arrival_airport, ke ca hanh trinh noi chuyen.
+
+    Dung khi khong co chuyen bay thang hoac khach chap nhan noi chuyen: mot lan goi
+    tra ve cac hanh trinh den som nhat (toi da max_connections lan noi chuyen, moi
+    lan cho it nhat min_layover_minutes phut). start_time/end_time la khoang khoi
+    hanh cua chang dau (mac dinh tu bay gio den 3 ngay sau). flight_ids cua moi
+    hanh trinh dung duoc cho update_ticket_to_new_flight.
+    """
+    # "Bay gio" lam tron len phut tiep theo: khoa cache doi theo thoi gian va
+    # ket qua cache khong bao gio chua chang da cat canh
+    start = to_epoch(start_time) if start_time else -(-int(time.time()) // 60) * 60
+    end = end_epoch(end_time) if end_time else start + ROUTE_DEFAULT_WINDOW_SECONDS
+    if min_layover_minutes is None:
+        min_layover_minutes = settings.ROUTE_MIN_LAYOVER_MINUTES
+    return _search_flight_routes(
+        departure_airport, arrival_airport, start, end, max_connections, min_layover_minutes, limit
+    )
+
+@dataclass
+class UpdateTicketFlightCommand(WriteCommand):
+    """Doi ve sang chuyen bay moi (chay tren writer SQLite)."""
+    ticket_no: str
+    new_flight_id: int
+    user_id: str
+    updated: bool = field(default=False, init=False)
+
+    name = "update_ticket_to_new_flight"
+
+    def apply(self, conn: sqlite3.Connection) -> str:
+        new_flight_dict = fetch_one(conn, FLIGHT_BY_ID_QUERY, (self.new_flight_id,))
+        if not new_flight_dict:
+            return "ID chuyen bay moi khong hop le."
+
+        # Epoch UTC da tinh san luc nap du lieu, khong can parse chuoi thoi gian
+        time_until = new_flight_dict["scheduled_departure_epoch"] - time.time()
+        if time_until < MIN_CHANGE_NOTICE_SECONDS:
+            departure_time = from_epoch(new_flight_dict["scheduled_departure_epoch"])
+            return f"Khong duoc phep doi sang chuyen bay cach thoi diem hien tai it hon 3 gio. Chuyen bay da chon khoi hanh luc {departure_time}."
+
+        current_flights = conn.execute(TICKET_FLIGHT_QUERY, (self.ticket_no,)).fetchall()
+        if not current_flights:
+            return "Khong tim thay ve hien co cho so ve da cung cap."
+
+        current_ticket = fetch_one(conn, TICKET_OWNER_QUERY, (self.ticket_no, self.user_id))
+        if not current_ticket:
+            return f"Hanh khach hien tai dang dang nhap voi ID {self.user_id} khong phai la chu so huu ve {self.ticket_no}"
+
+        # Giu ghe cung hang ve tren chuyen moi truoc, tra ghe chuyen cu sau
+        moved = [(flight_id, fare) for flight_id, fare in current_flights if flight_id != self.new_flight_id]
+        ensure_flight_seats(conn, self.new_flight_id)
+        for fare, count in Counter(fare for _, fare in moved).items():
+            free = free_seats(conn, self.new_flight_id, fare)
+            if free is None or free < count:
+                return f"Chuyen bay {self.new_flight_id} da het ghe hang {fare}. Vui long chon chuyen bay khac."
+        for flight_id, fare in moved:
+            reserve_seat(conn, self.new_flight_id, fare)
+            release_seat(conn, flight_id, fare)
+
+        conn.execute(UPDATE_TICKET_FLIGHT_QUERY, (self.new_flight_id, self.ticket_no))
+        self.updated = True
+        return "Ve da duoc cap nhat thanh cong sang chuyen bay moi."
+
 @tool
 def update_ticket_to_new_flight(
-    ticket_no: str, new_flight_id: int, *, config: RunnableConfig
+    ticket_no: str,
+    new_flight_id: int,
+    *,
+    config: RunnableConfig,
+    tool_call_id: Annotated[str, InjectedToolCallId],
 ) -> str:
     """Cap nhat ve cua nguoi dung sang chuyen bay moi hop le."""
     configuration = config.get("configurable", {})
@@ -139,142 +308,80 @@ def update_ticket_to_new_flight(
     if not user_id:
         raise ValueError("")
 
-    conn = sqlite3.connect(settings.SQLITE_DB_PATH)
-    cursor = conn.cursor()
+    command = UpdateTicketFlightCommand(ticket_no, new_flight_id, user_id)
+    message = execute_write(idempotent(command, tool_call_id))
+    if command.updated:
+        invalidate_tool_cache("ticket_flights", "flight_seat_inventory")
+        bump_booking_version(user_id)
+    return message
 
-    cursor.execute(
-        "SELECT departure_airport, arrival_airport, scheduled_departure FROM flights WHERE flight_id = ?",
-        (new_flight_id,),
-    )
-    new_flight = cursor.fetchone()
-    if not new_flight:
-        cursor.close()
-        conn.close()
-        return "ID chuyen bay moi khong hop le."
-    
-    column_names = [column[0] for column in cursor.description]
-    new_flight_dict = dict(zip(column_names, new_flight))
-    
-    # Xử lý múi giờ - kiểm tra định dạng thời gian
-    timezone = pytz.timezone("Asia/Ho_Chi_Minh")  # Đổi timezone phù hợp với Việt Nam
-    current_time = datetime.now(tz=timezone)
-    
-    try:
-        # Thử parse với định dạng ISO có timezone
-        departure_time = datetime.fromisoformat(new_flight_dict["scheduled_departure"].replace('Z', '+00:00'))
-        if departure_time.tzinfo is None:
-            departure_time = timezone.localize(departure_time)
-    except:
-        # Fallback cho định dạng khác
-        departure_time = datetime.strptime(
-            new_flight_dict["scheduled_departure"], "%Y-%m-%d %H:%M:%S.%f%z"
-        )
-    
-    time_until = (departure_time - current_time).total_seconds()
-    if time_until < (3 * 3600):
-        return f"Khong duoc phep doi sang chuyen bay cach thoi diem hien tai it hon 3 gio. Chuyen bay da chon khoi hanh luc {departure_time}."
-
-    cursor.execute(
-        "SELECT flight_id FROM ticket_flights WHERE ticket_no = ?", (ticket_no,)
-    )
-    current_flight = cursor.fetchone()
-    if not current_flight:
-        cursor.close()
-        conn.close()
-        return "Khong tim thay ve hien co cho so ve da cung cap."
-
-    cursor.execute(
-        "SELECT * FROM tickets WHERE ticket_no = ? AND user_id = ?",
-        (ticket_no, user_id),
-    )
-    current_ticket = cursor.fetchone()
-    if not current_ticket:
-        cursor.close()
-        conn.close()
-        return f"Hanh khach hien tai dang dang nhap voi ID {user_id} khong phai la chu so huu ve {ticket_no}"
-
-    cursor.execute(
-        "UPDATE ticket_flights SET flight_id = ? WHERE ticket_no = ?",
-        (new_flight_id, ticket_no),
-    )
-    conn.commit()
+@dataclass
+class CancelTicketCommand(WriteCommand):
+    """Huy ticket va booking rong (chay tren writer SQLite)."""
+    ticket_no: str
+    user_id: str
 
-    cursor.close()
-    conn.close()
-    return "Ve da duoc cap nhat thanh cong sang chuyen bay moi."
+    name = "cancel_ticket"
 
-@tool
-def cancel_ticket(ticket_no: str, *, config: RunnableConfig) -> str:
-    """Huy ticket cua nguoi dung. Neu book_ref khong con ticket nao thi xoa ca booking."""
-    configuration = config.get("configurable", {})
-    user_id = configuration.get("user_id", None)
-    if not user_id:
-        raise ValueError("Khong co ID hanh khach duoc cau hinh.")
-
-    conn = sqlite3.connect(settings.SQLITE_DB_PATH)
-    cursor = conn.cursor()
-
-    try:
+    def apply(self, conn: sqlite3.Connection) -> tuple[str, int]:
+        """Tra ve (book_ref, so ticket con lai cua booking)."""
         # Lấy book_ref và kiểm tra quyền sở hữu ticket
-        cursor.execute(
-            """
-            SELECT ticket_no, book_ref
-            FROM tickets
-            WHERE ticket_no = ? AND user_id = ?
-            """,
-            (ticket_no, user_id),
-        )
-        row = cursor.fetchone()
+        row = conn.execute(TICKET_BOOK_REF_QUERY, (self.ticket_no, self.user_id)).fetchone()
         if not row:
             raise ValueError(
-                f"Ticket {ticket_no} khong ton tai hoac khong thuoc ve hanh khach {user_id}."
+                f"Ticket {self.ticket_no} khong ton tai hoac khong thuoc ve hanh khach {self.user_id}."
             )
 
         book_ref = row[1]
 
+        # Tra ghe cua ticket ve ton kho cua tung chuyen bay
+        for flight_id, fare in conn.execute(TICKET_FLIGHT_QUERY, (self.ticket_no,)).fetchall():
+            release_seat(conn, flight_id, fare)
+
         # Xoá boarding passes (neu co)
-        cursor.execute(
-            "DELETE FROM boarding_passes WHERE ticket_no = ?",
-            (ticket_no,),
-        )
+        conn.execute(DELETE_BOARDING_PASSES_QUERY, (self.ticket_no,))
 
         # Xoá ticket_flights
-        cursor.execute(
-            "DELETE FROM ticket_flights WHERE ticket_no = ?",
-            (ticket_no,),
-        )
+        conn.execute(DELETE_TICKET_FLIGHTS_QUERY, (self.ticket_no,))
 
         # Xoá ticket
-        cursor.execute(
-            "DELETE FROM tickets WHERE ticket_no = ?",
-            (ticket_no,),
-        )
+        conn.execute(DELETE_TICKET_QUERY, (self.ticket_no,))
 
         # Kiểm tra xem book_ref còn ticket nào không
-        cursor.execute(
-            "SELECT COUNT(*) FROM tickets WHERE book_ref = ?",
-            (book_ref,),
-        )
-        remaining_tickets = cursor.fetchone()[0]
+        remaining_tickets = conn.execute(COUNT_BOOKING_TICKETS_QUERY, (book_ref,)).fetchone()[0]
 
         # Nếu không còn ticket → xoá booking
         if remaining_tickets == 0:
-            cursor.execute(
-                "DELETE FROM flight_bookings WHERE book_ref = ?",
-                (book_ref,),
-            )
+            conn.execute(DELETE_FLIGHT_BOOKING_QUERY, (book_ref,))
 
-        conn.commit()
-        return (
-            f"Da huy thanh cong ticket {ticket_no}. "
-            + (
-                f"Booking {book_ref} cung da duoc huy vi khong con ticket nao."
-                if remaining_tickets == 0
-                else f"Booking {book_ref} van con cac ticket khac."
-            ))
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        cursor.close()
-        conn.close()
+        return book_ref, remaining_tickets
+
+@tool
+def cancel_ticket(
+    ticket_no: str,
+    *,
+    config: RunnableConfig,
+    tool_call_id: Annotated[str, InjectedToolCallId],
+) -> str:
+    """Huy ticket cua nguoi dung. Neu book_ref khong con ticket nao thi xoa ca booking."""
+    configuration = config.get("configurable", {})
+    user_id = configuration.get("user_id", None)
+    if not user_id:
+        raise ValueError("Khong co ID hanh khach duoc cau hinh.")
+
+    # Writer rollback rieng lenh nay neu co exception; call lap lai tra ket qua cu
+    book_ref, remaining_tickets = execute_write(
+        idempotent(CancelTicketCommand(ticket_no, user_id), tool_call_id)
+    )
+
+    invalidate_tool_cache(
+        "tickets", "ticket_flights", "boarding_passes", "flight_bookings", "flight_seat_inventory"
+    )
+    bump_booking_version(user_id)
+    return (
+        f"Da huy thanh cong ticket {ticket_no}. "
+        + (
+            f"Booking {book_ref} cung da duoc huy vi khong con ticket nao."
+            if remaining_tickets == 0
+            else f"Booking {book_ref} van con cac ticket khac."
+        ))
@@ -4,7 +4,7 @@ from typing_extensions import TypedDict
 from langchain_core.messages import ToolMessage
 from langchain_core.runnables import RunnableLambda, Runnable, RunnableConfig
 from langchain_core.prompts import ChatPromptTemplate
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt import tools_condition
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import AnyMessage, add_messages
 from langgraph.checkpoint.redis import RedisSaver
@@ -18,6 +18,7 @@ from langgraph.store.redis import RedisStore
 from app.agents.flight_agent_tools import (
     fetch_user_flight_information,
     search_flights,
+    search_flight_routes,
     update_ticket_to_new_flight,
     cancel_ticket
 )
@@ -33,6 +34,11 @@ from app.agents.primary_tools import (
     lookup_policy,
     get_all_user_bookings
 )
+from app.agents.async_tools import to_async_tools
+from app.agents.result_shaping import shape_and_measure, shape_tools
+from app.agents.tool_node import ConcurrentToolNode
+from app.db.sqlite_async import run_in_db_executor
+from app.services.booking_context_cache import get_booking_context
 
 # STATE MANAGEMENT
 def update_dialog_stack(left: list[str], right: Optional[str]) -> list[str]:
@@ -87,6 +93,8 @@ flight_booking_prompt = ChatPromptTemplate.from_messages([
         "Nếu khách hàng hỏi/yêu cầu đặt vé mới, hãy bảo họ truy cập: https://lat-airlines.com/book-flights "
         
         "Khi tìm kiếm, hãy kiên trì. Mở rộng phạm vi truy vấn nếu tìm kiếm đầu tiên không trả về kết quả. "
+        "Nếu không có chuyến bay thẳng, hãy gọi search_flight_routes MỘT lần để lấy các hành trình nối chuyến "
+        "thay vì gọi search_flights lặp lại cho từng sân bay trung chuyển. "
         "Xác nhận chi tiết chuyến bay đã cập nhật với khách hàng và thông báo về bất kỳ phí bổ sung nào. "
         "Nếu bạn cần thêm thông tin hoặc khách hàng thay đổi ý định, hãy chuyển nhiệm vụ trở lại trợ lý chính. "
         "Hãy nhớ rằng việc đặt vé không hoàn thành cho đến khi công cụ liên quan đã được sử dụng thành công."
@@ -108,10 +116,12 @@ hotel_booking_prompt = ChatPromptTemplate.from_messages([
         "- Hiển thị các loại phòng của khách sạn\n"
         "- Tạo, xem và hủy đặt phòng khách sạn\n\n"
 
-        "GIỚI HẠN HỆ THỐNG (RẤT QUAN TRỌNG):\n"
-        "- Hệ thống KHÔNG theo dõi số phòng trống theo ngày\n"
-        "- KHÔNG hiển thị số lượng phòng còn lại\n"
-        "- KHÔNG suy đoán tình trạng thực tế của khách sạn\n\n"
+        "KIỂM TRA PHÒNG TRỐNG (RẤT QUAN TRỌNG):\n"
+        "- Hệ thống theo dõi số phòng đã đặt theo từng đêm cho mỗi loại phòng\n"
+        "- Khi đã có ngày nhận/trả phòng, LUÔN truyền checkin_date và checkout_date vào "
+        "search_hotels và list_hotel_room_types để chỉ nhận các lựa chọn còn phòng\n"
+        "- Nếu công cụ đặt phòng báo hết phòng, đề xuất loại phòng hoặc ngày khác\n"
+        "- KHÔNG hiển thị số lượng phòng còn lại\n\n"
 
         "HIỂN THỊ TÌNH TRẠNG ĐẶT PHÒNG:\n"
         "- Chỉ hiển thị ở mức logic: 'Có thể đặt' hoặc 'Không thể đặt'\n"
@@ -188,8 +198,11 @@ def handle_tool_error(state) -> dict:
         ]
     }
 
-def create_tool_node_with_fallback(tools: list) -> dict:
-    return ToolNode(tools).with_fallbacks(
+def create_tool_node_with_fallback(tools: list, use_deadline: bool = True) -> dict:
+    # Cac tool call trong cung mot luot chay song song, moi call co timeout/loi rieng
+    # (tru node tool ghi: khong cat ngang thao tac dat/huy dang chay)
+    node = ConcurrentToolNode(tools, use_deadline=use_deadline)
+    return RunnableLambda(node, afunc=node.acall).with_fallbacks(
         [RunnableLambda(handle_tool_error)], exception_key="error"
     )
 
@@ -216,20 +229,18 @@ def build_initialized_graph(checkpointer: RedisSaver, redis_store: RedisStore):
     # Get LLMs
     llm = get_openai_llm_model()
 
-    # Tool groups
-    flight_safe_tools = [search_flights]
-    flight_sensitive_tools = [update_ticket_to_new_flight, cancel_ticket]
+    # Tool groups (tool SQLite co ban async chay tren thread pool DB, ket qua da rut gon)
+    flight_safe_tools = to_async_tools(shape_tools([search_flights, search_flight_routes]))
+    flight_sensitive_tools = to_async_tools([update_ticket_to_new_flight, cancel_ticket])
     flight_tools = flight_safe_tools + flight_sensitive_tools
 
-    hotel_safe_tools = [search_hotels, get_hotel_details, list_hotel_room_types, get_user_hotel_bookings]
-    hotel_sensitive_tools = [create_hotel_booking, cancel_hotel_booking]
+    hotel_safe_tools = to_async_tools(shape_tools([search_hotels, get_hotel_details, list_hotel_room_types, get_user_hotel_bookings]))
+    hotel_sensitive_tools = to_async_tools([create_hotel_booking, cancel_hotel_booking])
     hotel_tools = hotel_safe_tools + hotel_sensitive_tools
 
     primary_assistant_tools = [
         lookup_policy,
-        get_all_user_bookings,
-        search_flights,
-        search_hotels
+        *to_async_tools(shape_tools([get_all_user_bookings, search_flights, search_hotels])),
     ]
 
     flight_agent_runable = flight_booking_prompt | llm.bind_tools(
@@ -264,10 +275,18 @@ def build_initialized_graph(checkpointer: RedisSaver, redis_store: RedisStore):
 
     builder = StateGraph(State)
 
-    def user_info(state: State):
-        return {"user_info": fetch_user_flight_information.invoke({})}
+    def user_info(state: State, config: RunnableConfig):
+        # Chi chay lai join 6 bang khi booking cua nguoi dung da thay doi
+        user_id = config.get("configurable", {}).get("user_id")
+        flights = get_booking_context(
+            user_id, lambda: fetch_user_flight_information.invoke({}, config)
+        )
+        return {"user_info": shape_and_measure("fetch_user_flight_information", flights)}
+
+    async def auser_info(state: State, config: RunnableConfig):
+        return await run_in_db_executor(user_info, state, config)
     
-    builder.add_node("fetch_user_flight_info", user_info)
+    builder.add_node("fetch_user_flight_info", RunnableLambda(user_info, afunc=auser_info))
     builder.add_edge(START, "fetch_user_flight_info")
 
     ## Primary Assistant
@@ -313,7 +332,7 @@ def build_initialized_graph(checkpointer: RedisSaver, redis_store: RedisStore):
     builder.add_node("enter_flight_agent", create_entry_node("Trợ lý tư vấn/hỗ trợ chuyến bay khách hàng hãng hàng không","flight_agent"))
     builder.add_node("flight_agent", Assistant(flight_agent_runable))
     builder.add_edge("enter_flight_agent", "flight_agent")
-    builder.add_node("flight_sensitive_tools", create_tool_node_with_fallback(flight_sensitive_tools))
+    builder.add_node("flight_sensitive_tools", create_tool_node_with_fallback(flight_sensitive_tools, use_deadline=False))
     builder.add_node("flight_safe_tools", create_tool_node_with_fallback(flight_safe_tools))
 
     def route_flight_agent(state: State):
@@ -337,7 +356,7 @@ def build_initialized_graph(checkpointer: RedisSaver, redis_store: RedisStore):
     builder.add_node("enter_hotel_agent", create_entry_node("Trợ lý tư vấn/hỗ trợ các tác vụ liên quan đến khách sạn", "hotel_agent"))
     builder.add_node("hotel_agent", Assistant(hotel_agent_runable))
     builder.add_edge("enter_hotel_agent", "hotel_agent")
-    builder.add_node("hotel_sensitive_tools", create_tool_node_with_fallback(hotel_sensitive_tools))
+    builder.add_node("hotel_sensitive_tools", create_tool_node_with_fallback(hotel_sensitive_tools, use_deadline=False))
     builder.add_node("hotel_safe_tools", create_tool_node_with_fallback(hotel_safe_tools))
 
     def rou_hotel_agent(state: State):
@@ -1,22 +1,140 @@
+import re
 import sqlite3
-from app.config import settings
+from dataclasses import dataclass
+from app.db.sqlite import sqlite_connection, fetch_all, fetch_one
+from app.db.sqlite_writer import WriteCommand, execute_write
+from app.db.idempotency import idempotent
+from app.db.catalog_snapshot import catalog_connection
+from app.services.booking_context_cache import bump_booking_version
+from app.services.hotel_inventory import (
+    AVAILABLE_ROOM_TYPES_QUERY,
+    ROOM_TYPE_AVAILABLE_SQL,
+    availability_params,
+    release_rooms,
+    reserve_rooms,
+)
+from app.services.tool_cache import cached_tool, invalidate_tool_cache
+from app.utils.text_normalize import normalize_text
 from datetime import date, datetime
-from typing import Optional
-from langchain_core.tools import tool
+from typing import Annotated, Optional
+from langchain_core.tools import InjectedToolCallId, tool
 from langchain_core.runnables import RunnableConfig
 import pytz
 
-@tool
-def search_hotels(
+HOTEL_DETAILS_QUERY = """
+SELECT
+    h.hotel_id,
+    h.hotel_name,
+    h.address,
+    h.star_rating,
+    h.airport_code,
+    a.airport_name,
+    a.city
+FROM hotels_vietnam h
+LEFT JOIN airports_data a
+    ON h.airport_code = a.airport_code
+WHERE h.hotel_id = ?
+"""
+
+HOTEL_ROOM_TYPES_QUERY = """
+SELECT
+    room_type_id,
+    room_name,
+    base_price,
+    max_guests,
+    total_rooms
+FROM hotel_room_types
+WHERE hotel_id = ?
+ORDER BY base_price ASC
+"""
+
+USER_HOTEL_BOOKINGS_QUERY = """
+SELECT
+    hb.booking_id,
+    h.hotel_name,
+    rt.room_name,
+    hb.checkin_date,
+    hb.checkout_date,
+    hb.total_price
+FROM hotel_bookings hb
+JOIN hotel_room_types rt
+    ON hb.room_type_id = rt.room_type_id
+JOIN hotels_vietnam h
+    ON rt.hotel_id = h.hotel_id
+WHERE hb.user_id = ?
+ORDER BY hb.checkin_date DESC
+"""
+
+ROOM_PRICE_QUERY = "SELECT base_price FROM hotel_room_types WHERE room_type_id = ?"
+
+INSERT_HOTEL_BOOKING_QUERY = """
+INSERT INTO hotel_bookings (
+    user_id,
+    room_type_id,
+    booking_date,
+    checkin_date,
+    checkout_date,
+    total_price
+)
+VALUES (?, ?, CURRENT_TIMESTAMP, ?, ?, ?)
+"""
+
+DELETE_HOTEL_BOOKING_QUERY = "DELETE FROM hotel_bookings WHERE booking_id = ?"
+
+HOTEL_BOOKING_STAY_QUERY = "SELECT room_type_id, checkin_date, checkout_date FROM hotel_bookings WHERE booking_id = ?"
+
+HOTEL_DETAILS_BY_TEXT_QUERY = """
+SELECT
+    h.hotel_id,
+    h.hotel_name,
+    h.address,
+    h.star_rating,
+    h.airport_code,
+    a.airport_name,
+    a.city
+FROM hotels_fts
+JOIN hotels_vietnam h
+    ON h.hotel_id = hotels_fts.rowid
+LEFT JOIN airports_data a
+    ON h.airport_code = a.airport_code
+WHERE hotels_fts MATCH ?
+ORDER BY bm25(hotels_fts, 10.0, 2.0, 5.0)
+LIMIT 1
+"""
+
+def fts_match_expression(text: str | None, columns: list[str] | None = None) -> str | None:
+    """Chuyen chuoi tu do thanh bieu thuc MATCH cua FTS5 (khong dau, khop tien to)."""
+    if not text:
+        return None
+    tokens = re.findall(r"\w+", normalize_text(text))
+    if not tokens:
+        return None
+    expr = " ".join(f'"{token}"*' for token in tokens)
+    if columns:
+        return f"{{{' '.join(columns)}}} : ({expr})"
+    return expr
+
+def build_search_hotels_query(
     airport_code: str | None = None,
     city: str | None = None,
     min_star: int | None = None,
     max_star: int | None = None,
     limit: int = 20,
-) -> list[dict]:
-    """Tim kiem khach san theo san bay, thanh pho va hang sao."""
-    conn = sqlite3.connect(settings.SQLITE_DB_PATH)
-    cursor = conn.cursor()
+    keyword: str | None = None,
+    checkin_date: date | None = None,
+    checkout_date: date | None = None,
+) -> tuple[str, list]:
+    """Dung cau truy van cho search_hotels (dung chung voi kiem tra query plan).
+
+    city va keyword duoc tim qua bang FTS5 hotels_fts va xep hang theo bm25.
+    Neu co checkin/checkout thi chi giu khach san con it nhat mot loai phong trong.
+    """
+    match_parts = [
+        part for part in (
+            fts_match_expression(city, ["city"]),
+            fts_match_expression(keyword),
+        ) if part
+    ]
 
     query = """
     SELECT
@@ -27,21 +145,31 @@ def search_hotels(
         a.city,
         h.address,
         h.star_rating
+    """
+    params = []
+
+    if match_parts:
+        query += """
+    FROM hotels_fts
+    JOIN hotels_vietnam h
+        ON h.hotel_id = hotels_fts.rowid
+    LEFT JOIN airports_data a
+        ON h.airport_code = a.airport_code
+    WHERE hotels_fts MATCH ?
+    """
+        params.append(" AND ".join(f"({part})" for part in match_parts))
+    else:
+        query += """
     FROM hotels_vietnam h
     LEFT JOIN airports_data a
         ON h.airport_code = a.airport_code
     WHERE 1 = 1
     """
-    params = []
 
     if airport_code:
         query += " AND h.airport_code = ?"
         params.append(airport_code.upper())
 
-    if city:
-        query += " AND UPPER(a.city) LIKE UPPER(?)"
-        params.append(f"%{city}%")
-
     if min_star:
         query += " AND h.star_rating >= ?"
         params.append(min_star)
@@ -50,75 +178,121 @@ def search_hotels(
         query += " AND h.star_rating <= ?"
         params.append(max_star)
 
-    query += " ORDER BY h.star_rating DESC LIMIT ?"
+    if checkin_date and checkout_date:
+        query += f"""
+    AND EXISTS (
+        SELECT 1 FROM hotel_room_types rt
+        WHERE rt.hotel_id = h.hotel_id AND {ROOM_TYPE_AVAILABLE_SQL}
+    )
+    """
+        params.extend(availability_params(checkin_date, checkout_date))
+
+    if match_parts:
+        query += " ORDER BY bm25(hotels_fts, 10.0, 2.0, 5.0), h.star_rating DESC LIMIT ?"
+    else:
+        query += " ORDER BY h.star_rating DESC LIMIT ?"
     params.append(min(limit, 50))
 
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    cols = [c[0] for c in cursor.description]
-    results = [dict(zip(cols, row)) for row in rows]
+    return query, params
 
-    cursor.close()
-    conn.close()
-    return results
+def _check_stay(checkin_date: date | None, checkout_date: date | None) -> bool:
+    """True neu can loc theo phong trong (co du ca hai ngay)."""
+    if (checkin_date is None) != (checkout_date is None):
+        raise ValueError("Can cung cap ca checkin_date va checkout_date de kiem tra phong trong.")
+    if checkin_date is not None and checkout_date <= checkin_date:
+        raise ValueError("Ngay checkout phai sau ngay checkin.")
+    return checkin_date is not None
 
 @tool
-def get_hotel_details(hotel_id: int) -> dict | None:
-    """Lay thong tin chi tiet khach san."""
-    conn = sqlite3.connect(settings.SQLITE_DB_PATH)
-    cursor = conn.cursor()
+@cached_tool("hotels_vietnam", "airports_data", "hotel_room_inventory")
+def search_hotels(
+    airport_code: str | None = None,
+    city: str | None = None,
+    min_star: int | None = None,
+    max_star: int | None = None,
+    limit: int = 20,
+    keyword: str | None = None,
+    checkin_date: date | None = None,
+    checkout_date: date | None = None,
+) -> list[dict]:
+    """Tim kiem khach san theo san bay, thanh pho va hang sao.
 
-    query = """
-    SELECT
-        h.hotel_id,
-        h.hotel_name,
-        h.address,
-        h.star_rating,
-        h.airport_code,
-        a.airport_name,
-        a.city
-    FROM hotels_vietnam h
-    LEFT JOIN airports_data a
-        ON h.airport_code = a.airport_code
-    WHERE h.hotel_id = ?
+    keyword la tu khoa tu do (ten khach san, dia chi, thanh pho), co dau hoac khong dau;
+    ket qua duoc xep theo muc do lien quan. Truyen checkin_date va checkout_date de chi
+    lay khach san con phong trong cho ca ky luu tru.
     """
-    cursor.execute(query, (hotel_id,))
-    row = cursor.fetchone()
-
-    cursor.close()
-    conn.close()
-
-    if not row:
-        return None
+    with_availability = _check_stay(checkin_date, checkout_date)
+    query, params = build_search_hotels_query(
+        airport_code, city, min_star, max_star, limit, keyword, checkin_date, checkout_date
+    )
+    # Ton kho phong thay doi theo booking nen luon doc tu database goc
+    connection = sqlite_connection if with_availability else catalog_connection
+    with connection() as conn:
+        return fetch_all(conn, query, params)
 
-    cols = [c[0] for c in cursor.description]
-    return dict(zip(cols, row))
+@tool
+@cached_tool("hotels_vietnam", "airports_data")
+def get_hotel_details(hotel_id: int | None = None, hotel_name: str | None = None) -> dict | None:
+    """Lay thong tin chi tiet khach san theo hotel_id, hoac theo ten (khach san khop nhat)."""
+    if hotel_id is not None:
+        with catalog_connection() as conn:
+            return fetch_one(conn, HOTEL_DETAILS_QUERY, (hotel_id,))
+
+    match = fts_match_expression(hotel_name)
+    if not match:
+        raise ValueError("Can cung cap hotel_id hoac hotel_name.")
+    with catalog_connection() as conn:
+        return fetch_one(conn, HOTEL_DETAILS_BY_TEXT_QUERY, (match,))
 
 @tool
-def list_hotel_room_types(hotel_id: int) -> list[dict]:
-    """Danh sach loai phong cua khach san."""
-    conn = sqlite3.connect(settings.SQLITE_DB_PATH)
-    cursor = conn.cursor()
+@cached_tool("hotel_room_types", "hotel_room_inventory")
+def list_hotel_room_types(
+    hotel_id: int,
+    checkin_date: date | None = None,
+    checkout_date: date | None = None,
+) -> list[dict]:
+    """Danh sach loai phong cua khach san.
 
-    query = """
-    SELECT
-        room_type_id,
-        room_name,
-        base_price,
-        max_guests,
-        total_rooms
-    FROM hotel_room_types
-    WHERE hotel_id = ?
-    ORDER BY base_price ASC
+    Truyen checkin_date va checkout_date de chi lay cac loai phong con trong moi dem.
     """
-    cursor.execute(query, (hotel_id,))
-    rows = cursor.fetchall()
-    cols = [c[0] for c in cursor.description]
-    results = [dict(zip(cols, row)) for row in rows]
-
-    cursor.close()
-    conn.close()
-    return results
+    if _check_stay(checkin_date, checkout_date):
+        with sqlite_connection() as conn:
+            return fetch_all(
+                conn,
+                AVAILABLE_ROOM_TYPES_QUERY,
+                (hotel_id, *availability_params(checkin_date, checkout_date)),
+            )
+    with catalog_connection() as conn:
+        return fetch_all(conn, HOTEL_ROOM_TYPES_QUERY, (hotel_id,))
+
+@dataclass
+class CreateHotelBookingCommand(WriteCommand):
+    """Tru ton kho va tao booking khach san (chay tren writer SQLite)."""
+    user_id: str
+    room_type_id: int
+    checkin_date: date
+    checkout_date: date
+
+    name = "create_hotel_booking"
+
+    def apply(self, conn: sqlite3.Connection) -> tuple[int, float]:
+        """Tra ve (booking_id, total_price)."""
+        # Lay gia phong
+        row = conn.execute(ROOM_PRICE_QUERY, (self.room_type_id,)).fetchone()
+        if not row:
+            raise ValueError("Loai phong khong ton tai.")
+
+        base_price = row[0]
+        nights = (self.checkout_date - self.checkin_date).days
+        total_price = base_price * nights
+
+        # Writer giu khoa ghi (BEGIN IMMEDIATE) tu luc kiem tra ton kho den khi commit
+        reserve_rooms(conn, self.room_type_id, self.checkin_date, self.checkout_date)
+        cursor = conn.execute(
+            INSERT_HOTEL_BOOKING_QUERY,
+            (self.user_id, self.room_type_id, self.checkin_date, self.checkout_date, total_price)
+        )
+        return cursor.lastrowid, total_price
 
 @tool
 def create_hotel_booking(
@@ -126,6 +300,7 @@ def create_hotel_booking(
     checkin_date: date,
     checkout_date: date,
     config: RunnableConfig,
+    tool_call_id: Annotated[str, InjectedToolCallId],
 ) -> dict:
     """Dat phong khach san cho nguoi dung."""
     if checkout_date <= checkin_date:
@@ -136,42 +311,16 @@ def create_hotel_booking(
     if not user_id:
         raise ValueError("Khong co ID nguoi dung duoc cau hinh.")
 
-    conn = sqlite3.connect(settings.SQLITE_DB_PATH)
-    cursor = conn.cursor()
-
-    # Lay gia phong
-    cursor.execute(
-        "SELECT base_price FROM hotel_room_types WHERE room_type_id = ?",
-        (room_type_id,)
-    )
-    row = cursor.fetchone()
-    if not row:
-        raise ValueError("Loai phong khong ton tai.")
-
-    base_price = row[0]
-    nights = (checkout_date - checkin_date).days
-    total_price = base_price * nights
-
-    cursor.execute(
-        """
-        INSERT INTO hotel_bookings (
-            user_id,
-            room_type_id,
-            booking_date,
-            checkin_date,
-            checkout_date,
-            total_price
+    # Cung tool call (retry/approval gui lai) chi tao mot booking
+    booking_id, total_price = execute_write(
+        idempotent(
+            CreateHotelBookingCommand(user_id, room_type_id, checkin_date, checkout_date),
+            tool_call_id,
         )
-        VALUES (?, ?, CURRENT_TIMESTAMP, ?, ?, ?)
-        """,
-        (user_id, room_type_id, checkin_date, checkout_date, total_price)
     )
 
-    booking_id = cursor.lastrowid
-    conn.commit()
-
-    cursor.close()
-    conn.close()
+    invalidate_tool_cache("hotel_bookings", "hotel_room_inventory")
+    bump_booking_version(user_id)
 
     return {
         "booking_id": booking_id,
@@ -189,50 +338,34 @@ def get_user_hotel_bookings(config: RunnableConfig) -> list[dict]:
     if not user_id:
         raise ValueError("Khong co ID nguoi dung duoc cau hinh.")
 
-    conn = sqlite3.connect(settings.SQLITE_DB_PATH)
-    cursor = conn.cursor()
+    with sqlite_connection() as conn:
+        return fetch_all(conn, USER_HOTEL_BOOKINGS_QUERY, (user_id,))
 
-    query = """
-    SELECT
-        hb.booking_id,
-        h.hotel_name,
-        rt.room_name,
-        hb.checkin_date,
-        hb.checkout_date,
-        hb.total_price
-    FROM hotel_bookings hb
-    JOIN hotel_room_types rt
-        ON hb.room_type_id = rt.room_type_id
-    JOIN hotels_vietnam h
-        ON rt.hotel_id = h.hotel_id
-    WHERE hb.user_id = ?
-    ORDER BY hb.checkin_date DESC
-    """
-    cursor.execute(query, (user_id,))
-    rows = cursor.fetchall()
-    cols = [c[0] for c in cursor.description]
-    results = [dict(zip(cols, row)) for row in rows]
+@dataclass
+class CancelHotelBookingCommand(WriteCommand):
+    """Xoa booking khach san va tra lai ton kho (chay tren writer SQLite)."""
+    booking_id: int
 
-    cursor.close()
-    conn.close()
-    return results
+    name = "cancel_hotel_booking"
 
-@tool
-def cancel_hotel_booking(booking_id: int) -> dict:
-    """Huy dat phong khach san."""
-    conn = sqlite3.connect(settings.SQLITE_DB_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "DELETE FROM hotel_bookings WHERE booking_id = ?",
-        (booking_id,)
-    )
+    def apply(self, conn: sqlite3.Connection):
+        stay = fetch_one(conn, HOTEL_BOOKING_STAY_QUERY, (self.booking_id,))
+        if not stay:
+            raise ValueError("Khong tim thay booking.")
 
-    if cursor.rowcount == 0:
-        raise ValueError("Khong tim thay booking.")
+        conn.execute(DELETE_HOTEL_BOOKING_QUERY, (self.booking_id,))
+        release_rooms(conn, stay["room_type_id"], stay["checkin_date"], stay["checkout_date"])
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+@tool
+def cancel_hotel_booking(
+    booking_id: int,
+    *,
+    config: RunnableConfig,
+    tool_call_id: Annotated[str, InjectedToolCallId],
+) -> dict:
+    """Huy dat phong khach san."""
+    execute_write(idempotent(CancelHotelBookingCommand(booking_id), tool_call_id))
 
+    invalidate_tool_cache("hotel_bookings", "hotel_room_inventory")
+    bump_booking_version(config.get("configurable", {}).get("user_id"))
     return {"status": "cancelled", "booking_id": booking_id}
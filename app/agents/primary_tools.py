@@ -4,6 +4,7 @@ from langchain_core.runnables import RunnableConfig
 from app.services.milvus_service import query_milvus
 from app.agents.flight_agent_tools import fetch_user_flight_information
 from app.agents.hotel_agent_tools import get_user_hotel_bookings
+from app.agents.tool_node import run_concurrently
 from langchain_core.tools import tool
 
 @tool
@@ -13,7 +14,7 @@ def lookup_policy(query: str) -> str:
         collection_name=settings.COLLECTION_NAME, 
         query=query
     )
-    results = sorted(results, key=lambda x: x['id'])
+    # Giu thu tu xep hang (id la hash, khong con la thu tu trong tai lieu)
     if not results:
         return "No relevant policy found."
     return "\n\n".join([f"{res['content']}" for res in results])
@@ -26,8 +27,11 @@ def get_all_user_bookings(*, config: RunnableConfig) -> dict:
     if not user_id:
         raise ValueError("Khong co ID hanh khach duoc cau hinh.")
 
-    flights = fetch_user_flight_information.invoke({}, config)
-    hotels = get_user_hotel_bookings.invoke({}, config)
+    # Hai truy van doc lap, chay song song
+    flights, hotels = run_concurrently(
+        lambda: fetch_user_flight_information.invoke({}, config),
+        lambda: get_user_hotel_bookings.invoke({}, config),
+    )
 
     return {
         "flights": flights,
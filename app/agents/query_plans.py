@@ -0,0 +1,140 @@
+"""Kiem tra query plan cho cac truy van SQLite cua tool.
+
+Chay ``EXPLAIN QUERY PLAN`` tren moi query cua tool va bao loi neu co query nao
+phai quet toan bo bang (``SCAN <table>``) thay vi tim theo index:
+
+    python -m app.agents.query_plans [--db path/to/travel2.sqlite]
+
+Thoat voi ma 1 khi co query bi full scan, nen co the dung lam buoc CI sau migration.
+"""
+import argparse
+import re
+import sqlite3
+import sys
+from datetime import date
+from typing import Sequence
+from app.agents import flight_agent_tools as flight_q
+from app.agents import hotel_agent_tools as hotel_q
+from app.db import idempotency as idempotency_q
+from app.services import hotel_inventory as inventory_q
+from app.services import seat_inventory as seat_q
+
+# Bang nho duoc phep quet toan bo (neu co)
+ALLOWED_SCANS: set[str] = set()
+
+_SCAN_RE = re.compile(r"^SCAN (\w+)")
+
+
+def tool_query_cases() -> list[tuple[str, str, Sequence]]:
+    """(ten, sql, tham so mau) cho moi query ma cac tool dang chay."""
+    search_flights_sql, search_flights_params = flight_q.build_search_flights_query(
+        start_time=date(2025, 8, 1), end_time=date(2025, 8, 31)
+    )
+    route_sql, route_params = flight_q.build_search_flights_query(
+        {"SGN"}, {"HAN", "VDO"}, date(2025, 8, 1), date(2025, 8, 31)
+    )
+    departure_sql, departure_params = flight_q.build_search_flights_query(
+        {"DAD", "HUI"}, None, date(2025, 8, 1), None
+    )
+    search_hotels_sql, search_hotels_params = hotel_q.build_search_hotels_query(
+        airport_code="SGN", min_star=3
+    )
+    city_sql, city_params = hotel_q.build_search_hotels_query(
+        city="Đà Nẵng", keyword="biển", min_star=3
+    )
+    available_sql, available_params = hotel_q.build_search_hotels_query(
+        city="Đà Nẵng", checkin_date="2025-08-01", checkout_date="2025-08-03"
+    )
+    stay = ("2025-08-01", "2025-08-03")
+    return [
+        ("fetch_user_flight_information", flight_q.FETCH_USER_FLIGHTS_QUERY, ("user",)),
+        ("search_flights[time_window]", search_flights_sql, search_flights_params),
+        ("search_flights[route]", route_sql, route_params),
+        ("search_flights[departure]", departure_sql, departure_params),
+        ("update_ticket_to_new_flight[flight]", flight_q.FLIGHT_BY_ID_QUERY, (1,)),
+        ("update_ticket_to_new_flight[ticket_flight]", flight_q.TICKET_FLIGHT_QUERY, ("T",)),
+        ("update_ticket_to_new_flight[owner]", flight_q.TICKET_OWNER_QUERY, ("T", "user")),
+        ("update_ticket_to_new_flight[update]", flight_q.UPDATE_TICKET_FLIGHT_QUERY, (1, "T")),
+        ("update_ticket_to_new_flight[ensure_seats]", seat_q.ENSURE_FLIGHT_SEATS_QUERY, (1,)),
+        ("update_ticket_to_new_flight[free_seats]", seat_q.FREE_SEATS_QUERY, (1, "Economy")),
+        ("update_ticket_to_new_flight[sell_seats]", seat_q.SELL_SEATS_QUERY, (1, 1, "Economy")),
+        ("cancel_ticket[release_seats]", seat_q.RELEASE_SEATS_QUERY, (1, 1, "Economy")),
+        ("search_flights[seats]", seat_q.flight_seats_query(3), (1, 2, 3)),
+        ("cancel_ticket[book_ref]", flight_q.TICKET_BOOK_REF_QUERY, ("T", "user")),
+        ("cancel_ticket[boarding_passes]", flight_q.DELETE_BOARDING_PASSES_QUERY, ("T",)),
+        ("cancel_ticket[ticket_flights]", flight_q.DELETE_TICKET_FLIGHTS_QUERY, ("T",)),
+        ("cancel_ticket[ticket]", flight_q.DELETE_TICKET_QUERY, ("T",)),
+        ("cancel_ticket[remaining]", flight_q.COUNT_BOOKING_TICKETS_QUERY, ("B",)),
+        ("cancel_ticket[booking]", flight_q.DELETE_FLIGHT_BOOKING_QUERY, ("B",)),
+        ("search_hotels[airport]", search_hotels_sql, search_hotels_params),
+        ("search_hotels[fts]", city_sql, city_params),
+        ("get_hotel_details", hotel_q.HOTEL_DETAILS_QUERY, (1,)),
+        ("get_hotel_details[fts]", hotel_q.HOTEL_DETAILS_BY_TEXT_QUERY, ('"muong"*',)),
+        ("search_hotels[availability]", available_sql, available_params),
+        ("list_hotel_room_types", hotel_q.HOTEL_ROOM_TYPES_QUERY, (1,)),
+        ("list_hotel_room_types[availability]", inventory_q.AVAILABLE_ROOM_TYPES_QUERY, (1, *stay)),
+        ("create_hotel_booking[price]", hotel_q.ROOM_PRICE_QUERY, (1,)),
+        ("create_hotel_booking[capacity]", inventory_q.ROOM_CAPACITY_QUERY, (1,)),
+        ("create_hotel_booking[max_booked]", inventory_q.MAX_BOOKED_QUERY, (1, *stay)),
+        ("create_hotel_booking[reserve]", inventory_q.BOOK_NIGHTS_QUERY, (1, 1, *stay)),
+        ("get_user_hotel_bookings", hotel_q.USER_HOTEL_BOOKINGS_QUERY, ("user",)),
+        ("cancel_hotel_booking[stay]", hotel_q.HOTEL_BOOKING_STAY_QUERY, (1,)),
+        ("cancel_hotel_booking", hotel_q.DELETE_HOTEL_BOOKING_QUERY, (1,)),
+        ("cancel_hotel_booking[release]", inventory_q.RELEASE_NIGHTS_QUERY, (1, 1, *stay)),
+        ("idempotency[lookup]", idempotency_q.IDEMPOTENCY_LOOKUP_QUERY, ("key", 0)),
+        ("idempotency[purge]", idempotency_q.IDEMPOTENCY_PURGE_QUERY, (0,)),
+    ]
+
+
+def explain_query_plan(conn: sqlite3.Connection, query: str, params: Sequence = ()) -> list[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+def full_scans(plan: list[str]) -> list[str]:
+    """Cac dong plan la full table scan (khong tinh bang trong ALLOWED_SCANS)."""
+    scans = []
+    for detail in plan:
+        match = _SCAN_RE.match(detail)
+        if not match or detail.startswith("SCAN CONSTANT ROW"):
+            continue
+        # Truy van FTS5 di qua index cua bang ao, khong phai full scan
+        if "VIRTUAL TABLE INDEX" in detail:
+            continue
+        if match.group(1) in ALLOWED_SCANS:
+            continue
+        scans.append(detail)
+    return scans
+
+
+def check_query_plans(conn: sqlite3.Connection) -> dict[str, list[str]]:
+    """Tra ve {ten query: cac dong SCAN} cho nhung query khong dung index."""
+    failures = {}
+    for name, query, params in tool_query_cases():
+        scans = full_scans(explain_query_plan(conn, query, params))
+        if scans:
+            failures[name] = scans
+    return failures
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    from app.config import settings
+
+    parser = argparse.ArgumentParser(description="Kiem tra query plan cua cac tool SQLite")
+    parser.add_argument("--db", default=settings.SQLITE_DB_PATH, help="Duong dan file SQLite")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        failures = check_query_plans(conn)
+    finally:
+        conn.close()
+
+    for name, scans in failures.items():
+        print(f"[FULL SCAN] {name}: {'; '.join(scans)}")
+    total = len(tool_query_cases())
+    print(f"{total - len(failures)}/{total} tool queries use an index.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
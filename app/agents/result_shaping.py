@@ -0,0 +1,177 @@
+"""Rut gon ket qua tool truoc khi dua vao ToolMessage.
+
+Ket qua dang list[dict] duoc chieu ve cac cot agent can (``TOOL_COLUMNS``), in
+thanh bang gon (mot dong header, cac dong gia tri ngan cach bang ``|``) va cat
+bot dong khi vuot ngan sach token. Moi ToolMessage nam lai trong lich su va bi
+gui lai o moi luot sau, nen tiet kiem o day giam prompt cho ca cuoc hoi thoai.
+"""
+import functools
+import json
+import threading
+from typing import Any, Callable
+from langchain_core.tools import StructuredTool
+from app.config import settings
+from app.utils import logger
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken di kem langchain-openai
+    tiktoken = None
+
+# Cac cot dua cho LLM, theo thu tu hien thi. Tool khong co trong day giu nguyen cot.
+TOOL_COLUMNS: dict[str, list[str]] = {
+    "search_flights": [
+        "flight_id", "flight_no", "scheduled_departure", "scheduled_arrival",
+        "departure_airport", "departure_city", "arrival_airport", "arrival_city", "status",
+        "available_seats",
+    ],
+    "search_flight_routes": [
+        "route", "connections", "flight_ids", "flight_nos", "departure", "arrival",
+        "total_minutes", "layover_minutes",
+    ],
+    "fetch_user_flight_information": [
+        "ticket_no", "book_ref", "flight_id", "flight_no", "status",
+        "scheduled_departure", "scheduled_arrival", "departure_display", "arrival_display",
+        "seat_no", "fare_conditions",
+    ],
+    "search_hotels": ["hotel_id", "hotel_name", "star_rating", "city", "airport_code", "address"],
+    "get_hotel_details": ["hotel_id", "hotel_name", "star_rating", "address", "city", "airport_code", "airport_name"],
+    "list_hotel_room_types": ["room_type_id", "room_name", "base_price", "max_guests"],
+    "get_user_hotel_bookings": ["booking_id", "hotel_name", "room_name", "checkin_date", "checkout_date", "total_price"],
+}
+
+# Ket qua long nhau (get_all_user_bookings): khoa -> tool co cung dang ket qua
+NESTED_RESULTS: dict[str, dict[str, str]] = {
+    "get_all_user_bookings": {
+        "flights": "fetch_user_flight_information",
+        "hotels": "get_user_hotel_bookings",
+    },
+}
+
+_lock = threading.Lock()
+_stats: dict[str, dict[str, int]] = {}
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(settings.LLM_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str) -> int:
+    """So token cua chuoi (uoc luong ~4 ky tu/token neu khong co tiktoken)."""
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def project(rows: list[dict], columns: list[str] | None) -> tuple[list[str], list[list[str]]]:
+    if columns is None:
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+    else:
+        # Chi giu cac cot thuc su co trong ket qua
+        columns = [c for c in columns if any(c in row for row in rows)]
+    return columns, [[_cell(row.get(c)) for c in columns] for row in rows]
+
+
+def render_table(rows: list[dict], columns: list[str] | None = None, budget: int | None = None) -> str:
+    """Bang header + dong, cat bot dong cuoi neu vuot ``budget`` token."""
+    if not rows:
+        return "(khong co ket qua)"
+    header, values = project(rows, columns)
+    lines = ["|".join(header)]
+    used = count_tokens(lines[0])
+    for index, row in enumerate(values):
+        line = "|".join(row)
+        cost = count_tokens(line) + 1
+        if budget is not None and used + cost > budget and index > 0:
+            lines.append(f"... con {len(values) - index} dong, hay thu hep dieu kien tim kiem.")
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+
+def render_record(record: dict, columns: list[str] | None = None) -> str:
+    header, values = project([record], columns)
+    return "\n".join(f"{key}: {value}" for key, value in zip(header, values[0]))
+
+
+def shape_result(tool_name: str, result: Any, budget: int | None = None) -> Any:
+    """Chuyen ket qua tool thanh chuoi gon; kieu khong ho tro duoc tra ve nguyen ven."""
+    budget = budget or settings.TOOL_RESULT_TOKEN_BUDGET
+    columns = TOOL_COLUMNS.get(tool_name)
+
+    if isinstance(result, list) and all(isinstance(row, dict) for row in result):
+        return render_table(result, columns, budget)
+    if isinstance(result, dict) and tool_name in NESTED_RESULTS:
+        nested = NESTED_RESULTS[tool_name]
+        share = budget // max(len(result), 1)
+        return "\n\n".join(
+            f"[{key}]\n{shape_result(nested.get(key, key), value, share)}"
+            for key, value in result.items()
+        )
+    if isinstance(result, dict):
+        return render_record(result, columns)
+    return result
+
+
+def _record(tool_name: str, before: int, after: int):
+    with _lock:
+        stats = _stats.setdefault(tool_name, {"calls": 0, "tokens_before": 0, "tokens_after": 0})
+        stats["calls"] += 1
+        stats["tokens_before"] += before
+        stats["tokens_after"] += after
+    logger.info(f"Tool result {tool_name}: {before} -> {after} tokens")
+
+
+def shape_and_measure(tool_name: str, result: Any) -> Any:
+    if not settings.TOOL_RESULT_SHAPING_ENABLED:
+        return result
+    shaped = shape_result(tool_name, result)
+    if shaped is result:
+        return result
+    before = count_tokens(json.dumps(result, ensure_ascii=False, default=str))
+    _record(tool_name, before, count_tokens(shaped))
+    return shaped
+
+
+def shape_tool(base_tool: StructuredTool) -> StructuredTool:
+    """Tao ban sao cua tool tra ve ket qua da rut gon (ham goc giu nguyen)."""
+    func: Callable = base_tool.func
+
+    @functools.wraps(func)
+    def shaped(*args, **kwargs):
+        return shape_and_measure(base_tool.name, func(*args, **kwargs))
+
+    return StructuredTool(
+        name=base_tool.name,
+        description=base_tool.description,
+        args_schema=base_tool.args_schema,
+        func=shaped,
+        return_direct=base_tool.return_direct,
+        response_format=base_tool.response_format,
+    )
+
+
+def shape_tools(tools: list) -> list:
+    return [shape_tool(t) for t in tools]
+
+
+def result_shaping_metrics() -> dict:
+    with _lock:
+        return {
+            name: {**stats, "saved_tokens": stats["tokens_before"] - stats["tokens_after"]}
+            for name, stats in _stats.items()
+        }
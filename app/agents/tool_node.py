@@ -0,0 +1,160 @@
+"""Node thuc thi tool cho graph: chay song song cac tool call cua mot luot.
+
+Khi LLM goi nhieu tool doc lap trong cung mot AIMessage, cac call duoc day len
+thread pool co gioi han va chay dong thoi; moi call co timeout va xu ly loi rieng,
+ket qua (ToolMessage) tra ve dung thu tu tool_calls. Thoi gian mot luot vi the
+bang call cham nhat thay vi tong cac call.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Optional
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from app.config import settings
+from app.utils import logger
+
+_executors: dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executor(name: str, max_workers: int) -> ThreadPoolExecutor:
+    if name not in _executors:
+        with _executors_lock:
+            if name not in _executors:
+                _executors[name] = ThreadPoolExecutor(
+                    max_workers=max_workers, thread_name_prefix=name
+                )
+    return _executors[name]
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """Thread pool chay cac tool call cua graph."""
+    return _get_executor("tool-call", settings.TOOL_MAX_WORKERS)
+
+
+def get_fan_out_executor() -> ThreadPoolExecutor:
+    """Thread pool rieng cho tool tong hop goi tool con.
+
+    Tach khoi pool tool-call de tool cha dang chiem worker khong phai cho
+    chinh pool do (tranh deadlock khi pool day).
+    """
+    return _get_executor("tool-fan-out", settings.TOOL_FAN_OUT_WORKERS)
+
+
+def shutdown_tool_executors():
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=True)
+        _executors.clear()
+
+
+def _submit(executor: ThreadPoolExecutor, fn: Callable, *args):
+    # Copy context vars (callback/config cua LangChain) sang thread
+    ctx = contextvars.copy_context()
+    return executor.submit(ctx.run, fn, *args)
+
+
+def run_concurrently(*calls: Callable[[], Any], timeout: Optional[float] = None) -> list[Any]:
+    """Chay cac ham khong tham so song song, tra ve ket qua theo dung thu tu.
+
+    Loi cua bat ky ham nao duoc nem lai cho caller.
+    """
+    timeout = timeout or settings.TOOL_CALL_TIMEOUT_SECONDS
+    futures = [_submit(get_fan_out_executor(), call) for call in calls]
+    return [future.result(timeout=timeout) for future in futures]
+
+
+def _error_message(tool_call: dict, error: Any) -> ToolMessage:
+    return ToolMessage(
+        content=f"Loi: {error}\n vui long sua loi cua ban.",
+        name=tool_call["name"],
+        tool_call_id=tool_call["id"],
+        status="error",
+    )
+
+
+def _timeout_message(tool_call: dict, timeout: float) -> ToolMessage:
+    return _error_message(
+        tool_call,
+        f"cong cu {tool_call['name']} khong phan hoi sau {timeout:g} giay, ket qua chua xac dinh",
+    )
+
+
+def _as_tool_message(tool_call: dict, output: Any) -> ToolMessage:
+    if isinstance(output, ToolMessage):
+        return output
+    return ToolMessage(content=str(output), name=tool_call["name"], tool_call_id=tool_call["id"])
+
+
+class ConcurrentToolNode:
+    """Thay cho ``ToolNode``: moi tool call chay doc lap tren thread pool co gioi han.
+
+    ``use_deadline=False`` cho node tool ghi: call khong bi cat giua chung (ghi van
+    chay ngam trong khi LLM duoc bao "chua xac dinh" va goi lai voi tool_call_id
+    moi, dan toi ghi hai lan); thoi gian cho da bi chan boi ``SQLITE_WRITE_TIMEOUT``.
+    """
+
+    def __init__(self, tools: list, timeout: Optional[float] = None, use_deadline: bool = True):
+        self.tools_by_name = {t.name: t for t in tools}
+        self.timeout = (timeout or settings.TOOL_CALL_TIMEOUT_SECONDS) if use_deadline else None
+
+    def _tool_calls(self, state: dict) -> list[dict]:
+        return state["messages"][-1].tool_calls
+
+    def _invoke_one(self, tool_call: dict, config: RunnableConfig) -> ToolMessage:
+        tool = self.tools_by_name.get(tool_call["name"])
+        if tool is None:
+            return _error_message(
+                tool_call,
+                f"cong cu {tool_call['name']} khong hop le, chi duoc dung: {', '.join(self.tools_by_name)}",
+            )
+        try:
+            # Truyen ToolCall (type="tool_call") de tool tu nhan tool_call_id/config
+            output = tool.invoke({**tool_call, "type": "tool_call"}, config)
+        except Exception as e:
+            logger.warning(f"Tool {tool_call['name']} failed: {e!r}")
+            return _error_message(tool_call, repr(e))
+        return _as_tool_message(tool_call, output)
+
+    async def _ainvoke_one(self, tool_call: dict, config: RunnableConfig) -> ToolMessage:
+        tool = self.tools_by_name.get(tool_call["name"])
+        if tool is None:
+            return self._invoke_one(tool_call, config)
+        try:
+            output = await asyncio.wait_for(
+                tool.ainvoke({**tool_call, "type": "tool_call"}, config), self.timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool {tool_call['name']} timed out after {self.timeout}s")
+            return _timeout_message(tool_call, self.timeout)
+        except Exception as e:
+            logger.warning(f"Tool {tool_call['name']} failed: {e!r}")
+            return _error_message(tool_call, repr(e))
+        return _as_tool_message(tool_call, output)
+
+    def __call__(self, state: dict, config: RunnableConfig) -> dict:
+        tool_calls = self._tool_calls(state)
+        executor = get_tool_executor()
+        futures = [_submit(executor, self._invoke_one, tc, config) for tc in tool_calls]
+        if self.timeout is None:
+            return {"messages": [future.result() for future in futures]}
+        # Cac call bat dau cung luc nen dung chung mot moc deadline
+        deadline = time.monotonic() + self.timeout
+        messages = []
+        for tool_call, future in zip(tool_calls, futures):
+            try:
+                messages.append(future.result(timeout=max(deadline - time.monotonic(), 0)))
+            except FutureTimeoutError:
+                logger.warning(f"Tool {tool_call['name']} timed out after {self.timeout}s")
+                messages.append(_timeout_message(tool_call, self.timeout))
+        return {"messages": messages}
+
+    async def acall(self, state: dict, config: RunnableConfig) -> dict:
+        tool_calls = self._tool_calls(state)
+        messages = await asyncio.gather(
+            *(self._ainvoke_one(tc, config) for tc in tool_calls)
+        )
+        return {"messages": list(messages)}
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from langchain_core.messages import HumanMessage
 from app.utils import logger
 from app.models.chat_models import ChatRequest, ChatResponse, ApprovalRequest, ApprovalResponse
@@ -16,6 +17,11 @@ def _log_event(event: dict, _log: set):
             logger.info(msg_repr)
             _log.add(message.id)
 
+def _stream_graph(graph, inputs, config: dict, _log: set):
+    """Chay graph dong bo; luon goi qua run_in_threadpool de khong chan event loop."""
+    for event in graph.stream(inputs, config=config, stream_mode="values"):
+        _log_event(event, _log)
+
 router = APIRouter(prefix="/chatbot", tags=["Chatbot"])
 
 @router.post("/chat")
@@ -47,17 +53,17 @@ async def chat(
 
     _log = set()
     try:
-        # ===== STREAM VÀ LƯU EVENT CUỐI =====
-        for event in graph.stream(
+        # ===== STREAM (trong threadpool, khong chan request cua user khac) =====
+        await run_in_threadpool(
+            _stream_graph,
+            graph,
             {"messages": [("user", request.message)]},
-            config=config,
-            stream_mode="values",
-        ):
-            _log_event(event, _log)
-            last_event = event  # ✅ Cập nhật event cuối
+            config,
+            _log,
+        )
         
         # ===== CHECK INTERRUPT =====
-        snapshot = graph.get_state(config)
+        snapshot = await run_in_threadpool(graph.get_state, config)
         
         if snapshot.next:
             # ⏸️ CẦN APPROVAL
@@ -139,7 +145,7 @@ async def handle_approval(
 
     try:
         # ===== GET CURRENT STATE =====
-        snapshot = graph.get_state(config)
+        snapshot = await run_in_threadpool(graph.get_state, config)
         
         if not snapshot or not snapshot.next:
             raise HTTPException(
@@ -151,14 +157,9 @@ async def handle_approval(
             # Customer approval
             logger.info("Customer approval!!!")
 
-            for event in graph.stream(
-                None,
-                config=config,
-                stream_mode="values"
-            ):
-                _log_event(event, _log)
+            await run_in_threadpool(_stream_graph, graph, None, config, _log)
             # Kiểm tra state sau khi resume
-            updated_snapshot = graph.get_state(config)
+            updated_snapshot = await run_in_threadpool(graph.get_state, config)
 
             if updated_snapshot.next:
                 logger.info("⏸️ Another action needs approval")
@@ -223,7 +224,9 @@ async def handle_approval(
             logger.info(f"Sending rejection with tool_call_id: {tool_call_id}")
             
             # Gửi ToolMessage với rejection
-            for event in graph.stream(
+            await run_in_threadpool(
+                _stream_graph,
+                graph,
                 {
                     "messages": [
                         ToolMessage(
@@ -236,13 +239,12 @@ async def handle_approval(
                         )
                     ]
                 },
-                config=config,
-                stream_mode="values",
-            ):
-                _log_event(event, _log)
+                config,
+                _log,
+            )
             
             # Lấy response sau khi reject
-            final_snapshot = graph.get_state(config)
+            final_snapshot = await run_in_threadpool(graph.get_state, config)
             messages = final_snapshot.values.get("messages", [])
             
             for msg in reversed(messages):
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from app.core.auth import get_current_active_user
 from app.models.auth_models import User
-from app.services.milvus_service import normalize_docx_to_chunks, upload_chunks_to_milvus
+from app.db.sqlite_async import run_in_db_executor
+from app.services.ingestion_jobs import JobQueueFullError, get_ingestion_job, submit_ingestion_job
 from app.utils import logger
 
 router = APIRouter(prefix="/milvus", tags=["Milvus Upload"])
@@ -10,6 +11,7 @@ router = APIRouter(prefix="/milvus", tags=["Milvus Upload"])
 async def query_milvus(
     query: str,
     collection_name: str,
+    search_mode: str | None = None,
     current_user: User = Depends(get_current_active_user)
 ):
     # Check role admin
@@ -18,14 +20,34 @@ async def query_milvus(
     
     try:
         from app.services.milvus_service import query_milvus
-        results = query_milvus(collection_name=collection_name, query=query, top_k=3)
+        results = query_milvus(
+            collection_name=collection_name, query=query, top_k=3, search_mode=search_mode
+        )
         return {"results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error querying Milvus: {str(e)}")
 
-@router.post("/upload-doc")
+@router.get("/status")
+async def retrieval_status(current_user: User = Depends(get_current_active_user)):
+    # Check role admin
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin only")
+
+    from app.services.retrieval_service import get_retrieval_service
+    from app.services.embedding_cache import embedding_cache_metrics
+    from app.services.semantic_cache import semantic_cache_metrics
+    service = get_retrieval_service()
+    return {
+        "load_state": service.load_state(),
+        "metrics": service.metrics(),
+        "embedding_cache": embedding_cache_metrics(),
+        "semantic_cache": semantic_cache_metrics(),
+    }
+
+@router.post("/upload-doc", status_code=202)
 async def upload_document_milvus(
     file: UploadFile = File(...),
+    doc_id: str | None = None,
     current_user: User = Depends(get_current_active_user)
 ):
     # Check role admin
@@ -38,17 +60,27 @@ async def upload_document_milvus(
         try:
             file_bytes = await file.read()
 
-            # Normalize and process the document
-            chunks = normalize_docx_to_chunks(file_bytes, file.filename)
-            logger.info(f"Normalized document into {len(chunks)} chunks.")
-            # Upload to Milvus
-            result = upload_chunks_to_milvus(chunks, collection_name="chunks")
-            logger.info(f"Upload result: {result}")
-            return {"message": f"Uploaded {len(chunks)} chunks to Milvus."}
+            # Convert + embedding chay nen, tra job id ngay
+            job_id = await run_in_db_executor(
+                submit_ingestion_job, file_bytes, file.filename, "chunks", doc_id or file.filename
+            )
+            logger.info(f"Queued ingestion job {job_id} for '{file.filename}'.")
+            return {"job_id": job_id, "status": "queued"}
+        except JobQueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
     else:
         raise HTTPException(status_code=400, detail="Invalid file type. Only .docx are allowed." )
-        
-    
-    
\ No newline at end of file
+
+@router.get("/jobs/{job_id}")
+async def ingestion_job_status(job_id: str, current_user: User = Depends(get_current_active_user)):
+    # Check role admin
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin only")
+
+    job = await run_in_db_executor(get_ingestion_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job.pop("file_path", None)
+    return job
@@ -28,14 +28,101 @@ class Settings(BaseSettings):
     MILVUS_DB_NAME: str = os.getenv("MILVUS_DB_NAME", "")
     COLLECTION_NAME: str = os.getenv("COLLECTION_NAME", "")
 
+    # Retrieval (embedding + tim kiem chinh sach)
+    EMBEDDING_MAX_CONNECTIONS: int = int(os.getenv("EMBEDDING_MAX_CONNECTIONS", "20"))
+    EMBEDDING_TIMEOUT_SECONDS: float = float(os.getenv("EMBEDDING_TIMEOUT_SECONDS", "30"))
+    RETRIEVAL_WARMUP: bool = os.getenv("RETRIEVAL_WARMUP", "true").lower() == "true"
+    EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "4096"))
+    EMBEDDING_CACHE_TTL_SECONDS: int = int(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", str(30 * 86400)))
+    EMBEDDING_CACHE_USE_REDIS: bool = os.getenv("EMBEDDING_CACHE_USE_REDIS", "true").lower() == "true"
+    EMBEDDING_CACHE_FOLD_DIACRITICS: bool = os.getenv("EMBEDDING_CACHE_FOLD_DIACRITICS", "false").lower() == "true"
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    SEMANTIC_CACHE_TTL_SECONDS: float = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+    SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1024"))
+    # vector | bm25 | hybrid (gop vector + BM25 bang reciprocal rank fusion)
+    RETRIEVAL_SEARCH_MODE: str = os.getenv("RETRIEVAL_SEARCH_MODE", "hybrid").lower()
+    RETRIEVAL_CANDIDATE_MULTIPLIER: int = int(os.getenv("RETRIEVAL_CANDIDATE_MULTIPLIER", "4"))
+    RETRIEVAL_RRF_K: int = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+    # milvus | local | auto (Milvus, chuyen sang chi muc local khi loi/cham)
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "milvus").lower()
+    VECTOR_SEARCH_TIMEOUT_SECONDS: float = float(os.getenv("VECTOR_SEARCH_TIMEOUT_SECONDS", "2"))
+    LOCAL_INDEX_DIR: str = os.getenv("LOCAL_INDEX_DIR", "app/db/vector_index")
+    LOCAL_INDEX_MODE: str = os.getenv("LOCAL_INDEX_MODE", "flat").lower()
+    LOCAL_INDEX_MAX_ROWS: int = int(os.getenv("LOCAL_INDEX_MAX_ROWS", "16384"))
+    LOCAL_INDEX_SYNC_ON_STARTUP: bool = os.getenv("LOCAL_INDEX_SYNC_ON_STARTUP", "true").lower() == "true"
+
+    # Ingestion (upload tai lieu vao Milvus)
+    INGEST_EMBED_BATCH_SIZE: int = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))
+    INGEST_EMBED_CONCURRENCY: int = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+    INGEST_EMBED_MAX_RETRIES: int = int(os.getenv("INGEST_EMBED_MAX_RETRIES", "5"))
+    INGEST_RETRY_BASE_SECONDS: float = float(os.getenv("INGEST_RETRY_BASE_SECONDS", "1"))
+    INGEST_RETRY_MAX_SECONDS: float = float(os.getenv("INGEST_RETRY_MAX_SECONDS", "60"))
+    INGEST_JOB_DIR: str = os.getenv("INGEST_JOB_DIR", "app/db/ingest_jobs")
+    INGEST_MAX_CONCURRENT_JOBS: int = int(os.getenv("INGEST_MAX_CONCURRENT_JOBS", "2"))
+    INGEST_MAX_PENDING_JOBS: int = int(os.getenv("INGEST_MAX_PENDING_JOBS", "20"))
+    INGEST_PROCESS_WORKERS: int = int(os.getenv("INGEST_PROCESS_WORKERS", "1"))
+    INGEST_JOB_MAX_ATTEMPTS: int = int(os.getenv("INGEST_JOB_MAX_ATTEMPTS", "3"))
+
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
 
+    # Timezone (gio dia phuong cho thoi gian khong co mui gio, phai khong co DST)
+    LOCAL_TIMEZONE: str = os.getenv("LOCAL_TIMEZONE", "Asia/Ho_Chi_Minh")
+
     # Redis
     REDIS_URI: str = os.getenv("REDIS_URI", "")
+    REDIS_CACHE_TIMEOUT: float = float(os.getenv("REDIS_CACHE_TIMEOUT", "0.5"))
+
+    # Booking context cache
+    BOOKING_CONTEXT_CACHE_TTL_SECONDS: int = int(os.getenv("BOOKING_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+    BOOKING_CONTEXT_CACHE_MAX_USERS: int = int(os.getenv("BOOKING_CONTEXT_CACHE_MAX_USERS", "1024"))
+
+    # Tool result cache
+    TOOL_CACHE_ENABLED: bool = os.getenv("TOOL_CACHE_ENABLED", "true").lower() == "true"
+    TOOL_CACHE_TTL_SECONDS: int = int(os.getenv("TOOL_CACHE_TTL_SECONDS", "300"))
+    TOOL_CACHE_MAX_ENTRIES: int = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "2048"))
+    TOOL_CACHE_USE_REDIS: bool = os.getenv("TOOL_CACHE_USE_REDIS", "true").lower() == "true"
+
+    # Tool result shaping
+    TOOL_RESULT_SHAPING_ENABLED: bool = os.getenv("TOOL_RESULT_SHAPING_ENABLED", "true").lower() == "true"
+    TOOL_RESULT_TOKEN_BUDGET: int = int(os.getenv("TOOL_RESULT_TOKEN_BUDGET", "1200"))
+
+    # Tool execution
+    TOOL_MAX_WORKERS: int = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+    TOOL_FAN_OUT_WORKERS: int = int(os.getenv("TOOL_FAN_OUT_WORKERS", "8"))
+    TOOL_CALL_TIMEOUT_SECONDS: float = float(os.getenv("TOOL_CALL_TIMEOUT_SECONDS", "30"))
 
     # SQLite
     SQLITE_DB_PATH: str = os.getenv("SQLITE_DB_PATH", "app/db/DB_SQL/travel2.sqlite")
+    SQLITE_POOL_SIZE: int = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+    SQLITE_POOL_TIMEOUT: float = float(os.getenv("SQLITE_POOL_TIMEOUT", "10"))
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE: int = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_STATEMENT_CACHE_SIZE: int = int(os.getenv("SQLITE_STATEMENT_CACHE_SIZE", "256"))
+    SQLITE_ASYNC_WORKERS: int = int(os.getenv("SQLITE_ASYNC_WORKERS", "8"))
+    SQLITE_RUN_MIGRATIONS: bool = os.getenv("SQLITE_RUN_MIGRATIONS", "true").lower() == "true"
+    SQLITE_WRITER_MAX_BATCH: int = int(os.getenv("SQLITE_WRITER_MAX_BATCH", "32"))
+    SQLITE_WRITER_BATCH_WAIT_MS: float = float(os.getenv("SQLITE_WRITER_BATCH_WAIT_MS", "2"))
+    SQLITE_WRITE_TIMEOUT: float = float(os.getenv("SQLITE_WRITE_TIMEOUT", "30"))
+    TOOL_IDEMPOTENCY_TTL_SECONDS: int = int(os.getenv("TOOL_IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+    # Catalog snapshot (ban sao danh muc trong RAM cho tool chi doc)
+    CATALOG_SNAPSHOT_ENABLED: bool = os.getenv("CATALOG_SNAPSHOT_ENABLED", "false").lower() == "true"
+    CATALOG_SNAPSHOT_POOL_SIZE: int = int(os.getenv("CATALOG_SNAPSHOT_POOL_SIZE", "8"))
+    CATALOG_SNAPSHOT_REFRESH_SECONDS: float = float(os.getenv("CATALOG_SNAPSHOT_REFRESH_SECONDS", "600"))
+    CATALOG_SNAPSHOT_SIGNAL_FILE: str = os.getenv("CATALOG_SNAPSHOT_SIGNAL_FILE", "")
+
+    # Route search (tim hanh trinh noi chuyen tren do thi chuyen bay trong RAM)
+    ROUTE_GRAPH_TTL_SECONDS: float = float(os.getenv("ROUTE_GRAPH_TTL_SECONDS", "600"))
+    ROUTE_MAX_CONNECTIONS: int = int(os.getenv("ROUTE_MAX_CONNECTIONS", "2"))
+    ROUTE_MIN_LAYOVER_MINUTES: int = int(os.getenv("ROUTE_MIN_LAYOVER_MINUTES", "60"))
+    ROUTE_MAX_LAYOVER_HOURS: float = float(os.getenv("ROUTE_MAX_LAYOVER_HOURS", "24"))
+    ROUTE_MAX_EXPANSIONS: int = int(os.getenv("ROUTE_MAX_EXPANSIONS", "20000"))
 
     class Config:
         env_file = ".env"
@@ -1,4 +1,6 @@
+import threading
 from app.config import settings
+from app.utils import logger
 from redis import Redis
 from langgraph.checkpoint.redis import RedisSaver
 from langgraph.store.redis import RedisStore
@@ -12,4 +14,36 @@ def get_redis_saver():
         redis_saver.setup()
         redis_store.setup()
 
-    return redis_saver, redis_store
\ No newline at end of file
+    return redis_saver, redis_store
+
+_redis_client: Redis | None = None
+_redis_lock = threading.Lock()
+
+def get_redis_client() -> Redis | None:
+    """Client Redis dung chung cho cac cache cua ung dung (None neu chua cau hinh REDIS_URI)."""
+    global _redis_client
+    if not settings.REDIS_URI:
+        return None
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                _redis_client = Redis.from_url(
+                    settings.REDIS_URI,
+                    socket_timeout=settings.REDIS_CACHE_TIMEOUT,
+                    socket_connect_timeout=settings.REDIS_CACHE_TIMEOUT,
+                )
+    return _redis_client
+
+def safe_redis_call(fn, default=None, label: str = "cache"):
+    """Goi ``fn(client)`` tren Redis cache; tra ve ``default`` neu khong co Redis hoac loi.
+
+    Cache chi la lop tang toc, nen loi Redis khong duoc lam hong request.
+    """
+    client = get_redis_client()
+    if client is None:
+        return default
+    try:
+        return fn(client)
+    except Exception as e:
+        logger.warning(f"{label}: Redis unavailable ({e}).")
+        return default
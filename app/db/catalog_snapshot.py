@@ -0,0 +1,189 @@
+"""Ban sao chi doc trong RAM cua cac bang danh muc (chuyen bay, san bay, khach san).
+
+Khi bat ``CATALOG_SNAPSHOT_ENABLED``, luc startup database tren dia duoc chep
+vao mot database SQLite ``mode=memory&cache=shared`` bang backup API, cac bang
+booking bi bo khoi ban sao. Tool chi doc dung ``catalog_connection()`` de truy
+van ban sao; tool ghi van dung ``sqlite_connection()`` tren file goc.
+
+Ban sao duoc lam moi trong nen theo chu ky ``CATALOG_SNAPSHOT_REFRESH_SECONDS``;
+neu co ``CATALOG_SNAPSHOT_SIGNAL_FILE`` thi chi lam moi khi file do thay doi
+(vd. job ETL ``touch`` file sau khi cap nhat danh muc).
+"""
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+from app.config import settings
+from app.db.sqlite import SQLitePool, sqlite_connection
+from app.utils import logger
+
+# Bang danh muc duoc giu trong ban sao (ke ca bang phu cua FTS hotels_fts)
+CATALOG_TABLES = ("flights", "airports_data", "hotels_vietnam", "hotel_room_types")
+CATALOG_TABLE_PREFIXES = ("hotels_fts",)
+
+_generation = itertools.count(1)
+
+
+def _is_catalog_table(name: str) -> bool:
+    return name in CATALOG_TABLES or name.startswith(CATALOG_TABLE_PREFIXES)
+
+
+def _signal_mtime() -> Optional[float]:
+    path = settings.CATALOG_SNAPSHOT_SIGNAL_FILE
+    if not path:
+        return None
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+class CatalogSnapshot:
+    """Mot ban sao trong RAM: ket noi giu database song + pool ket noi chi doc."""
+
+    def __init__(self, source: str, pool_size: int):
+        self.uri = f"file:catalog_snapshot_{os.getpid()}_{next(_generation)}?mode=memory&cache=shared"
+        started = time.perf_counter()
+        # Database memory ton tai chung nao con it nhat mot ket noi mo
+        self._anchor = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        try:
+            src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+            try:
+                src.backup(self._anchor)
+            finally:
+                src.close()
+            self._drop_non_catalog_tables()
+        except Exception:
+            self._anchor.close()
+            raise
+        self.pool = SQLitePool(
+            self.uri,
+            pool_size=pool_size,
+            timeout=settings.SQLITE_POOL_TIMEOUT,
+            pragmas={"query_only": "ON", "cache_size": settings.SQLITE_CACHE_SIZE},
+            cached_statements=settings.SQLITE_STATEMENT_CACHE_SIZE,
+            uri=True,
+        )
+        self.created_at = time.time()
+        self.build_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    def _drop_non_catalog_tables(self):
+        conn = self._anchor
+        # Trigger dong bo FTS tham chieu bang booking/danh muc, khong can trong ban chi doc
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+            conn.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+        tables = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        ).fetchall()
+        for (name,) in tables:
+            if not _is_catalog_table(name):
+                conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+        conn.commit()
+        conn.execute("VACUUM")
+
+    def close(self):
+        self.pool.close()
+        self._anchor.close()
+
+    def metrics(self) -> dict:
+        return {
+            "uri": self.uri,
+            "created_at": self.created_at,
+            "build_ms": self.build_ms,
+            "pool": self.pool.metrics(),
+        }
+
+
+_snapshot: Optional[CatalogSnapshot] = None
+_retired: Optional[CatalogSnapshot] = None
+_snapshot_lock = threading.Lock()
+_refresh_listeners: list[Callable[[], None]] = []
+_refresh_thread: Optional[threading.Thread] = None
+_stop_refresh = threading.Event()
+
+
+def on_catalog_refresh(listener: Callable[[], None]):
+    """Dang ky ham goi sau moi lan lam moi ban sao (vd. xoa cache tool)."""
+    _refresh_listeners.append(listener)
+
+
+def refresh_catalog_snapshot() -> CatalogSnapshot:
+    """Tao ban sao moi tu file goc roi doi cho ban cu (request dang chay khong bi anh huong)."""
+    global _snapshot, _retired
+    snapshot = CatalogSnapshot(settings.SQLITE_DB_PATH, settings.CATALOG_SNAPSHOT_POOL_SIZE)
+    with _snapshot_lock:
+        expired, _retired, _snapshot = _retired, _snapshot, snapshot
+    # Ban cu duoc giu them mot chu ky cho cac request vua lay no, roi moi dong
+    if expired is not None:
+        expired.close()
+    logger.info(f"Catalog snapshot ready ({snapshot.uri}, {snapshot.build_ms} ms).")
+    for listener in _refresh_listeners:
+        try:
+            listener()
+        except Exception as e:
+            logger.warning(f"Catalog refresh listener failed: {e}")
+    return snapshot
+
+
+def _refresh_loop(interval: float):
+    last_signal = _signal_mtime()
+    while not _stop_refresh.wait(interval):
+        if settings.CATALOG_SNAPSHOT_SIGNAL_FILE:
+            signal = _signal_mtime()
+            if signal is None or signal == last_signal:
+                continue
+            last_signal = signal
+        try:
+            refresh_catalog_snapshot()
+        except Exception as e:
+            logger.error(f"Catalog snapshot refresh failed, keeping previous snapshot: {e}")
+
+
+def start_catalog_snapshot():
+    """Tao ban sao dau tien va chay thread lam moi (neu cau hinh); dung luc startup."""
+    global _refresh_thread
+    if not settings.CATALOG_SNAPSHOT_ENABLED:
+        return
+    refresh_catalog_snapshot()
+    interval = settings.CATALOG_SNAPSHOT_REFRESH_SECONDS
+    if interval > 0 and _refresh_thread is None:
+        _stop_refresh.clear()
+        _refresh_thread = threading.Thread(
+            target=_refresh_loop, args=(interval,), name="catalog-snapshot", daemon=True
+        )
+        _refresh_thread.start()
+
+
+def stop_catalog_snapshot():
+    global _snapshot, _retired, _refresh_thread
+    _stop_refresh.set()
+    if _refresh_thread is not None:
+        _refresh_thread.join(timeout=5)
+        _refresh_thread = None
+    with _snapshot_lock:
+        snapshots, _snapshot, _retired = (_snapshot, _retired), None, None
+    for snapshot in snapshots:
+        if snapshot is not None:
+            snapshot.close()
+
+
+@contextmanager
+def catalog_connection() -> Iterator[sqlite3.Connection]:
+    """Ket noi cho tool chi doc danh muc: ban sao trong RAM neu co, khong thi file goc."""
+    with _snapshot_lock:
+        snapshot = _snapshot
+    if snapshot is None:
+        with sqlite_connection() as conn:
+            yield conn
+        return
+    with snapshot.pool.connection() as conn:
+        yield conn
+
+
+def catalog_snapshot_metrics() -> dict | None:
+    with _snapshot_lock:
+        snapshot = _snapshot
+    return snapshot.metrics() if snapshot is not None else None
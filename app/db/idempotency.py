@@ -0,0 +1,73 @@
+"""Khoa idempotency cho tool ghi nhay cam.
+
+Moi tool call ghi duoc boc trong ``IdempotentCommand`` voi khoa lay tu
+``tool_call_id``. Lan chay dau luu ket qua vao bang ``tool_idempotency`` (xem
+migration 004) trong cung transaction voi thao tac ghi; neu cung tool call bi
+chay lai (client retry, approval gui hai lan) thi tra ve ket qua da luu ma khong
+ghi them lan nao nua. Ban ghi het han sau ``TOOL_IDEMPOTENCY_TTL_SECONDS``.
+"""
+import hashlib
+import itertools
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+from app.config import settings
+from app.db.sqlite_writer import WriteCommand
+from app.utils import logger
+
+IDEMPOTENCY_LOOKUP_QUERY = """
+SELECT result FROM tool_idempotency
+WHERE idempotency_key = ? AND created_at >= ?
+"""
+
+IDEMPOTENCY_STORE_QUERY = """
+INSERT OR REPLACE INTO tool_idempotency (idempotency_key, tool_name, result, created_at)
+VALUES (?, ?, ?, ?)
+"""
+
+IDEMPOTENCY_PURGE_QUERY = "DELETE FROM tool_idempotency WHERE created_at < ?"
+
+# Don dep ban ghi het han sau moi N lenh co khoa
+PURGE_EVERY = 100
+_counter = itertools.count(1)
+
+
+def idempotency_key(tool_name: str, tool_call_id: str) -> str:
+    return hashlib.sha1(f"{tool_name}:{tool_call_id}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class IdempotentCommand(WriteCommand):
+    """Boc mot lenh ghi: chi chay lenh goc mot lan cho moi khoa."""
+    key: str
+    command: WriteCommand
+
+    @property
+    def name(self) -> str:
+        return self.command.name
+
+    def apply(self, conn: sqlite3.Connection) -> Any:
+        now = time.time()
+        cutoff = now - settings.TOOL_IDEMPOTENCY_TTL_SECONDS
+        row = conn.execute(IDEMPOTENCY_LOOKUP_QUERY, (self.key, cutoff)).fetchone()
+        if row is not None:
+            logger.info(f"Replayed {self.name} call, returning stored result.")
+            return json.loads(row[0])
+
+        result = self.command.apply(conn)
+        conn.execute(
+            IDEMPOTENCY_STORE_QUERY,
+            (self.key, self.name, json.dumps(result, default=str, ensure_ascii=False), now),
+        )
+        if next(_counter) % PURGE_EVERY == 0:
+            conn.execute(IDEMPOTENCY_PURGE_QUERY, (cutoff,))
+        return result
+
+
+def idempotent(command: WriteCommand, tool_call_id: Optional[str]) -> WriteCommand:
+    """Gan khoa idempotency tu tool_call_id (bo qua neu khong co id)."""
+    if not tool_call_id:
+        return command
+    return IdempotentCommand(idempotency_key(command.name, tool_call_id), command)
@@ -0,0 +1,453 @@
+"""Migration co danh so phien ban cho database SQLite cua agent.
+
+Chay tu dong luc startup (xem ``main.py``) hoac bang tay:
+
+    python -m app.db.migrations            # ap dung cac migration con thieu
+    python -m app.db.migrations --status   # xem cac migration da ap dung
+"""
+import argparse
+import sqlite3
+from datetime import datetime, timezone
+from typing import Callable, Sequence
+from app.utils import logger
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?",
+        (table,),
+    ).fetchone()
+    return row is not None
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _is_rowid_alias(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    """True neu cot la INTEGER PRIMARY KEY (da la rowid, khong can index)."""
+    pk_cols = [row for row in conn.execute(f"PRAGMA table_info({table})") if row[5]]
+    return (
+        len(pk_cols) == 1
+        and pk_cols[0][1] == column
+        and (pk_cols[0][2] or "").upper() == "INTEGER"
+    )
+
+
+def _has_index_prefix(conn: sqlite3.Connection, table: str, columns: Sequence[str]) -> bool:
+    """True neu da co index (ke ca autoindex cua PK/UNIQUE) bat dau bang dung cac cot nay."""
+    for index in conn.execute(f"PRAGMA index_list({table})").fetchall():
+        index_cols = [row[2] for row in conn.execute(f"PRAGMA index_info({index[1]})")]
+        if index_cols[: len(columns)] == list(columns):
+            return True
+    return False
+
+
+def create_index(
+    conn: sqlite3.Connection,
+    name: str,
+    table: str,
+    columns: Sequence[str],
+    unique: bool = False,
+):
+    """Tao index neu bang ton tai va chua co index tuong duong."""
+    if not table_exists(conn, table):
+        logger.warning(f"Bo qua index {name}: bang {table} khong ton tai.")
+        return
+    missing = set(columns) - set(table_columns(conn, table))
+    if missing:
+        logger.warning(f"Bo qua index {name}: bang {table} thieu cot {sorted(missing)}.")
+        return
+    if len(columns) == 1 and _is_rowid_alias(conn, table, columns[0]):
+        return
+    if _has_index_prefix(conn, table, columns):
+        return
+    unique_sql = "UNIQUE " if unique else ""
+    conn.execute(
+        f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    )
+
+
+# MIGRATIONS
+def _m001_tool_lookup_indexes(conn: sqlite3.Connection):
+    """Index (covering) cho cac query nong cua tool chuyen bay va khach san."""
+    # Ve may bay cua nguoi dung
+    create_index(conn, "idx_tickets_user_id", "tickets", ["user_id", "ticket_no", "book_ref"])
+    create_index(conn, "idx_tickets_ticket_no", "tickets", ["ticket_no"])
+    create_index(conn, "idx_tickets_book_ref", "tickets", ["book_ref"])
+    create_index(conn, "idx_ticket_flights_ticket_no", "ticket_flights", ["ticket_no", "flight_id", "fare_conditions"])
+    create_index(conn, "idx_ticket_flights_flight_id", "ticket_flights", ["flight_id"])
+    create_index(conn, "idx_boarding_passes_ticket_flight", "boarding_passes", ["ticket_no", "flight_id", "seat_no"])
+    create_index(conn, "idx_flight_bookings_book_ref", "flight_bookings", ["book_ref"])
+
+    # Tim kiem chuyen bay
+    create_index(conn, "idx_flights_flight_id", "flights", ["flight_id"])
+    create_index(
+        conn, "idx_flights_route_departure", "flights",
+        ["departure_airport", "arrival_airport", "scheduled_departure"],
+    )
+    create_index(conn, "idx_flights_scheduled_departure", "flights", ["scheduled_departure"])
+    create_index(conn, "idx_airports_data_code", "airports_data", ["airport_code"])
+
+    # Khach san
+    create_index(conn, "idx_hotels_vietnam_hotel_id", "hotels_vietnam", ["hotel_id"])
+    create_index(conn, "idx_hotels_vietnam_airport_star", "hotels_vietnam", ["airport_code", "star_rating"])
+    create_index(conn, "idx_hotel_room_types_id", "hotel_room_types", ["room_type_id"])
+    create_index(conn, "idx_hotel_room_types_hotel_price", "hotel_room_types", ["hotel_id", "base_price"])
+    create_index(conn, "idx_hotel_bookings_id", "hotel_bookings", ["booking_id"])
+    create_index(conn, "idx_hotel_bookings_user_checkin", "hotel_bookings", ["user_id", "checkin_date"])
+
+    conn.execute("ANALYZE")
+
+
+def fold_sql(expr: str) -> str:
+    """Bieu thuc SQL thay 'đ/Đ' (tokenizer unicode61 khong tu bo dau chu nay)."""
+    return f"replace(replace(coalesce({expr}, ''), 'đ', 'd'), 'Đ', 'D')"
+
+
+def _hotels_fts_select(alias: str) -> str:
+    return (
+        f"SELECT {alias}.hotel_id, {fold_sql(f'{alias}.hotel_name')}, {fold_sql(f'{alias}.address')}, "
+        f"{fold_sql(f'(SELECT city FROM airports_data WHERE airport_code = {alias}.airport_code)')}"
+    )
+
+
+def _m002_hotels_fts(conn: sqlite3.Connection):
+    """Bang FTS5 (ten, dia chi, thanh pho) cho tim kiem khach san khong phan biet dau."""
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS hotels_fts USING fts5(
+            hotel_name,
+            address,
+            city,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """
+    )
+    conn.execute("DELETE FROM hotels_fts")
+    conn.execute(
+        f"""
+        INSERT INTO hotels_fts (rowid, hotel_name, address, city)
+        {_hotels_fts_select('h')} FROM hotels_vietnam h
+        """
+    )
+
+    # Dong bo FTS khi bang khach san / ten thanh pho thay doi
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS hotels_fts_ai AFTER INSERT ON hotels_vietnam BEGIN
+            INSERT INTO hotels_fts (rowid, hotel_name, address, city)
+            {_hotels_fts_select('NEW')};
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS hotels_fts_ad AFTER DELETE ON hotels_vietnam BEGIN
+            DELETE FROM hotels_fts WHERE rowid = OLD.hotel_id;
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS hotels_fts_au AFTER UPDATE ON hotels_vietnam BEGIN
+            DELETE FROM hotels_fts WHERE rowid = OLD.hotel_id;
+            INSERT INTO hotels_fts (rowid, hotel_name, address, city)
+            {_hotels_fts_select('NEW')};
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS hotels_fts_airport_au AFTER UPDATE OF city ON airports_data BEGIN
+            UPDATE hotels_fts SET city = {fold_sql('NEW.city')}
+            WHERE rowid IN (SELECT hotel_id FROM hotels_vietnam WHERE airport_code = NEW.airport_code);
+        END
+        """
+    )
+
+
+def _m003_hotel_room_inventory(conn: sqlite3.Connection):
+    """So phong da dat theo (loai phong, dem), backfill tu hotel_bookings hien co."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS hotel_room_inventory (
+            room_type_id INTEGER NOT NULL,
+            night TEXT NOT NULL,
+            booked INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (room_type_id, night)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute("DELETE FROM hotel_room_inventory")
+    if not table_exists(conn, "hotel_bookings"):
+        return
+    # Moi booking chiem cac dem tu checkin (tinh) den checkout (khong tinh)
+    conn.execute(
+        """
+        INSERT INTO hotel_room_inventory (room_type_id, night, booked)
+        WITH RECURSIVE nights(room_type_id, night, checkout) AS (
+            SELECT room_type_id, date(checkin_date), date(checkout_date)
+            FROM hotel_bookings
+            WHERE date(checkin_date) < date(checkout_date)
+            UNION ALL
+            SELECT room_type_id, date(night, '+1 day'), checkout
+            FROM nights
+            WHERE date(night, '+1 day') < checkout
+        )
+        SELECT room_type_id, night, COUNT(*) FROM nights
+        GROUP BY room_type_id, night
+        """
+    )
+
+
+def _m004_tool_idempotency(conn: sqlite3.Connection):
+    """Ket qua cua tool call ghi theo khoa idempotency (chong chay lai khi retry)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tool_idempotency (
+            idempotency_key TEXT PRIMARY KEY,
+            tool_name TEXT NOT NULL,
+            result TEXT,
+            created_at REAL NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+    create_index(conn, "idx_tool_idempotency_created_at", "tool_idempotency", ["created_at"])
+
+
+FLIGHT_TIME_COLUMNS = ("scheduled_departure", "scheduled_arrival", "actual_departure", "actual_arrival")
+
+
+def epoch_sql(expr: str, local_offset: str) -> str:
+    """Bieu thuc SQL doi chuoi thoi gian ISO sang epoch UTC (giay).
+
+    Chuoi co offset ('+07:00', 'Z') duoc SQLite tu quy ve UTC; chuoi khong co
+    mui gio duoc hieu theo gio dia phuong ``local_offset``.
+    """
+    sign = "-" if local_offset.startswith("+") else "+"
+    hours, minutes = local_offset[1:].split(":")
+    return (
+        f"CASE WHEN {expr} IS NULL OR trim({expr}) = '' THEN NULL "
+        f"WHEN {expr} LIKE '%Z' OR substr({expr}, -6, 1) IN ('+', '-') "
+        f"THEN CAST(strftime('%s', {expr}) AS INTEGER) "
+        f"ELSE CAST(strftime('%s', {expr}, '{sign}{int(hours)} hours', '{sign}{int(minutes)} minutes') AS INTEGER) END"
+    )
+
+
+def _flight_epoch_assignments(row: str, local_offset: str) -> str:
+    return ", ".join(
+        f"{col}_epoch = {epoch_sql(f'{row}.{col}', local_offset)}" for col in FLIGHT_TIME_COLUMNS
+    )
+
+
+def _m005_flight_epoch_columns(conn: sqlite3.Connection):
+    """Cot epoch UTC cho thoi gian chuyen bay + index theo (san bay di, gio khoi hanh).
+
+    Backfill va trigger dung mot offset co dinh cua ``LOCAL_TIMEZONE``; mui gio co
+    DST bi tu choi (``local_utc_offset`` raise) thay vi lech mot gio nua nam.
+    """
+    from app.utils.time_utils import local_utc_offset
+
+    if not table_exists(conn, "flights"):
+        logger.warning("Bo qua migration epoch: bang flights khong ton tai.")
+        return
+    offset = local_utc_offset()
+    existing = set(table_columns(conn, "flights"))
+    missing = set(FLIGHT_TIME_COLUMNS) - existing
+    if missing:
+        raise RuntimeError(f"Bang flights thieu cot thoi gian: {sorted(missing)}")
+    for col in FLIGHT_TIME_COLUMNS:
+        if f"{col}_epoch" not in existing:
+            conn.execute(f"ALTER TABLE flights ADD COLUMN {col}_epoch INTEGER")
+
+    conn.execute(f"UPDATE flights SET {_flight_epoch_assignments('flights', offset)}")
+
+    # Giu cot epoch dong bo khi loader them/sua chuyen bay
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS flights_epoch_ai AFTER INSERT ON flights BEGIN
+            UPDATE flights SET {_flight_epoch_assignments('NEW', offset)} WHERE rowid = NEW.rowid;
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS flights_epoch_au
+        AFTER UPDATE OF {', '.join(FLIGHT_TIME_COLUMNS)} ON flights BEGIN
+            UPDATE flights SET {_flight_epoch_assignments('NEW', offset)} WHERE rowid = NEW.rowid;
+        END
+        """
+    )
+
+    # Index theo epoch thay cho index tren chuoi thoi gian
+    conn.execute("DROP INDEX IF EXISTS idx_flights_route_departure")
+    conn.execute("DROP INDEX IF EXISTS idx_flights_scheduled_departure")
+    create_index(
+        conn, "idx_flights_departure_epoch", "flights",
+        ["departure_airport", "scheduled_departure_epoch"],
+    )
+    create_index(
+        conn, "idx_flights_route_departure_epoch", "flights",
+        ["departure_airport", "arrival_airport", "scheduled_departure_epoch"],
+    )
+    create_index(conn, "idx_flights_scheduled_departure_epoch", "flights", ["scheduled_departure_epoch"])
+    conn.execute("ANALYZE flights")
+
+
+def _m006_flight_seat_inventory(conn: sqlite3.Connection):
+    """So ghe va so ve da ban theo (chuyen bay, hang ve), backfill tu seats + ticket_flights."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS flight_seat_inventory (
+            flight_id INTEGER NOT NULL,
+            fare_conditions TEXT NOT NULL,
+            capacity INTEGER NOT NULL,
+            sold INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (flight_id, fare_conditions)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute("DELETE FROM flight_seat_inventory")
+    if not all(table_exists(conn, t) for t in ("flights", "seats", "ticket_flights")):
+        logger.warning("Bo qua backfill ton kho ghe: thieu bang flights/seats/ticket_flights.")
+        return
+    # Dung khi tao ton kho cho chuyen bay them sau migration
+    create_index(conn, "idx_seats_aircraft_fare", "seats", ["aircraft_code", "fare_conditions"])
+    conn.execute(
+        """
+        INSERT INTO flight_seat_inventory (flight_id, fare_conditions, capacity, sold)
+        SELECT f.flight_id, cap.fare_conditions, cap.capacity, COALESCE(tf.sold, 0)
+        FROM flights f
+        JOIN (
+            SELECT aircraft_code, fare_conditions, COUNT(*) AS capacity
+            FROM seats
+            GROUP BY aircraft_code, fare_conditions
+        ) cap ON cap.aircraft_code = f.aircraft_code
+        LEFT JOIN (
+            SELECT flight_id, fare_conditions, COUNT(*) AS sold
+            FROM ticket_flights
+            GROUP BY flight_id, fare_conditions
+        ) tf ON tf.flight_id = f.flight_id AND tf.fare_conditions = cap.fare_conditions
+        """
+    )
+
+
+def _m007_ingestion_jobs(conn: sqlite3.Connection):
+    """Ban ghi job ingest tai lieu vao Milvus (trang thai, tien do, ket qua)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ingestion_jobs (
+            job_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            collection_name TEXT NOT NULL,
+            doc_id TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            total_chunks INTEGER,
+            processed_chunks INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+    create_index(conn, "idx_ingestion_jobs_status", "ingestion_jobs", ["status", "created_at"])
+
+
+# (version, name, ham ap dung) - chi them migration moi vao cuoi danh sach
+MIGRATIONS: list[tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "tool_lookup_indexes", _m001_tool_lookup_indexes),
+    (2, "hotels_fts", _m002_hotels_fts),
+    (3, "hotel_room_inventory", _m003_hotel_room_inventory),
+    (4, "tool_idempotency", _m004_tool_idempotency),
+    (5, "flight_epoch_columns", _m005_flight_epoch_columns),
+    (6, "flight_seat_inventory", _m006_flight_seat_inventory),
+    (7, "ingestion_jobs", _m007_ingestion_jobs),
+]
+
+
+def _ensure_migrations_table(conn: sqlite3.Connection):
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.commit()
+
+
+def applied_versions(conn: sqlite3.Connection) -> dict[int, str]:
+    _ensure_migrations_table(conn)
+    return {
+        row[0]: row[1]
+        for row in conn.execute(f"SELECT version, applied_at FROM {MIGRATIONS_TABLE}")
+    }
+
+
+def run_migrations(conn: sqlite3.Connection) -> list[int]:
+    """Ap dung cac migration chua chay, moi migration trong mot transaction rieng."""
+    done = applied_versions(conn)
+    applied = []
+    for version, name, apply in MIGRATIONS:
+        if version in done:
+            continue
+        logger.info(f"Applying SQLite migration {version:03d}_{name}...")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            apply(conn)
+            conn.execute(
+                f"INSERT INTO {MIGRATIONS_TABLE} (version, name, applied_at) VALUES (?, ?, ?)",
+                (version, name, datetime.now(timezone.utc).isoformat()),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"SQLite migration {version:03d}_{name} failed.")
+            raise
+        applied.append(version)
+    return applied
+
+
+def migrate_database():
+    """Chay migration tren database cau hinh trong settings (dung luc startup)."""
+    from app.db.sqlite import sqlite_connection
+
+    with sqlite_connection() as conn:
+        applied = run_migrations(conn)
+    if applied:
+        logger.info(f"Applied SQLite migrations: {applied}")
+    return applied
+
+
+def main(argv: Sequence[str] | None = None):
+    from app.config import settings
+
+    parser = argparse.ArgumentParser(description="SQLite schema migrations")
+    parser.add_argument("--db", default=settings.SQLITE_DB_PATH, help="Duong dan file SQLite")
+    parser.add_argument("--status", action="store_true", help="Chi in trang thai migration")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    try:
+        if args.status:
+            done = applied_versions(conn)
+            for version, name, _ in MIGRATIONS:
+                state = done.get(version, "pending")
+                print(f"{version:03d}_{name}: {state}")
+            return
+        applied = run_migrations(conn)
+        print(f"Applied migrations: {applied or 'none'}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
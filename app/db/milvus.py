@@ -21,7 +21,9 @@ def check_collection_milvus(collection_name: str):
     try:
         if not utility.has_collection(collection_name):
             fields = [
+                # id = hash(doc_id, heading, noi dung) -> on dinh giua cac lan upload
                 FieldSchema(name="id", dtype=DataType.INT64, is_primary=True),
+                FieldSchema(name="doc_id", dtype=DataType.VARCHAR, max_length=512),
                 FieldSchema(name="heading", dtype=DataType.VARCHAR, max_length=1024),
                 FieldSchema(name="type", dtype=DataType.VARCHAR, max_length=128),
                 FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=40000),
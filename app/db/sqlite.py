@@ -0,0 +1,235 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from queue import Empty, LifoQueue
+from typing import Iterator, Optional, Sequence
+from app.config import settings
+from app.utils import logger
+
+
+def build_pragmas() -> dict:
+    """PRAGMA ap dung cho moi ket noi moi, lay tu settings."""
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "temp_store": "MEMORY",
+    }
+
+
+class SQLitePool:
+    """Pool ket noi SQLite song lau, dung chung cho cac tool cua agent.
+
+    Moi ket noi giu cache cac cau lenh da prepare (``cached_statements``), nen
+    cac query lap lai cua tool khong phai parse lai SQL sau lan goi dau tien.
+    """
+
+    def __init__(
+        self,
+        database: str,
+        pool_size: int = 8,
+        timeout: float = 10.0,
+        pragmas: Optional[dict] = None,
+        cached_statements: int = 256,
+        uri: bool = False,
+    ):
+        self.database = database
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.pragmas = pragmas or {}
+        self.cached_statements = cached_statements
+        self.uri = uri
+
+        self._idle: LifoQueue[sqlite3.Connection] = LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self._stats = {
+            "connections_created": 0,
+            "connections_discarded": 0,
+            "acquired": 0,
+            "waits": 0,
+            "wait_time_ms": 0.0,
+            "timeouts": 0,
+            "in_use": 0,
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.pragmas.get("busy_timeout", 5000) / 1000,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            uri=self.uri,
+        )
+        for name, value in self.pragmas.items():
+            try:
+                conn.execute(f"PRAGMA {name} = {value}")
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Khong the ap dung PRAGMA {name}={value}: {e}")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("SQLite pool da dong.")
+            can_create = self._created < self.pool_size
+            if can_create:
+                self._created += 1
+                self._stats["connections_created"] += 1
+
+        if can_create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        # Pool da day: cho mot ket noi duoc tra lai
+        started = time.perf_counter()
+        with self._lock:
+            self._stats["waits"] += 1
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except Empty:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise TimeoutError(
+                f"Het thoi gian cho ket noi SQLite sau {self.timeout}s (pool_size={self.pool_size})."
+            )
+        with self._lock:
+            self._stats["wait_time_ms"] += (time.perf_counter() - started) * 1000
+        return conn
+
+    def _release(self, conn: sqlite3.Connection, broken: bool = False):
+        if not broken:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error:
+                broken = True
+
+        with self._lock:
+            closed = self._closed
+            if broken or closed:
+                self._created -= 1
+                self._stats["connections_discarded"] += 1
+
+        if broken or closed:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Muon mot ket noi tu pool; rollback neu co loi, tra lai khi xong."""
+        conn = self._acquire()
+        with self._lock:
+            self._stats["acquired"] += 1
+            self._stats["in_use"] += 1
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                broken = True
+            raise
+        finally:
+            with self._lock:
+                self._stats["in_use"] -= 1
+            self._release(conn, broken=broken)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "pool_size": self.pool_size,
+                "open_connections": self._created,
+                "idle": self._idle.qsize(),
+                "cached_statements": self.cached_statements,
+            }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                break
+            with self._lock:
+                self._created -= 1
+            conn.close()
+
+
+_pool: Optional[SQLitePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_sqlite_pool() -> SQLitePool:
+    """Tra ve pool SQLite dung chung cua ung dung (tao lan dau khi can)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SQLitePool(
+                    settings.SQLITE_DB_PATH,
+                    pool_size=settings.SQLITE_POOL_SIZE,
+                    timeout=settings.SQLITE_POOL_TIMEOUT,
+                    pragmas=build_pragmas(),
+                    cached_statements=settings.SQLITE_STATEMENT_CACHE_SIZE,
+                )
+                logger.info(f"Created SQLite pool for {settings.SQLITE_DB_PATH} (size={settings.SQLITE_POOL_SIZE}).")
+    return _pool
+
+
+@contextmanager
+def sqlite_connection() -> Iterator[sqlite3.Connection]:
+    """Context manager cap ket noi SQLite cho cac tool."""
+    with get_sqlite_pool().connection() as conn:
+        yield conn
+
+
+def close_sqlite_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def fetch_all(conn: sqlite3.Connection, query: str, params: Sequence = ()) -> list[dict]:
+    """Chay query va tra ve danh sach dict theo ten cot."""
+    cursor = conn.execute(query, params)
+    try:
+        cols = [c[0] for c in cursor.description]
+        return [dict(zip(cols, row)) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def fetch_one(conn: sqlite3.Connection, query: str, params: Sequence = ()) -> dict | None:
+    """Chay query va tra ve dong dau tien duoi dang dict (hoac None)."""
+    cursor = conn.execute(query, params)
+    try:
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cols = [c[0] for c in cursor.description]
+        return dict(zip(cols, row))
+    finally:
+        cursor.close()
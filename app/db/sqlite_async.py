@@ -0,0 +1,63 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Sequence
+from app.config import settings
+from app.db.sqlite import sqlite_connection, fetch_all, fetch_one
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """Thread pool co gioi han danh rieng cho cac truy van SQLite blocking."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.SQLITE_ASYNC_WORKERS,
+                    thread_name_prefix="sqlite-db",
+                )
+    return _executor
+
+
+def shutdown_db_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+async def run_in_db_executor(fn: Callable, *args, **kwargs) -> Any:
+    """Chay ham blocking tren thread pool DB ma khong chan event loop.
+
+    Context vars (vd. RunnableConfig cua LangChain) duoc copy sang thread.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await loop.run_in_executor(get_db_executor(), call)
+
+
+def _fetch_all(query: str, params: Sequence) -> list[dict]:
+    with sqlite_connection() as conn:
+        return fetch_all(conn, query, params)
+
+
+def _fetch_one(query: str, params: Sequence) -> dict | None:
+    with sqlite_connection() as conn:
+        return fetch_one(conn, query, params)
+
+
+async def afetch_all(query: str, params: Sequence = ()) -> list[dict]:
+    """Phien ban awaitable cua fetch_all, dung pool ket noi chung."""
+    return await run_in_db_executor(_fetch_all, query, params)
+
+
+async def afetch_one(query: str, params: Sequence = ()) -> dict | None:
+    """Phien ban awaitable cua fetch_one, dung pool ket noi chung."""
+    return await run_in_db_executor(_fetch_one, query, params)
@@ -0,0 +1,214 @@
+"""Hang doi ghi duy nhat cho SQLite.
+
+Moi tool ghi gui mot lenh (``WriteCommand``) cho writer thay vi tu mo ket noi ghi.
+Mot thread writer giu ket noi ghi rieng, gom cac lenh dang cho thanh mot batch
+va chay trong mot transaction ``BEGIN IMMEDIATE``; moi lenh nam trong mot
+SAVEPOINT rieng nen lenh loi chi rollback phan cua no. Ket qua tra ve qua Future
+sau khi batch da commit. Doc van dung pool ket noi va chay song song nho WAL.
+
+    result = execute_write(CancelTicketCommand(ticket_no, user_id))
+"""
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Optional
+from app.config import settings
+from app.db.sqlite import build_pragmas
+from app.utils import logger
+
+
+class WriteCommand:
+    """Lenh ghi chay tren writer thread, ben trong transaction cua batch.
+
+    Lop con (thuong la dataclass) cai dat ``apply``; exception trong ``apply``
+    rollback rieng lenh do va duoc nem lai cho caller.
+    """
+
+    name = "write"
+
+    def apply(self, conn: sqlite3.Connection) -> Any:
+        raise NotImplementedError
+
+
+_STOP = object()
+
+
+class SQLiteWriter:
+    """Thread ghi duy nhat, commit theo nhom."""
+
+    def __init__(self, database: str, max_batch: int = 32, batch_wait_ms: float = 2.0):
+        self.database = database
+        self.max_batch = max(1, max_batch)
+        self.batch_wait = batch_wait_ms / 1000
+        self._queue: "queue.Queue[tuple[WriteCommand, Future] | object]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "commands": 0,
+            "failed_commands": 0,
+            "batches": 0,
+            "failed_batches": 0,
+            "max_batch_size": 0,
+            "commit_time_ms": 0.0,
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        pragmas = build_pragmas()
+        conn = sqlite3.connect(
+            self.database,
+            timeout=pragmas["busy_timeout"] / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=settings.SQLITE_STATEMENT_CACHE_SIZE,
+        )
+        for name, value in pragmas.items():
+            try:
+                conn.execute(f"PRAGMA {name} = {value}")
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Khong the ap dung PRAGMA {name}={value}: {e}")
+        return conn
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout=timeout)
+
+    def submit(self, command: WriteCommand) -> Future:
+        if self._thread is None:
+            self.start()
+        future: Future = Future()
+        self._queue.put((command, future))
+        return future
+
+    def _next_batch(self) -> tuple[list[tuple[WriteCommand, Future]], bool]:
+        """Cho lenh dau tien, roi gom them lenh den trong cua so ngan."""
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            stopping = False
+            while not stopping:
+                batch, stopping = self._next_batch()
+                if batch:
+                    self._apply_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _apply_batch(self, conn: sqlite3.Connection, batch: list[tuple[WriteCommand, Future]]):
+        started = time.perf_counter()
+        outcomes: list[tuple[Future, bool, Any]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for index, (command, future) in enumerate(batch):
+                if not future.set_running_or_notify_cancel():
+                    continue
+                savepoint = f"cmd_{index}"
+                conn.execute(f"SAVEPOINT {savepoint}")
+                try:
+                    result = command.apply(conn)
+                except Exception as e:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+                    outcomes.append((future, False, e))
+                else:
+                    conn.execute(f"RELEASE {savepoint}")
+                    outcomes.append((future, True, result))
+            conn.execute("COMMIT")
+        except Exception as e:
+            # Loi o muc batch (khoa, I/O, commit): khong lenh nao duoc ghi
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logger.error(f"SQLite write batch of {len(batch)} failed: {e}")
+            with self._lock:
+                self._stats["failed_batches"] += 1
+                self._stats["failed_commands"] += len(batch)
+            for _, future in batch:
+                if future.done():
+                    continue
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            return
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["commands"] += len(outcomes)
+            self._stats["failed_commands"] += sum(1 for _, ok, _ in outcomes if not ok)
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+            self._stats["commit_time_ms"] += elapsed_ms
+        # Chi bao ket qua sau khi da commit
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["avg_batch_size"] = round(stats["commands"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+
+_writer: Optional[SQLiteWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_sqlite_writer() -> SQLiteWriter:
+    """Writer dung chung cua process (tao va chay lan dau khi can)."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = SQLiteWriter(
+                    settings.SQLITE_DB_PATH,
+                    max_batch=settings.SQLITE_WRITER_MAX_BATCH,
+                    batch_wait_ms=settings.SQLITE_WRITER_BATCH_WAIT_MS,
+                )
+                _writer.start()
+    return _writer
+
+
+def submit_write(command: WriteCommand) -> Future:
+    return get_sqlite_writer().submit(command)
+
+
+def execute_write(command: WriteCommand, timeout: Optional[float] = None) -> Any:
+    """Gui lenh ghi va cho ket qua (da commit); nem lai exception cua lenh neu co."""
+    return submit_write(command).result(timeout=timeout or settings.SQLITE_WRITE_TIMEOUT)
+
+
+def stop_sqlite_writer():
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        logger.info(f"SQLite writer metrics: {writer.metrics()}")
+        writer.stop()
@@ -1,8 +1,30 @@
+import functools
+import httpx
 from langchain_openai import OpenAIEmbeddings
 from app.config import settings
 
 OPEN_AI_API_KEY = settings.OPENAI_API_KEY
 EMBEDDING_MODEL = settings.EMBEDDING_MODEL
 
-def get_embedding_model():
-    return OpenAIEmbeddings(model=EMBEDDING_MODEL, openai_api_key=OPEN_AI_API_KEY)
\ No newline at end of file
+@functools.lru_cache(maxsize=1)
+def get_embedding_model() -> OpenAIEmbeddings:
+    """Client embedding dung chung (giu pool ket noi HTTP keep-alive giua cac lan goi)."""
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=settings.EMBEDDING_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.EMBEDDING_MAX_CONNECTIONS,
+        ),
+        timeout=settings.EMBEDDING_TIMEOUT_SECONDS,
+    )
+    return OpenAIEmbeddings(
+        model=EMBEDDING_MODEL,
+        openai_api_key=OPEN_AI_API_KEY,
+        http_client=http_client,
+    )
+
+def close_embedding_model():
+    if get_embedding_model.cache_info().currsize:
+        client = get_embedding_model().http_client
+        if client is not None:
+            client.close()
+        get_embedding_model.cache_clear()
@@ -0,0 +1,149 @@
+import difflib
+import threading
+from typing import Iterable, Optional
+from app.db.catalog_snapshot import catalog_connection
+from app.db.sqlite import fetch_all
+from app.utils import logger
+from app.utils.text_normalize import normalize_text
+
+# Ten goi thong dung -> ma san bay (chi ap dung neu ma co trong airports_data)
+AIRPORT_ALIASES = {
+    "sai gon": "SGN",
+    "saigon": "SGN",
+    "ho chi minh": "SGN",
+    "tp hcm": "SGN",
+    "tphcm": "SGN",
+    "hcm": "SGN",
+    "hcmc": "SGN",
+    "ha noi": "HAN",
+    "hanoi": "HAN",
+    "da nang": "DAD",
+    "danang": "DAD",
+    "nha trang": "CXR",
+    "khanh hoa": "CXR",
+    "phu quoc": "PQC",
+    "hue": "HUI",
+    "da lat": "DLI",
+    "dalat": "DLI",
+    "lam dong": "DLI",
+    "hai phong": "HPH",
+    "nghe an": "VII",
+    "can tho": "VCA",
+    "con dao": "VCS",
+    "quy nhon": "UIH",
+    "binh dinh": "UIH",
+    "buon ma thuot": "BMV",
+    "dak lak": "BMV",
+    "pleiku": "PXU",
+    "gia lai": "PXU",
+    "dong hoi": "VDH",
+    "quang binh": "VDH",
+    "quang nam": "VCL",
+    "tuy hoa": "TBB",
+    "phu yen": "TBB",
+    "ca mau": "CAH",
+    "rach gia": "VKG",
+    "kien giang": "VKG",
+    "thanh hoa": "THD",
+    "dien bien": "DIN",
+    "quang ninh": "VDO",
+    "ha long": "VDO",
+}
+
+# Tu chung trong ten san bay/thanh pho, bo di truoc khi so khop
+_STOP_PREFIXES = ("san bay quoc te ", "san bay ", "thanh pho ", "tp ")
+
+
+def _clean(text: str) -> str:
+    key = normalize_text(text, strip_punctuation=True)
+    for prefix in _STOP_PREFIXES:
+        if key.startswith(prefix):
+            key = key[len(prefix):]
+    return key.strip()
+
+
+class AirportResolver:
+    """Chuyen chuoi tu do (ten san bay, thanh pho, ma, ten goi khac) thanh tap ma san bay."""
+
+    def __init__(self, airports: Iterable[dict], aliases: Optional[dict] = None):
+        self.codes: set[str] = set()
+        self.names: dict[str, str] = {}
+        self._index: dict[str, set[str]] = {}
+
+        for airport in airports:
+            code = (airport.get("airport_code") or "").upper()
+            if not code:
+                continue
+            self.codes.add(code)
+            self.names[code] = airport.get("airport_name") or code
+            for value in (airport.get("airport_name"), airport.get("city")):
+                if value:
+                    self._add_key(_clean(value), code)
+
+        for alias, code in (aliases or {}).items():
+            if code in self.codes:
+                self._add_key(_clean(alias), code)
+        self._keys = list(self._index)
+
+    def _add_key(self, key: str, code: str):
+        if key:
+            self._index.setdefault(key, set()).add(code)
+
+    def resolve(self, text: Optional[str], fuzzy_cutoff: float = 0.8) -> set[str]:
+        """Tra ve tap ma san bay khop voi ``text`` (rong neu khong khop gi)."""
+        if not text or not text.strip():
+            return set()
+
+        raw = text.strip().upper()
+        if raw in self.codes:
+            return {raw}
+
+        key = _clean(text)
+        if not key:
+            return set()
+
+        # 1. Khop chinh xac ten / thanh pho / alias
+        if key in self._index:
+            return set(self._index[key])
+
+        # 2. Khop tien to theo tu hoac chuoi con (tuong duong LIKE '%x%' nhung khong phan biet dau)
+        matches: set[str] = set()
+        padded = f" {key}"
+        for candidate, codes in self._index.items():
+            if padded in f" {candidate}" or (len(key) >= 4 and key in candidate):
+                matches |= codes
+        if matches:
+            return matches
+
+        # 3. Khop gan dung (go sai chinh ta)
+        for candidate in difflib.get_close_matches(key, self._keys, n=3, cutoff=fuzzy_cutoff):
+            matches |= self._index[candidate]
+        return matches
+
+
+_resolver: Optional[AirportResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def load_airport_resolver() -> AirportResolver:
+    with catalog_connection() as conn:
+        airports = fetch_all(conn, "SELECT airport_code, airport_name, city FROM airports_data")
+    resolver = AirportResolver(airports, AIRPORT_ALIASES)
+    logger.info(f"Loaded airport resolver with {len(resolver.codes)} airports.")
+    return resolver
+
+
+def get_airport_resolver() -> AirportResolver:
+    """Resolver dung chung, nap mot lan tu airports_data."""
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = load_airport_resolver()
+    return _resolver
+
+
+def reset_airport_resolver():
+    global _resolver
+    with _resolver_lock:
+        _resolver = None
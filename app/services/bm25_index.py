@@ -0,0 +1,131 @@
+"""Chi muc tu vung BM25 cho cac chunk chinh sach (tim kiem lai voi vector).
+
+Tieng Viet viet theo am tiet nen token gom cac am tiet da bo dau ("hanh", "ly")
+va cap am tiet lien nhau ("hanh_ly", "xach_tay") de giu nghia tu ghep; so va don
+vi dinh nhau duoc tach rieng ("7kg" -> "7", "kg"). Cau hoi go khong dau van khop
+voi tai lieu co dau.
+
+Chi muc luu canh chi muc vector trong ``LOCAL_INDEX_DIR`` thanh ``<name>.bm25.json``.
+"""
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+from typing import Optional, Sequence
+from app.utils import logger
+from app.utils.text_normalize import normalize_text
+
+RECORD_FIELDS = ("id", "heading", "type", "content")
+
+_TOKEN_RE = re.compile(r"\d+(?:[.,]\d+)?|[^\W\d_]+", re.UNICODE)
+
+# Hu tu pho bien (da bo dau). Khong bo "khong" (doi nghia chinh sach) va cac tu
+# trung voi tu quan trong sau khi bo dau: "ve" (ve may bay), "ma" (ma giam gia), "toi" (toi da).
+STOPWORDS = frozenset({
+    "la", "va", "cua", "cho", "cac", "nhung", "mot", "duoc", "trong", "thi",
+    "voi", "nay", "gi", "nao",
+})
+
+
+def tokenize(text: str) -> list[str]:
+    syllables = _TOKEN_RE.findall(normalize_text(text or "", fold_diacritics=True))
+    tokens = [s for s in syllables if s not in STOPWORDS]
+    tokens.extend(f"{a}_{b}" for a, b in zip(syllables, syllables[1:]))
+    return tokens
+
+
+def bm25_path(directory: str, name: str) -> str:
+    return os.path.join(directory, f"{name}.bm25.json")
+
+
+class BM25Index:
+    """Inverted index: term -> [(dong, tan suat)], cham diem Okapi BM25."""
+
+    def __init__(
+        self,
+        name: str,
+        records: list[dict],
+        postings: Optional[dict[str, list]] = None,
+        doc_len: Optional[list[int]] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.name = name
+        self.records = records
+        self.k1 = k1
+        self.b = b
+        if postings is None or doc_len is None:
+            postings, doc_len = self._build(records)
+        self.postings = postings
+        self.doc_len = doc_len
+        self.avg_len = (sum(self.doc_len) / len(self.doc_len)) if self.doc_len else 0.0
+        count = len(records)
+        self.idf = {
+            term: math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+        self.loaded_at = time.time()
+
+    @staticmethod
+    def _build(records: list[dict]) -> tuple[dict[str, list], list[int]]:
+        postings: dict[str, list] = {}
+        doc_len: list[int] = []
+        for i, record in enumerate(records):
+            text = " ".join(filter(None, (record.get("heading"), record.get("content"))))
+            counts = Counter(tokenize(text))
+            doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((i, tf))
+        return postings, doc_len
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def search(self, query: str, top_k: int = 3) -> list[dict]:
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[i] / (self.avg_len or 1))
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [{**self.records[i], "score": score} for i, score in ranked]
+
+    @classmethod
+    def load(cls, directory: str, name: str) -> Optional["BM25Index"]:
+        path = bm25_path(directory, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(name, data["records"], data.get("postings"), data.get("doc_len"))
+
+    @classmethod
+    def write(cls, directory: str, name: str, records: Sequence[dict]) -> "BM25Index":
+        """Xay chi muc tu cac chunk va luu (thay the nguyen tu file cu)."""
+        os.makedirs(directory, exist_ok=True)
+        path = bm25_path(directory, name)
+        index = cls(name, [{field: record.get(field) for field in RECORD_FIELDS} for record in records])
+        data = {"records": index.records, "postings": index.postings, "doc_len": index.doc_len}
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        logger.info(f"Built BM25 index '{name}' ({len(index)} chunks, {len(index.postings)} terms).")
+        return index
+
+
+def reciprocal_rank_fusion(result_lists: Sequence[list[dict]], top_k: int, k: int = 60) -> list[dict]:
+    """Gop nhieu danh sach hit theo RRF: diem = tong 1 / (k + hang)."""
+    fused: dict = {}
+    hits: dict = {}
+    for results in result_lists:
+        for rank, hit in enumerate(results, start=1):
+            fused[hit["id"]] = fused.get(hit["id"], 0.0) + 1.0 / (k + rank)
+            hits.setdefault(hit["id"], hit)
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [{**hits[hit_id], "score": score} for hit_id, score in ranked]
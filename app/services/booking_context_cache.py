@@ -0,0 +1,98 @@
+"""Cache ngu canh dat cho (chuyen bay) theo tung nguoi dung.
+
+Key = user_id + so phien ban booking. Moi tool ghi (doi/huy ve, dat/huy phong)
+goi ``bump_booking_version`` sau khi commit, nen ngu canh da cache chi duoc
+dung lai khi chua co thay doi nao ke tu lan nap truoc. Tang 1 la dict trong
+process, tang 2 la Redis (dung chung giua cac worker) neu co cau hinh.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+from app.config import settings
+from app.core.memory import safe_redis_call
+
+VERSION_KEY = "booking_ctx:version:{user_id}"
+CONTEXT_KEY = "booking_ctx:data:{user_id}:{version}"
+
+_lock = threading.Lock()
+# user_id -> (version, expires_at, context)
+_local: "OrderedDict[str, tuple[int, float, Any]]" = OrderedDict()
+# Phien ban trong process, dung khi khong co Redis
+_local_versions: dict[str, int] = {}
+_stats = {"hits": 0, "redis_hits": 0, "misses": 0, "bumps": 0}
+
+
+def _redis_call(fn: Callable, default=None):
+    return safe_redis_call(fn, default, label="Booking context cache")
+
+
+def get_booking_version(user_id: str) -> int:
+    """Phien ban booking hien tai cua nguoi dung (Redis neu co, khong thi trong process)."""
+    raw = _redis_call(lambda r: r.get(VERSION_KEY.format(user_id=user_id)))
+    if raw is not None:
+        return int(raw)
+    with _lock:
+        return _local_versions.get(user_id, 0)
+
+
+def bump_booking_version(user_id: str) -> int:
+    """Danh dau booking cua nguoi dung da thay doi; goi sau khi tool ghi commit."""
+    if not user_id:
+        return 0
+    with _lock:
+        _stats["bumps"] += 1
+        _local.pop(user_id, None)
+        version = _local_versions.get(user_id, 0) + 1
+        _local_versions[user_id] = version
+    redis_version = _redis_call(lambda r: r.incr(VERSION_KEY.format(user_id=user_id)))
+    return int(redis_version) if redis_version is not None else version
+
+
+def get_booking_context(user_id: str, loader: Callable[[], Any]) -> Any:
+    """Tra ve ngu canh da cache neu con dung phien ban, neu khong thi goi ``loader``."""
+    version = get_booking_version(user_id)
+
+    with _lock:
+        cached = _local.get(user_id)
+        if cached is not None and cached[0] == version and cached[1] > time.monotonic():
+            _local.move_to_end(user_id)
+            _stats["hits"] += 1
+            return cached[2]
+
+    context_key = CONTEXT_KEY.format(user_id=user_id, version=version)
+    raw = _redis_call(lambda r: r.get(context_key))
+    if raw is not None:
+        context = json.loads(raw)
+        with _lock:
+            _stats["redis_hits"] += 1
+        _store_local(user_id, version, context)
+        return context
+
+    with _lock:
+        _stats["misses"] += 1
+    context = loader()
+    _store_local(user_id, version, context)
+    _redis_call(
+        lambda r: r.set(
+            context_key,
+            json.dumps(context, default=str, ensure_ascii=False),
+            ex=settings.BOOKING_CONTEXT_CACHE_TTL_SECONDS,
+        )
+    )
+    return context
+
+
+def _store_local(user_id: str, version: int, context: Any):
+    with _lock:
+        expires_at = time.monotonic() + settings.BOOKING_CONTEXT_CACHE_TTL_SECONDS
+        _local[user_id] = (version, expires_at, context)
+        _local.move_to_end(user_id)
+        while len(_local) > settings.BOOKING_CONTEXT_CACHE_MAX_USERS:
+            _local.popitem(last=False)
+
+
+def booking_context_metrics() -> dict:
+    with _lock:
+        return {**_stats, "cached_users": len(_local)}
@@ -0,0 +1,170 @@
+"""Cache vector embedding (LRU trong process + Redis) dat truoc client embedding.
+
+Key = model + so chieu + van ban da chuan hoa (casefold, gop khoang trang, tuy chon
+bo dau), nen cac cau hoi chinh sach lap lai ("hanh ly xach tay bao nhieu kg") khong
+phai goi API embedding nua. Vector luu tren Redis dang float32 nhi phan cho gon.
+
+``CachedEmbeddings`` cai dat giao dien ``Embeddings`` cua langchain nen dung duoc
+cho ca truy van (``embed_query``) lan ingest (``embed_documents``).
+"""
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Optional
+from langchain_core.embeddings import Embeddings
+from app.config import settings
+from app.core.memory import safe_redis_call
+from app.utils.text_normalize import normalize_text
+
+ENTRY_KEY = "embedding_cache:{key}"
+
+
+def embedding_cache_key(text: str, model: str, dimension: int, fold_diacritics: bool = False) -> str:
+    normalized = normalize_text(text, fold_diacritics=fold_diacritics)
+    return hashlib.sha256(f"{model}:{dimension}:{normalized}".encode("utf-8")).hexdigest()
+
+
+def _pack(vector: list[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(payload: bytes) -> list[float]:
+    values = array("f")
+    values.frombytes(payload)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """LRU vector trong process, co the dung chung qua Redis."""
+
+    def __init__(self, maxsize: int, ttl: int, use_redis: bool = True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self._entries: "OrderedDict[str, list[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "evictions": 0}
+
+    def _redis(self, fn, default=None):
+        if not self.use_redis:
+            return default
+        return safe_redis_call(fn, default, label="Embedding cache")
+
+    def _store_local(self, key: str, vector: list[float]):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def get_many(self, keys: list[str]) -> list[Optional[list[float]]]:
+        found: list[Optional[list[float]]] = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[i] = vector
+            self._stats["local_hits"] += sum(1 for v in found if v is not None)
+
+        missing = [i for i, v in enumerate(found) if v is None]
+        if missing:
+            payloads = self._redis(lambda r: r.mget([ENTRY_KEY.format(key=keys[i]) for i in missing]))
+            for i, payload in zip(missing, payloads or []):
+                if payload is not None:
+                    found[i] = _unpack(payload)
+                    self._store_local(keys[i], found[i])
+            redis_hits = sum(1 for i in missing if found[i] is not None)
+            with self._lock:
+                self._stats["redis_hits"] += redis_hits
+                self._stats["misses"] += len(missing) - redis_hits
+        return found
+
+    def set_many(self, items: dict[str, list[float]]):
+        if not items:
+            return
+        for key, vector in items.items():
+            self._store_local(key, vector)
+
+        def write(r):
+            pipe = r.pipeline(transaction=False)
+            for key, vector in items.items():
+                pipe.set(ENTRY_KEY.format(key=key), _pack(vector), ex=self.ttl)
+            pipe.execute()
+
+        self._redis(write)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        stats["maxsize"] = self.maxsize
+        total = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["local_hits"] + stats["redis_hits"]) / total, 4) if total else 0.0
+        return stats
+
+
+_cache = EmbeddingCache(
+    maxsize=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+    ttl=settings.EMBEDDING_CACHE_TTL_SECONDS,
+    use_redis=settings.EMBEDDING_CACHE_USE_REDIS,
+)
+
+
+class CachedEmbeddings(Embeddings):
+    """Boc client embedding: chi goi API cho van ban chua co trong cache."""
+
+    def __init__(self, embeddings: Embeddings, model: str, dimension: int, cache: EmbeddingCache = _cache):
+        self.embeddings = embeddings
+        self.model = model
+        self.dimension = dimension
+        self.cache = cache
+
+    def _keys(self, texts: list[str]) -> list[str]:
+        fold = settings.EMBEDDING_CACHE_FOLD_DIACRITICS
+        return [embedding_cache_key(text, self.model, self.dimension, fold) for text in texts]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not settings.EMBEDDING_CACHE_ENABLED or not texts:
+            return self.embeddings.embed_documents(texts)
+        keys = self._keys(texts)
+        vectors = self.cache.get_many(keys)
+
+        # Van ban trung key trong cung batch chi embed mot lan
+        pending: dict[str, str] = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None and key not in pending:
+                pending[key] = text
+        if pending:
+            fresh = dict(zip(pending, self.embeddings.embed_documents(list(pending.values()))))
+            self.cache.set_many(fresh)
+            vectors = [vector if vector is not None else fresh[key] for key, vector in zip(keys, vectors)]
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        if not settings.EMBEDDING_CACHE_ENABLED:
+            return self.embeddings.embed_query(text)
+        key = self._keys([text])[0]
+        vector = self.cache.get_many([key])[0]
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.set_many({key: vector})
+        return vector
+
+
+def cached_embeddings(embeddings: Embeddings) -> CachedEmbeddings:
+    return CachedEmbeddings(embeddings, settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSION)
+
+
+def clear_embedding_cache():
+    _cache.clear()
+
+
+def embedding_cache_metrics() -> dict:
+    return _cache.metrics()
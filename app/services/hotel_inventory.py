@@ -0,0 +1,145 @@
+"""Ton kho phong khach san theo dem.
+
+Bang ``hotel_room_inventory(room_type_id, night, booked)`` (xem migration 003)
+luu so phong da dat cua moi loai phong cho tung dem. Kiem tra con phong cho mot
+ky luu tru chi doc cac dong cua nhung dem do qua khoa chinh, nen chi phi ti le
+voi so dem chu khong phu thuoc so booking.
+
+Cac ham ``reserve_rooms``/``release_rooms`` phai duoc goi trong transaction ghi
+(``BEGIN IMMEDIATE``) cung voi thao tac tren ``hotel_bookings``.
+"""
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Sequence
+
+ROOM_CAPACITY_QUERY = "SELECT total_rooms FROM hotel_room_types WHERE room_type_id = ?"
+
+MAX_BOOKED_QUERY = """
+SELECT COALESCE(MAX(booked), 0)
+FROM hotel_room_inventory
+WHERE room_type_id = ? AND night >= ? AND night < ?
+"""
+
+ENSURE_NIGHT_QUERY = """
+INSERT INTO hotel_room_inventory (room_type_id, night, booked)
+VALUES (?, ?, 0)
+ON CONFLICT (room_type_id, night) DO NOTHING
+"""
+
+BOOK_NIGHTS_QUERY = """
+UPDATE hotel_room_inventory
+SET booked = booked + ?
+WHERE room_type_id = ? AND night >= ? AND night < ?
+"""
+
+RELEASE_NIGHTS_QUERY = """
+UPDATE hotel_room_inventory
+SET booked = MAX(booked - ?, 0)
+WHERE room_type_id = ? AND night >= ? AND night < ?
+"""
+
+# Dieu kien "loai phong rt con trong moi dem cua [checkin, checkout)"; 2 tham so ngay
+ROOM_TYPE_AVAILABLE_SQL = """
+    rt.total_rooms > 0
+    AND NOT EXISTS (
+        SELECT 1
+        FROM hotel_room_inventory inv
+        WHERE inv.room_type_id = rt.room_type_id
+            AND inv.night >= ? AND inv.night < ?
+            AND inv.booked >= rt.total_rooms
+    )
+"""
+
+AVAILABLE_ROOM_TYPES_QUERY = f"""
+SELECT
+    rt.room_type_id,
+    rt.room_name,
+    rt.base_price,
+    rt.max_guests
+FROM hotel_room_types rt
+WHERE rt.hotel_id = ?
+    AND {ROOM_TYPE_AVAILABLE_SQL}
+ORDER BY rt.base_price ASC
+"""
+
+
+class RoomUnavailableError(ValueError):
+    """Loai phong da het cho it nhat mot dem trong khoang ngay yeu cau."""
+
+
+def to_date(value: date | datetime | str) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def stay_range(checkin: date | datetime | str, checkout: date | datetime | str) -> tuple[str, str]:
+    """(dem dau tien, ngay tra phong) dang 'YYYY-MM-DD'; checkout khong tinh."""
+    start, end = to_date(checkin), to_date(checkout)
+    if end <= start:
+        raise ValueError("Ngay checkout phai sau ngay checkin.")
+    return start.isoformat(), end.isoformat()
+
+
+def stay_nights(checkin: date | datetime | str, checkout: date | datetime | str) -> list[str]:
+    start, end = stay_range(checkin, checkout)
+    first = date.fromisoformat(start)
+    return [
+        (first + timedelta(days=i)).isoformat()
+        for i in range((date.fromisoformat(end) - first).days)
+    ]
+
+
+def is_available(
+    conn: sqlite3.Connection,
+    room_type_id: int,
+    checkin: date | datetime | str,
+    checkout: date | datetime | str,
+    rooms: int = 1,
+) -> bool:
+    row = conn.execute(ROOM_CAPACITY_QUERY, (room_type_id,)).fetchone()
+    if row is None:
+        return False
+    start, end = stay_range(checkin, checkout)
+    booked = conn.execute(MAX_BOOKED_QUERY, (room_type_id, start, end)).fetchone()[0]
+    return booked + rooms <= (row[0] or 0)
+
+
+def reserve_rooms(
+    conn: sqlite3.Connection,
+    room_type_id: int,
+    checkin: date | datetime | str,
+    checkout: date | datetime | str,
+    rooms: int = 1,
+):
+    """Tru ton kho cho moi dem; nem RoomUnavailableError neu co dem da het phong.
+
+    Goi trong ``BEGIN IMMEDIATE`` de kiem tra va cap nhat la mot buoc nguyen tu.
+    """
+    if not is_available(conn, room_type_id, checkin, checkout, rooms):
+        raise RoomUnavailableError("Loai phong da het cho trong khoang ngay da chon.")
+    start, end = stay_range(checkin, checkout)
+    conn.executemany(
+        ENSURE_NIGHT_QUERY,
+        [(room_type_id, night) for night in stay_nights(checkin, checkout)],
+    )
+    conn.execute(BOOK_NIGHTS_QUERY, (rooms, room_type_id, start, end))
+
+
+def release_rooms(
+    conn: sqlite3.Connection,
+    room_type_id: int,
+    checkin: date | datetime | str,
+    checkout: date | datetime | str,
+    rooms: int = 1,
+):
+    """Tra lai ton kho khi huy booking."""
+    start, end = stay_range(checkin, checkout)
+    conn.execute(RELEASE_NIGHTS_QUERY, (rooms, room_type_id, start, end))
+
+
+def availability_params(checkin: date | datetime | str, checkout: date | datetime | str) -> Sequence[str]:
+    """Tham so cho ``ROOM_TYPE_AVAILABLE_SQL``."""
+    return stay_range(checkin, checkout)
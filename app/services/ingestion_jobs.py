@@ -0,0 +1,389 @@
+"""Job ingest tai lieu chay nen cho ``/milvus/upload-doc``.
+
+Upload chi luu file vao ``INGEST_JOB_DIR``, ghi ban ghi ``ingestion_jobs``
+(migration 007) va tra ``job_id`` ngay. Moi job chay tren thread pool
+``INGEST_MAX_CONCURRENT_JOBS``: buoc chuyen DOCX -> chunk (Docling, nang CPU)
+chay trong process pool ``INGEST_PROCESS_WORKERS``, buoc embedding + upsert
+dung pipeline cua ``upload_chunks_to_milvus``. Trang thai:
+
+    queued -> converting -> embedding -> done | failed
+
+Khi khoi dong lai, job chua xong duoc chay lai tu dau (id chunk on dinh nen
+upsert lai khong tao ban trung); job da thu ``INGEST_JOB_MAX_ATTEMPTS`` lan bi
+danh dau failed de khong lap vo han. Process con chet giua chung (OOM, crash
+Docling) lam hong ca process pool: pool duoc tao lai va cac job dang dung no
+duoc dua lai vao hang doi thay vi bi danh dau failed; chi job process con da
+thuc su bat dau chuyen doi moi bi tinh them mot lan thu.
+"""
+import json
+import multiprocessing
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+from app.config import settings
+from app.db.sqlite import fetch_all, fetch_one, sqlite_connection
+from app.db.sqlite_writer import WriteCommand, execute_write, submit_write
+from app.utils import logger
+
+ACTIVE_STATUSES = ("queued", "converting", "embedding")
+JOB_COLUMNS = frozenset({"status", "total_chunks", "processed_chunks", "attempts", "result", "error"})
+
+INSERT_JOB_QUERY = """
+INSERT INTO ingestion_jobs (
+    job_id, status, collection_name, doc_id, file_name, file_path, created_at, updated_at
+) VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)
+"""
+
+JOB_QUERY = "SELECT * FROM ingestion_jobs WHERE job_id = ?"
+
+ACTIVE_JOBS_QUERY = f"""
+SELECT * FROM ingestion_jobs
+WHERE status IN ({", ".join("?" * len(ACTIVE_STATUSES))})
+ORDER BY created_at
+"""
+
+
+class JobQueueFullError(RuntimeError):
+    pass
+
+
+@dataclass
+class CreateJobCommand(WriteCommand):
+    job_id: str
+    collection_name: str
+    doc_id: str
+    file_name: str
+    file_path: str
+    name = "create_ingestion_job"
+
+    def apply(self, conn: sqlite3.Connection) -> Any:
+        now = time.time()
+        conn.execute(
+            INSERT_JOB_QUERY,
+            (self.job_id, self.collection_name, self.doc_id, self.file_name, self.file_path, now, now),
+        )
+        return self.job_id
+
+
+@dataclass
+class UpdateJobCommand(WriteCommand):
+    job_id: str
+    values: dict = field(default_factory=dict)
+    name = "update_ingestion_job"
+
+    def apply(self, conn: sqlite3.Connection) -> Any:
+        columns = [c for c in self.values if c in JOB_COLUMNS]
+        assignments = ", ".join(f"{c} = ?" for c in columns)
+        conn.execute(
+            f"UPDATE ingestion_jobs SET {assignments}, updated_at = ? WHERE job_id = ?",
+            (*(self.values[c] for c in columns), time.time(), self.job_id),
+        )
+
+
+def _update_job(job_id: str, wait: bool = True, **values):
+    command = UpdateJobCommand(job_id, values)
+    if wait:
+        execute_write(command)
+    else:
+        submit_write(command)
+
+
+def get_ingestion_job(job_id: str) -> Optional[dict]:
+    with sqlite_connection() as conn:
+        job = fetch_one(conn, JOB_QUERY, (job_id,))
+    if job and job.get("result"):
+        job["result"] = json.loads(job["result"])
+    return job
+
+
+def _warm_worker():
+    from app.services.milvus_service import warm_document_converter
+
+    warm_document_converter()
+
+
+def convert_document_file(file_path: str, file_name: str, out_queue, started=None) -> int:
+    """Chay trong process con: doc file da luu, day tung chunk vao ``out_queue``.
+
+    ``started`` (Event) duoc bat khi process con thuc su nhan job, de chi tinh lan
+    thu cho job dang chay (khong tinh job con cho trong pool). Luon ket thuc bang
+    ``None`` (ke ca khi loi) de ben nhan khong cho mai.
+    """
+    from app.services.milvus_service import iter_docx_chunks
+
+    if started is not None:
+        started.set()
+    count = 0
+    try:
+        with open(file_path, "rb") as f:
+            file_bytes = f.read()
+        for chunk in iter_docx_chunks(file_bytes, file_name):
+            out_queue.put(chunk)
+            count += 1
+    finally:
+        out_queue.put(None)
+    return count
+
+
+class IngestionJobRunner:
+    """Thread pool chay job + process pool cho buoc chuyen doi tai lieu."""
+
+    def __init__(self, max_jobs: int, process_workers: int, max_pending: int, queue_size: int):
+        self.max_pending = max_pending
+        self._jobs = ThreadPoolExecutor(max(1, max_jobs), thread_name_prefix="ingest-job")
+        # spawn: process con khong ke thua lock/thread cua app dang chay
+        self._context = multiprocessing.get_context("spawn")
+        self.process_workers = max(1, process_workers)
+        self._processes = self._new_process_pool()
+        # Queue chuyen chunk tu process con ve thread job (co gioi han bo nho)
+        self._manager = self._context.Manager()
+        self.queue_size = queue_size
+        self._active: set[str] = set()
+        self._lock = threading.Lock()
+        self._stopping = False
+        self._stats = {"submitted": 0, "done": 0, "failed": 0, "resumed": 0, "requeued": 0, "pool_restarts": 0}
+
+    def _new_process_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(self.process_workers, mp_context=self._context, initializer=_warm_worker)
+
+    def _restart_processes(self, broken: ProcessPoolExecutor):
+        """Thay process pool da hong (process con chet giua chung: OOM, crash Docling)."""
+        with self._lock:
+            if self._processes is broken and not self._stopping:
+                self._processes = self._new_process_pool()
+                self._stats["pool_restarts"] += 1
+                logger.warning("Ingestion process pool broken, started a new one.")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit_conversion(self, job: dict, out_queue, started) -> tuple[ProcessPoolExecutor, Future]:
+        for _ in range(2):
+            with self._lock:
+                pool = self._processes
+            try:
+                return pool, pool.submit(
+                    convert_document_file, job["file_path"], job["file_name"], out_queue, started
+                )
+            except BrokenProcessPool:
+                # Pool hong tu job khac: khoi tao lai, khong tinh vao lan thu cua job nay
+                self._restart_processes(pool)
+        raise BrokenProcessPool("Khong khoi tao lai duoc process pool ingest.")
+
+    def reserve(self, job_id: str):
+        """Giu cho cho job moi; kiem tra va them trong cung mot lan khoa."""
+        with self._lock:
+            if len(self._active) >= self.max_pending:
+                raise JobQueueFullError(f"Dang co {len(self._active)} job ingest, thu lai sau.")
+            self._active.add(job_id)
+
+    def release(self, job_id: str):
+        with self._lock:
+            self._active.discard(job_id)
+
+    def submit(self, job_id: str):
+        with self._lock:
+            self._active.add(job_id)
+            self._stats["submitted"] += 1
+        self._jobs.submit(self._run, job_id)
+
+    def _run(self, job_id: str):
+        job = get_ingestion_job(job_id)
+        pool = started = None
+        requeue = False
+
+        def attempts() -> int:
+            # Chi tinh lan thu khi process con da bat dau chuyen doi job nay
+            ran = started is not None and started.is_set()
+            return job["attempts"] + int(ran)
+
+        try:
+            if job is None or job["status"] not in ACTIVE_STATUSES:
+                return
+            if job["attempts"] >= settings.INGEST_JOB_MAX_ATTEMPTS:
+                raise RuntimeError(f"Job da chay {job['attempts']} lan khong thanh cong.")
+            _update_job(job_id, status="converting", total_chunks=None, processed_chunks=0, error=None)
+            out_queue = self._manager.Queue(self.queue_size)
+            started = self._manager.Event()
+            pool, future = self._submit_conversion(job, out_queue, started)
+
+            from app.services.milvus_service import upload_chunks_to_milvus
+
+            # Tu day process con dang day chunk vao queue: moi loi deu phai xa queue
+            chunks = None
+            try:
+                chunks = self._stream_chunks(job_id, future, out_queue)
+                result = upload_chunks_to_milvus(
+                    chunks,
+                    job["collection_name"],
+                    job["doc_id"],
+                    progress=lambda stats: _update_job(job_id, wait=False, processed_chunks=stats["chunks"]),
+                )
+            finally:
+                if chunks is not None:
+                    chunks.close()
+                self._drain(future, out_queue)
+            _update_job(
+                job_id,
+                status="done",
+                attempts=attempts(),
+                total_chunks=future.result(),
+                processed_chunks=result["chunks"],
+                result=json.dumps(result, ensure_ascii=False),
+            )
+            self._finish(job, "done")
+        except BrokenProcessPool as e:
+            if pool is not None:
+                self._restart_processes(pool)
+            if self._stopping:
+                return
+            # Dua lai vao hang doi (van giu file). Chi job dang chay khi pool hong bi
+            # tinh lan thu, nen job gay crash lap lai dung o INGEST_JOB_MAX_ATTEMPTS
+            # con job chi dang cho trong pool thi khong bi anh huong
+            logger.warning(f"Ingestion job {job_id} lost its worker process, requeued: {e}")
+            _update_job(job_id, status="queued", attempts=attempts(), error=str(e))
+            requeue = True
+        except Exception as e:
+            if self._stopping:
+                # Loi do dang tat app: giu trang thai de lan khoi dong sau chay lai
+                logger.warning(f"Ingestion job {job_id} interrupted by shutdown: {e}")
+                return
+            logger.error(f"Ingestion job {job_id} failed: {e}")
+            try:
+                _update_job(job_id, status="failed", attempts=attempts(), error=str(e))
+            except Exception as update_error:
+                logger.error(f"Cannot mark ingestion job {job_id} failed: {update_error}")
+            self._finish(job, "failed")
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+                if requeue:
+                    self._stats["requeued"] += 1
+        if requeue:
+            self.submit(job_id)
+
+    @staticmethod
+    def _stream_chunks(job_id: str, future: Future, out_queue) -> Iterator[dict]:
+        """Sinh chunk ngay khi process con tao ra; loi chuyen doi duoc nem lai o day.
+
+        Nem loi truoc khi het chunk lam ``upload_chunks_to_milvus`` dung truoc buoc
+        xoa chunk cu, nen tai lieu chuyen doi do dang khong xoa mat du lieu.
+        """
+        started = worker_done = False
+        while True:
+            try:
+                # Process con da xong: chi lay not phan con lai trong queue
+                item = out_queue.get_nowait() if worker_done else out_queue.get(timeout=1)
+            except queue.Empty:
+                if worker_done:
+                    future.result()
+                    raise RuntimeError("Process chuyen doi dung ma khong gui het chunk.")
+                # Con co the vua put chunk cuoi + None giua get() va done(): xa queue truoc
+                worker_done = future.done()
+                continue
+            if item is None:
+                future.result()
+                return
+            if not started:
+                # Chunk dau tien da toi: embedding chay song song voi chuyen doi
+                _update_job(job_id, wait=False, status="embedding")
+                started = True
+            yield item
+
+    @staticmethod
+    def _drain(future: Future, out_queue):
+        """Xa queue khi dung giua chung de process con khong bi chan o put()."""
+        while not future.done():
+            try:
+                if out_queue.get(timeout=1) is None:
+                    return
+            except queue.Empty:
+                pass
+
+    def _finish(self, job: Optional[dict], outcome: str):
+        with self._lock:
+            self._stats[outcome] += 1
+        if job and os.path.exists(job["file_path"]):
+            os.remove(job["file_path"])
+
+    def resume(self) -> int:
+        """Dua lai vao hang doi cac job chua xong tu lan chay truoc."""
+        with sqlite_connection() as conn:
+            jobs = fetch_all(conn, ACTIVE_JOBS_QUERY, ACTIVE_STATUSES)
+        for job in jobs:
+            self.submit(job["job_id"])
+        with self._lock:
+            self._stats["resumed"] += len(jobs)
+        return len(jobs)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["active"] = len(self._active)
+        return stats
+
+    def shutdown(self):
+        # Job dang chay giu trang thai cu, lan khoi dong sau se chay lai
+        self._stopping = True
+        self._jobs.shutdown(wait=False, cancel_futures=True)
+        self._processes.shutdown(wait=False, cancel_futures=True)
+        self._manager.shutdown()
+
+
+_runner: Optional[IngestionJobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_ingestion_runner() -> IngestionJobRunner:
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = IngestionJobRunner(
+                    max_jobs=settings.INGEST_MAX_CONCURRENT_JOBS,
+                    process_workers=settings.INGEST_PROCESS_WORKERS,
+                    max_pending=settings.INGEST_MAX_PENDING_JOBS,
+                    queue_size=settings.INGEST_EMBED_BATCH_SIZE * (settings.INGEST_EMBED_CONCURRENCY + 1),
+                )
+    return _runner
+
+
+def submit_ingestion_job(file_bytes: bytes, file_name: str, collection_name: str, doc_id: str) -> str:
+    """Luu file, tao ban ghi job va dua vao hang doi; tra ve job_id."""
+    runner = get_ingestion_runner()
+    job_id = uuid.uuid4().hex
+    runner.reserve(job_id)
+    file_path = os.path.join(settings.INGEST_JOB_DIR, f"{job_id}{os.path.splitext(file_name)[1]}")
+    try:
+        os.makedirs(settings.INGEST_JOB_DIR, exist_ok=True)
+        with open(file_path, "wb") as f:
+            f.write(file_bytes)
+        execute_write(CreateJobCommand(job_id, collection_name, doc_id, file_name, file_path))
+    except Exception:
+        runner.release(job_id)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    runner.submit(job_id)
+    return job_id
+
+
+def start_ingestion_jobs() -> int:
+    resumed = get_ingestion_runner().resume()
+    if resumed:
+        logger.info(f"Resumed {resumed} unfinished ingestion jobs.")
+    return resumed
+
+
+def stop_ingestion_jobs():
+    global _runner
+    with _runner_lock:
+        runner, _runner = _runner, None
+    if runner is not None:
+        logger.info(f"Ingestion job metrics: {runner.metrics()}")
+        runner.shutdown()
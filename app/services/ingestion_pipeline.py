@@ -0,0 +1,158 @@
+"""Pipeline ingest chunk vao Milvus: embedding theo batch, song song co gioi han.
+
+Chunk duoc doc dan tu iterable, gom thanh batch ``INGEST_EMBED_BATCH_SIZE`` va gui
+di embedding tren toi da ``INGEST_EMBED_CONCURRENCY`` thread. Batch nao xong (theo dung
+thu tu) thi duoc insert vao Milvus tren mot thread rieng, trong luc cac batch sau
+van dang embedding. Bo nho dinh chi phu thuoc kich thuoc batch va so batch dang
+chay, khong phu thuoc do dai tai lieu.
+
+Loi embedding duoc thu lai voi backoff luy thua; khi nha cung cap tra 429 thi moi
+worker cung tam dung theo ``Retry-After`` (neu co) de khong vuot gioi han them.
+
+Id chunk la hash cua (doc_id, heading, noi dung) nen upload lai tai lieu da sua
+chi can embedding cac chunk moi/doi; chunk cu khong con thi bi xoa.
+"""
+import hashlib
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional
+from langchain_core.embeddings import Embeddings
+from app.utils import logger
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b((text or "").encode("utf-8"), digest_size=16).hexdigest()
+
+
+def chunk_id(doc_id: str, heading: str, text: str) -> int:
+    """Id INT64 duong, on dinh theo (tai lieu, duong dan heading, hash noi dung)."""
+    key = "\x1f".join((doc_id, heading or "", content_hash(text)))
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & ((1 << 63) - 1)
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or type(error).__name__ == "RateLimitError"
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitedEmbedder:
+    """Goi ``embed_documents`` co retry/backoff; 429 lam tam dung moi worker."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        self.embeddings = embeddings
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._pause_until = 0.0
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.rate_limited = 0
+
+    def _wait_for_pause(self):
+        with self._lock:
+            delay = self._pause_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _pause(self, seconds: float):
+        with self._lock:
+            self._pause_until = max(self._pause_until, time.monotonic() + seconds)
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        for attempt in itertools.count():
+            self._wait_for_pause()
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt) * (0.5 + random.random() / 2)
+                with self._lock:
+                    self.retries += 1
+                if _is_rate_limited(e):
+                    delay = _retry_after(e) or delay
+                    with self._lock:
+                        self.rate_limited += 1
+                    # Ca pipeline cung dung, khong chi worker nay
+                    self._pause(delay)
+                logger.warning(f"Embedding batch failed ({e}), retry {attempt + 1} in {delay:.1f}s.")
+                time.sleep(delay)
+
+
+def run_ingestion(
+    chunks: Iterable[dict],
+    embedder: RateLimitedEmbedder,
+    insert: Callable[[list[dict], list[list[float]]], None],
+    batch_size: int,
+    concurrency: int,
+    on_batch: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """Embedding + insert tung batch; tra ve thong ke (so chunk, batch, thoi gian).
+
+    ``on_batch`` (neu co) nhan thong ke sau moi batch da gui insert.
+    """
+    started = time.perf_counter()
+    stats = {"chunks": 0, "batches": 0}
+    concurrency = max(1, concurrency)
+    pending: deque[tuple[list[dict], Future]] = deque()
+    insert_future: Optional[Future] = None
+
+    with ThreadPoolExecutor(concurrency, thread_name_prefix="embed") as embed_pool, \
+            ThreadPoolExecutor(1, thread_name_prefix="milvus-insert") as insert_pool:
+
+        def flush_one():
+            nonlocal insert_future
+            batch, future = pending.popleft()
+            vectors = future.result()
+            # Chi mot insert dang chay: doi insert truoc xong moi gui insert moi
+            if insert_future is not None:
+                insert_future.result()
+            insert_future = insert_pool.submit(insert, batch, vectors)
+            stats["chunks"] += len(batch)
+            stats["batches"] += 1
+            if on_batch is not None:
+                on_batch(dict(stats))
+
+        try:
+            for batch in batched(chunks, max(1, batch_size)):
+                pending.append((batch, embed_pool.submit(embedder.embed, [c["content"] for c in batch])))
+                if len(pending) >= concurrency:
+                    flush_one()
+            while pending:
+                flush_one()
+            if insert_future is not None:
+                insert_future.result()
+        except Exception:
+            for _, future in pending:
+                future.cancel()
+            raise
+
+    stats["retries"] = embedder.retries
+    stats["rate_limited"] = embedder.rate_limited
+    stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return stats
@@ -0,0 +1,143 @@
+"""Chi muc vector trong process, ban sao cua collection chinh sach tren Milvus.
+
+Kho chinh sach nho (vai file DOCX), nen co the tim kiem ngay trong process thay
+vi qua mang toi Milvus. Moi collection duoc luu thanh hai file trong
+``LOCAL_INDEX_DIR``:
+
+    <name>.npy        ma tran float32 (N x D) da chuan hoa do dai, doc bang mmap
+    <name>.meta.json  id/heading/type/content cua tung dong + model, so chieu
+
+``LOCAL_INDEX_MODE=flat`` tim vet can bang mot phep nhan ma tran; ``hnsw`` dung
+hnswlib (neu cai) xay do thi tu file .npy luc load. Ket qua co cung dang voi
+``query_milvus``.
+"""
+import json
+import os
+import time
+from typing import Optional, Sequence
+import numpy as np
+from app.config import settings
+from app.utils import logger
+
+try:
+    import hnswlib
+except ImportError:  # hnswlib la phu thuoc tuy chon
+    hnswlib = None
+
+RECORD_FIELDS = ("id", "heading", "type", "content")
+
+
+def index_paths(directory: str, name: str) -> tuple[str, str]:
+    return os.path.join(directory, f"{name}.npy"), os.path.join(directory, f"{name}.meta.json")
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class LocalVectorIndex:
+    """Ma tran vector (mmap) + metadata; tim kiem cosine flat hoac HNSW."""
+
+    def __init__(self, name: str, vectors: np.ndarray, records: list[dict], mode: str = "flat"):
+        self.name = name
+        self.vectors = vectors
+        self.records = records
+        self.mode = mode
+        self._hnsw = None
+        if mode == "hnsw" and len(records):
+            self._hnsw = self._build_hnsw()
+        self.loaded_at = time.time()
+
+    def _build_hnsw(self):
+        if hnswlib is None:
+            logger.warning("hnswlib chua duoc cai, chi muc local dung tim kiem flat.")
+            self.mode = "flat"
+            return None
+        count, dim = self.vectors.shape
+        index = hnswlib.Index(space="cosine", dim=dim)
+        index.init_index(max_elements=count, ef_construction=200, M=16)
+        index.add_items(np.asarray(self.vectors), np.arange(count))
+        return index
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @classmethod
+    def load(cls, directory: str, name: str, mode: str = "flat") -> Optional["LocalVectorIndex"]:
+        """Doc chi muc tu dia (None neu chua co file)."""
+        vectors_path, meta_path = index_paths(directory, name)
+        if not (os.path.exists(vectors_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        vectors = np.load(vectors_path, mmap_mode="r")
+        if vectors.shape[0] != len(meta["records"]):
+            logger.warning(f"Chi muc local '{name}' khong khop metadata, bo qua.")
+            return None
+        return cls(name, vectors, meta["records"], mode)
+
+    @classmethod
+    def write(
+        cls,
+        directory: str,
+        name: str,
+        records: Sequence[dict],
+        vectors: Sequence[Sequence[float]],
+        mode: str = "flat",
+    ) -> "LocalVectorIndex":
+        """Ghi chi muc moi (thay the nguyen tu file cu) roi load lai bang mmap."""
+        os.makedirs(directory, exist_ok=True)
+        vectors_path, meta_path = index_paths(directory, name)
+        # Collection rong (da xoa het chunk) van ghi de file cu bang ma tran (0, D)
+        dimension = -1 if len(records) else settings.EMBEDDING_DIMENSION
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(records), dimension)
+        matrix = _normalize_rows(matrix)
+        meta = {
+            "model": settings.EMBEDDING_MODEL,
+            "dimension": int(matrix.shape[1]),
+            "records": [{field: record.get(field) for field in RECORD_FIELDS} for record in records],
+        }
+        # np.save tu them duoi .npy nen ten file tam phai ket thuc bang .npy
+        tmp_vectors = f"{vectors_path[:-4]}.tmp.npy"
+        np.save(tmp_vectors, matrix)
+        tmp_meta = f"{meta_path}.tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_vectors, vectors_path)
+        os.replace(tmp_meta, meta_path)
+        return cls.load(directory, name, mode)
+
+    def search(self, vector: Sequence[float], top_k: int = 3) -> list[dict]:
+        if not self.records:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if norm == 0:
+            return []
+        query = query / norm
+        top_k = min(top_k, len(self.records))
+
+        if self._hnsw is not None:
+            self._hnsw.set_ef(max(50, top_k))
+            labels, distances = self._hnsw.knn_query(query, k=top_k)
+            ranked = [(int(i), 1.0 - float(d)) for i, d in zip(labels[0], distances[0])]
+        else:
+            scores = self.vectors @ query
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+            top = top[np.argsort(-scores[top])]
+            ranked = [(int(i), float(scores[i])) for i in top]
+
+        return [{**self.records[i], "score": score} for i, score in ranked]
+
+
+def fetch_collection_rows(collection, with_vectors: bool = True) -> list[dict]:
+    """Toan bo entity cua collection Milvus (kem vector neu can), theo thu tu id."""
+    rows = collection.query(
+        expr="id >= 0",
+        output_fields=[*RECORD_FIELDS, "vector"] if with_vectors else list(RECORD_FIELDS),
+        limit=settings.LOCAL_INDEX_MAX_ROWS,
+        consistency_level="Strong",
+    )
+    return sorted(rows, key=lambda row: row["id"])
@@ -1,153 +1,197 @@
-from pymilvus import Collection
+import functools
+import json
 import os
+from io import BytesIO
+from docling.datamodel.base_models import DocumentStream, InputFormat
 from docling.document_converter import DocumentConverter
 from docling_core.transforms.chunker.hierarchical_chunker import HierarchicalChunker
-import tempfile
-from typing import List, Dict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from app.config import settings
 from app.db.milvus import connect_milvus, check_collection_milvus
-from app.llms.embedding_models import get_embedding_model
+from app.services.ingestion_pipeline import RateLimitedEmbedder, batched, chunk_id, run_ingestion
+from app.services.retrieval_service import get_retrieval_service, uses_local_indexes
+from app.services.semantic_cache import invalidate_semantic_cache
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from app.utils import logger
 
-def normalize_docx_to_chunks(file_bytes: bytes, file_name: str) -> List[Dict]:
-    # Save bytes to a temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp:
-        tmp.write(file_bytes)
-        tmp_path = tmp.name
+@functools.lru_cache(maxsize=1)
+def get_document_converter() -> DocumentConverter:
+    """Converter Docling dung chung trong process (khoi tao pipeline ton vai giay)."""
+    return DocumentConverter(allowed_formats=[InputFormat.DOCX])
 
-    # Convert Docx
-    converter = DocumentConverter()
-    result = converter.convert(tmp_path).document
 
-    # Chunk
-    chunker = HierarchicalChunker()
-    chunk_iter = chunker.chunk(dl_doc=result)
+@functools.lru_cache(maxsize=1)
+def get_chunker() -> HierarchicalChunker:
+    return HierarchicalChunker()
 
-    data_list = []
-    # Process chunks by docling metadata
-    for i, chunk in enumerate(chunk_iter):
-        headings = chunk.meta.headings or []
-        data = {"index": None,"headings": None, "type": None, "content": None}
-        data["index"] = i
-        data["headings"] = headings
-        first_label = str(getattr(chunk.meta.doc_items[0], "label", "")).lower()
-
-        data["type"] = first_label
-        if first_label == "table":
-            table_item = chunk.meta.doc_items[0]
-            df = table_item.export_to_dataframe()
-            markdown_table = df.to_markdown(index=False)
-            data["content"] = markdown_table
-        elif first_label == "list_item":
-            list_item = chunk.text
-            data["content"] =  list_item
-        elif first_label == "paragraph": 
-            paragraph = chunk.text
-            data["content"] = paragraph
-        elif first_label == "text": 
-            text = chunk.text
-            data["content"] = text
-        data_list.append(data)
-    
-    os.remove(tmp_path)
-
-    splitter = RecursiveCharacterTextSplitter(
+
+@functools.lru_cache(maxsize=1)
+def get_text_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
         chunk_size=1000,
         chunk_overlap=300,
         separators=["\n\n", "\n", ". ", " ", ""]
     )
 
-    # Split further the content except TABLE
-    final_data_list = []
-    for data in data_list:
-        index = data["index"]
-        type_ = data["type"]
-        headings = data["headings"]
-        content = data["content"]
-        
+
+def warm_document_converter():
+    """Khoi tao san converter + pipeline DOCX (initializer cua process ingest)."""
+    try:
+        get_document_converter().initialize_pipeline(InputFormat.DOCX)
+        get_chunker()
+        get_text_splitter()
+        logger.info(f"Warmed Docling converter in process {os.getpid()}.")
+    except Exception as e:
+        logger.warning(f"Warm Docling converter failed: {e}")
+
+
+def _chunk_content(chunk, first_label: str):
+    if first_label == "table":
+        # Bang giu nguyen dang markdown
+        df = chunk.meta.doc_items[0].export_to_dataframe()
+        return df.to_markdown(index=False)
+    if first_label in ("list_item", "paragraph", "text"):
+        return chunk.text
+    return None
+
+
+def iter_docx_chunks(file_bytes: bytes, file_name: str) -> Iterator[Dict]:
+    """Chuyen DOCX (trong bo nho, khong file tam) va sinh dan tung chunk da split."""
+    source = DocumentStream(name=file_name, stream=BytesIO(file_bytes))
+    document = get_document_converter().convert(source).document
+    splitter = get_text_splitter()
+
+    # Process chunks by docling metadata
+    for index, chunk in enumerate(get_chunker().chunk(dl_doc=document)):
+        headings = chunk.meta.headings or []
+        type_ = str(getattr(chunk.meta.doc_items[0], "label", "")).lower()
+        content = _chunk_content(chunk, type_)
+        if content is None:
+            continue
+
         # Không split TABLE
         if type_ == "table":
-            final_data_list.append({
-                "id": f"{index}",
-                "type": type_,
-                "headings": headings,
-                "content": content
-            })
+            yield {"id": f"{index}", "type": type_, "headings": headings, "content": content}
             continue
-        sub_chunks = splitter.split_text(content)
         # Heading text
         heading_text = " > ".join(h.strip() for h in headings if h.strip()) if headings else ""
-        for j, sub in enumerate(sub_chunks):
-            final_data_list.append({
+        for j, sub in enumerate(splitter.split_text(content)):
+            yield {
                 "id": f"{index}_{j}",
                 "type": type_,
                 "headings": headings,
                 "content": heading_text + "\n" + sub
-            })
-    return final_data_list
+            }
 
-def upload_chunks_to_milvus(data_list: List[Dict], collection_name: str):
-    check_collection_milvus(collection_name)
 
-    embedding_model = get_embedding_model()
-    collection = Collection(name=collection_name)
-    collection.load()
-
-    texts = [item["content"] for item in data_list]
-    vectors = embedding_model.embed_documents(texts)
-
-    ids = []
-    headings = []
-    types = []
-    contents = []
-    all_vectors = []
-
-    for i, (item, vec) in enumerate(zip(data_list, vectors)):
-        ids.append(i)
-        headings.append(" > ".join(item.get("headings", [])) if item.get("headings") else "")
-        types.append(item.get("type", ""))
-        contents.append(item.get("content", ""))
-        all_vectors.append(vec)
-
-    result = collection.insert([
-        ids,
-        headings,
-        types,
-        contents,
-        all_vectors
-    ])
-
-    collection.flush()
-    logger.info(f"Inserted {len(ids)} vectors into Milvus collection '{collection_name}'.")
-    return result
+def normalize_docx_to_chunks(file_bytes: bytes, file_name: str) -> List[Dict]:
+    return list(iter_docx_chunks(file_bytes, file_name))
+
+
+# So dong moi trang khi doc id da luu (Milvus gioi han 16384 dong mot lan query)
+QUERY_BATCH_SIZE = 4096
+DELETE_BATCH_SIZE = 1000
+
 
-def query_milvus(collection_name: str, query: str, top_k: int = 3):
-    collection = Collection(name=collection_name)
-    collection.load()
+def _heading_path(item: Dict) -> str:
+    return " > ".join(item["headings"]) if item.get("headings") else ""
 
-    embedding_model = get_embedding_model()
-    query_vector = embedding_model.embed_query(query)
 
-    search_params = {
-        "metric_type": "COSINE"
-    }
+def stored_chunk_ids(collection, doc_id: str) -> set[int]:
+    """Toan bo id da luu cua tai lieu, doc theo trang (khong bi cat o gioi han query)."""
+    iterator = collection.query_iterator(
+        batch_size=QUERY_BATCH_SIZE,
+        expr=f"doc_id == {json.dumps(doc_id)}",
+        output_fields=["id"],
+        consistency_level="Strong",
+    )
+    ids: set[int] = set()
+    try:
+        while rows := iterator.next():
+            ids.update(row["id"] for row in rows)
+    finally:
+        iterator.close()
+    return ids
+
+
+def upload_chunks_to_milvus(
+    data_list: Iterable[Dict],
+    collection_name: str,
+    doc_id: str,
+    progress: Optional[Callable[[dict], None]] = None,
+):
+    """Dong bo chunk cua tai lieu ``doc_id``: embedding + upsert chunk moi/doi, xoa chunk cu."""
+    check_collection_milvus(collection_name)
 
-    results = collection.search(
-            data=[query_vector],
-            anns_field="vector",
-            param=search_params,
-            limit=top_k,
-            output_fields=["id", "heading", "type", "content"]
+    service = get_retrieval_service()
+    collection = service.collection(collection_name)
+    if "doc_id" not in {f.name for f in collection.schema.fields}:
+        raise ValueError(
+            f"Collection '{collection_name}' chua co truong doc_id, hay xoa collection roi upload lai."
         )
+    stored = stored_chunk_ids(collection, doc_id)
+    seen: set[int] = set()
+    embedder = RateLimitedEmbedder(
+        service.embeddings,
+        max_retries=settings.INGEST_EMBED_MAX_RETRIES,
+        base_delay=settings.INGEST_RETRY_BASE_SECONDS,
+        max_delay=settings.INGEST_RETRY_MAX_SECONDS,
+    )
+
+    def changed_chunks() -> Iterator[Dict]:
+        # Chunk trung (cung heading + noi dung) chi giu mot ban; chunk da co thi bo qua
+        for item in data_list:
+            heading = _heading_path(item)
+            item_id = chunk_id(doc_id, heading, item.get("content", ""))
+            if item_id in seen:
+                continue
+            seen.add(item_id)
+            if item_id not in stored:
+                yield {**item, "id": item_id, "heading": heading}
+
+    def upsert_batch(batch: List[Dict], vectors: List[List[float]]):
+        collection.upsert([
+            {
+                "id": item["id"],
+                "doc_id": doc_id,
+                "heading": item["heading"],
+                "type": item.get("type", ""),
+                "content": item.get("content", ""),
+                "vector": vector,
+            }
+            for item, vector in zip(batch, vectors)
+        ])
+
+    result = run_ingestion(
+        changed_chunks(),
+        embedder,
+        upsert_batch,
+        batch_size=settings.INGEST_EMBED_BATCH_SIZE,
+        concurrency=settings.INGEST_EMBED_CONCURRENCY,
+        on_batch=progress,
+    )
+    # Xoa sau khi upsert xong: loi giua chung van giu ban cu co the tim kiem
+    stale = sorted(stored - seen)
+    for batch in batched(stale, DELETE_BATCH_SIZE):
+        collection.delete(f"id in {batch}")
+    result.update(doc_id=doc_id, unchanged=len(seen & stored), deleted=len(stale))
+
+    if result["chunks"] or stale:
+        collection.flush()
+        # Ket qua tim kiem da cache khong con dung voi noi dung moi
+        invalidate_semantic_cache(collection_name)
+        if uses_local_indexes():
+            try:
+                service.sync_local_index(collection_name)
+            except Exception as e:
+                logger.warning(f"Mirror '{collection_name}' to local indexes failed: {e}")
+    logger.info(
+        f"Synced '{doc_id}' into Milvus collection '{collection_name}': {result['chunks']} upserted, "
+        f"{result['unchanged']} unchanged, {result['deleted']} deleted "
+        f"({result['batches']} batches, {result['retries']} retries, {result['elapsed_ms']} ms)."
+    )
+    return result
 
-    hits = []
-    for hit in results[0]:
-        hits.append({
-            "id": hit.id,
-            "score": hit.distance,
-            "heading": hit.entity.get("heading"),
-            "type": hit.entity.get("type"),
-            "content": hit.entity.get("content"),
-        })
-
-    return hits
\ No newline at end of file
+def query_milvus(collection_name: str, query: str, top_k: int = 3, search_mode: str | None = None):
+    # Dung handle collection va client embedding da warm-up cua retrieval service
+    return get_retrieval_service().search(collection_name, query, top_k, search_mode)
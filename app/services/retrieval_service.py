@@ -0,0 +1,332 @@
+"""Dich vu truy van chinh sach tren Milvus, tao mot lan trong lifespan.
+
+Giu san handle ``Collection`` da ``load()`` va client embedding dung chung, nen
+moi lan ``lookup_policy`` chi ton mot round trip embedding va mot round trip
+search. ``warm_up`` nap collection va mo san ket noi HTTP luc startup de request
+dau tien khong phai tra chi phi nay.
+
+``VECTOR_BACKEND`` chon noi tim kiem: ``milvus``, ``local`` (chi muc trong process,
+xem ``local_vector_index``) hoac ``auto`` (Milvus co timeout, loi thi dung local).
+``search_mode`` chon ``vector``, ``bm25`` hoac ``hybrid`` (gop hai danh sach bang
+reciprocal rank fusion, xem ``bm25_index``).
+"""
+import threading
+import time
+from typing import Iterable, Optional
+from pymilvus import Collection, utility
+from langchain_core.embeddings import Embeddings
+from app.config import settings
+from app.llms.embedding_models import get_embedding_model
+from app.services.embedding_cache import cached_embeddings
+from app.services.bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+from app.services.local_vector_index import LocalVectorIndex, fetch_collection_rows
+from app.services.semantic_cache import get_semantic_cache
+from app.utils import logger
+
+SEARCH_PARAMS = {"metric_type": "COSINE"}
+OUTPUT_FIELDS = ["id", "heading", "type", "content"]
+SEARCH_MODES = ("vector", "bm25", "hybrid")
+
+
+def uses_local_indexes() -> bool:
+    """Co can chi muc tren dia (vector local hoac BM25) theo cau hinh hien tai."""
+    return settings.VECTOR_BACKEND != "milvus" or settings.RETRIEVAL_SEARCH_MODE != "vector"
+
+
+class RetrievalService:
+    """Handle collection da load + client embedding dung chung + metrics do tre."""
+
+    def __init__(self, embeddings: Optional[Embeddings] = None):
+        # Embedding cho ca truy van va ingest di qua cache (LRU + Redis)
+        self.embeddings = embeddings or cached_embeddings(get_embedding_model())
+        self._collections: dict[str, Collection] = {}
+        self._load_ms: dict[str, float] = {}
+        self._local: dict[str, LocalVectorIndex] = {}
+        self._lexical: dict[str, BM25Index] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "queries": 0,
+            "semantic_hits": 0,
+            "local_searches": 0,
+            "lexical_searches": 0,
+            "fallbacks": 0,
+            "errors": 0,
+            "embed_ms": 0.0,
+            "search_ms": 0.0,
+            "max_total_ms": 0.0,
+        }
+
+    def collection(self, name: str) -> Collection:
+        """Handle da load cua collection (load mot lan cho moi ten)."""
+        collection = self._collections.get(name)
+        if collection is not None:
+            return collection
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                started = time.perf_counter()
+                collection = Collection(name=name)
+                collection.load()
+                self._load_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+                self._collections[name] = collection
+                logger.info(f"Loaded Milvus collection '{name}' ({self._load_ms[name]} ms).")
+        return collection
+
+    def release(self, name: str):
+        """Bo handle (vd. sau khi tao lai collection) de lan sau load lai."""
+        with self._lock:
+            self._collections.pop(name, None)
+            self._load_ms.pop(name, None)
+
+    def local_index(self, name: str) -> Optional[LocalVectorIndex]:
+        """Chi muc local cua collection (doc tu dia lan dau; None neu chua co)."""
+        index = self._local.get(name)
+        if index is None:
+            index = LocalVectorIndex.load(settings.LOCAL_INDEX_DIR, name, settings.LOCAL_INDEX_MODE)
+            if index is not None:
+                with self._lock:
+                    self._local[name] = index
+        return index
+
+    def lexical_index(self, name: str) -> Optional[BM25Index]:
+        """Chi muc BM25 cua collection (doc tu dia lan dau; None neu chua co)."""
+        index = self._lexical.get(name)
+        if index is None:
+            index = BM25Index.load(settings.LOCAL_INDEX_DIR, name)
+            if index is not None:
+                with self._lock:
+                    self._lexical[name] = index
+        return index
+
+    def sync_local_index(self, name: str):
+        """Xay lai chi muc tren dia tu collection Milvus: BM25, va vector neu backend can."""
+        started = time.perf_counter()
+        with_vectors = settings.VECTOR_BACKEND != "milvus"
+        rows = fetch_collection_rows(self.collection(name), with_vectors)
+        lexical = BM25Index.write(settings.LOCAL_INDEX_DIR, name, rows)
+        with self._lock:
+            self._lexical[name] = lexical
+        if with_vectors:
+            index = LocalVectorIndex.write(
+                settings.LOCAL_INDEX_DIR, name, rows, [row["vector"] for row in rows], settings.LOCAL_INDEX_MODE
+            )
+            with self._lock:
+                self._local[name] = index
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Mirrored Milvus collection '{name}' to local indexes ({len(rows)} rows, {elapsed_ms} ms).")
+
+    def _warm_local(self, name: str):
+        backend = settings.VECTOR_BACKEND
+        need_vectors = backend != "milvus"
+        need_lexical = settings.RETRIEVAL_SEARCH_MODE != "vector"
+        sync = settings.LOCAL_INDEX_SYNC_ON_STARTUP and (
+            backend == "auto"
+            or (need_vectors and self.local_index(name) is None)
+            or (need_lexical and self.lexical_index(name) is None)
+        )
+        if sync:
+            try:
+                self.sync_local_index(name)
+            except Exception as e:
+                logger.warning(f"Mirror Milvus collection '{name}' to local indexes failed: {e}")
+        if need_vectors:
+            index = self.local_index(name)
+            if index is None:
+                logger.warning(f"No local vector index for '{name}' in {settings.LOCAL_INDEX_DIR}.")
+            else:
+                logger.info(f"Local vector index '{name}' ready ({len(index)} rows, {index.mode}).")
+        if need_lexical and self.lexical_index(name) is None:
+            logger.warning(f"No BM25 index for '{name}', hybrid search falls back to vector.")
+
+    def warm_up(self, collection_names: Iterable[str]):
+        backend = settings.VECTOR_BACKEND
+        for name in collection_names:
+            if not name:
+                continue
+            if backend != "local":
+                try:
+                    self.collection(name)
+                except Exception as e:
+                    logger.warning(f"Warm-up Milvus collection '{name}' failed: {e}")
+            if uses_local_indexes():
+                self._warm_local(name)
+        try:
+            # Mo san ket noi HTTP (TLS) toi API embedding, bo qua cache
+            client = getattr(self.embeddings, "embeddings", self.embeddings)
+            client.embed_query("warm up")
+        except Exception as e:
+            logger.warning(f"Warm-up embedding client failed: {e}")
+
+    def embed_query(self, query: str) -> list[float]:
+        return self.embeddings.embed_query(query)
+
+    def _search_local(self, collection_name: str, vector: list[float], top_k: int) -> list[dict]:
+        index = self.local_index(collection_name)
+        if index is None:
+            raise RuntimeError(f"Chua co chi muc vector local cho collection '{collection_name}'.")
+        with self._lock:
+            self._stats["local_searches"] += 1
+        return index.search(vector, top_k)
+
+    def search_vector(self, collection_name: str, vector: list[float], top_k: int = 3) -> list[dict]:
+        backend = settings.VECTOR_BACKEND
+        if backend == "local":
+            return self._search_local(collection_name, vector, top_k)
+        if backend != "auto":
+            return self._search_milvus(collection_name, vector, top_k)
+        try:
+            return self._search_milvus(
+                collection_name, vector, top_k, timeout=settings.VECTOR_SEARCH_TIMEOUT_SECONDS
+            )
+        except Exception as e:
+            if self.local_index(collection_name) is None:
+                raise
+            logger.warning(f"Milvus search failed ({e}), using local vector index.")
+            with self._lock:
+                self._stats["fallbacks"] += 1
+            return self._search_local(collection_name, vector, top_k)
+
+    def _search_milvus(
+        self, collection_name: str, vector: list[float], top_k: int, timeout: Optional[float] = None
+    ) -> list[dict]:
+        results = self.collection(collection_name).search(
+            data=[vector],
+            anns_field="vector",
+            param=SEARCH_PARAMS,
+            limit=top_k,
+            output_fields=OUTPUT_FIELDS,
+            timeout=timeout,
+        )
+        return [
+            {
+                "id": hit.id,
+                "score": hit.distance,
+                "heading": hit.entity.get("heading"),
+                "type": hit.entity.get("type"),
+                "content": hit.entity.get("content"),
+            }
+            for hit in results[0]
+        ]
+
+    def _search_lexical(self, index: BM25Index, query: str, top_k: int) -> list[dict]:
+        with self._lock:
+            self._stats["lexical_searches"] += 1
+        return index.search(query, top_k)
+
+    def _resolve_mode(self, collection_name: str, search_mode: Optional[str]) -> tuple[str, Optional[BM25Index]]:
+        mode = (search_mode or settings.RETRIEVAL_SEARCH_MODE).lower()
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"search_mode phai la mot trong {SEARCH_MODES}.")
+        if mode == "vector":
+            return mode, None
+        lexical = self.lexical_index(collection_name)
+        if lexical is None:
+            if mode == "bm25":
+                raise RuntimeError(f"Chua co chi muc BM25 cho collection '{collection_name}'.")
+            return "vector", None
+        return mode, lexical
+
+    def search(
+        self, collection_name: str, query: str, top_k: int = 3, search_mode: Optional[str] = None
+    ) -> list[dict]:
+        semantic_cache = get_semantic_cache() if settings.SEMANTIC_CACHE_ENABLED else None
+        started = time.perf_counter()
+        try:
+            mode, lexical = self._resolve_mode(collection_name, search_mode)
+            # BM25 thuan khong can embedding
+            vector = self.embed_query(query) if mode != "bm25" else None
+            embedded = time.perf_counter()
+            if vector is None:
+                semantic_cache = None
+            # Hybrid: cau hoi phai trung ca tap token BM25, khong chi gan ve nghia
+            terms = frozenset(tokenize(query)) if mode == "hybrid" else None
+            # Cau hoi gan trung cau da hoi: bo qua buoc search
+            hits = semantic_cache.get(collection_name, top_k, vector, mode, terms) if semantic_cache else None
+            cached = hits is not None
+            if not cached:
+                if mode == "bm25":
+                    hits = self._search_lexical(lexical, query, top_k)
+                elif mode == "vector":
+                    hits = self.search_vector(collection_name, vector, top_k)
+                else:
+                    candidates = top_k * max(1, settings.RETRIEVAL_CANDIDATE_MULTIPLIER)
+                    hits = reciprocal_rank_fusion(
+                        [
+                            self.search_vector(collection_name, vector, candidates),
+                            self._search_lexical(lexical, query, candidates),
+                        ],
+                        top_k,
+                        settings.RETRIEVAL_RRF_K,
+                    )
+                if semantic_cache:
+                    semantic_cache.set(collection_name, top_k, vector, hits, mode, terms)
+        except Exception:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finished = time.perf_counter()
+        with self._lock:
+            self._stats["queries"] += 1
+            self._stats["semantic_hits"] += int(cached)
+            self._stats["embed_ms"] += (embedded - started) * 1000
+            self._stats["search_ms"] += (finished - embedded) * 1000
+            self._stats["max_total_ms"] = max(self._stats["max_total_ms"], (finished - started) * 1000)
+        return hits
+
+    def load_state(self) -> dict[str, str]:
+        states = {}
+        for name in list(self._collections):
+            try:
+                states[name] = str(utility.load_state(name))
+            except Exception as e:
+                states[name] = f"unknown ({e})"
+        for name, index in list(self._local.items()):
+            states[f"local:{name}"] = f"{len(index)} rows ({index.mode})"
+        for name, index in list(self._lexical.items()):
+            states[f"bm25:{name}"] = f"{len(index)} chunks, {len(index.postings)} terms"
+        return states
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            load_ms = dict(self._load_ms)
+        queries = stats["queries"]
+        stats["avg_embed_ms"] = round(stats["embed_ms"] / queries, 1) if queries else 0.0
+        stats["avg_search_ms"] = round(stats["search_ms"] / queries, 1) if queries else 0.0
+        stats["max_total_ms"] = round(stats["max_total_ms"], 1)
+        stats["collections"] = load_ms
+        return stats
+
+
+_service: Optional[RetrievalService] = None
+_service_lock = threading.Lock()
+
+
+def init_retrieval_service() -> RetrievalService:
+    """Tao service va warm-up collection chinh sach; goi trong lifespan."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = RetrievalService()
+        service = _service
+    if settings.RETRIEVAL_WARMUP:
+        service.warm_up([settings.COLLECTION_NAME])
+    return service
+
+
+def get_retrieval_service() -> RetrievalService:
+    """Service dung chung (tao lazily neu lifespan chua chay, vd. script)."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = RetrievalService()
+    return _service
+
+
+def close_retrieval_service():
+    global _service
+    with _service_lock:
+        service, _service = _service, None
+    if service is not None:
+        logger.info(f"Retrieval metrics: {service.metrics()}")
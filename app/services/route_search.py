@@ -0,0 +1,170 @@
+"""Tim hanh trinh nhieu chang (co noi chuyen) tren do thi chuyen bay trong RAM.
+
+Bang ``flights`` duoc nap mot lan thanh danh sach ke theo san bay khoi hanh, moi
+san bay giu cac chang sap xep theo ``scheduled_departure_epoch`` nen tim chang
+noi tiep trong khoang [den + layover toi thieu, den + layover toi da] chi la mot
+lan ``bisect``. Tim kiem la best-first theo gio den, co gioi han so lan noi
+chuyen, so lan mo rong nut va so lan moi san bay duoc xet, nen mot tool call tra
+ve ngay cac hanh trinh den som nhat thay vi de LLM goi search_flights nhieu lan.
+"""
+import heapq
+import itertools
+import threading
+import time
+from bisect import bisect_left
+from typing import Collection, Iterable, NamedTuple, Optional
+from app.config import settings
+from app.db.catalog_snapshot import catalog_connection
+from app.utils import logger
+from app.utils.time_utils import from_epoch
+
+ROUTE_GRAPH_QUERY = """
+SELECT
+    flight_id, flight_no, departure_airport, arrival_airport,
+    scheduled_departure_epoch, scheduled_arrival_epoch
+FROM flights
+WHERE scheduled_departure_epoch IS NOT NULL
+    AND scheduled_arrival_epoch IS NOT NULL
+    AND status <> 'Cancelled'
+"""
+
+
+class Leg(NamedTuple):
+    flight_id: int
+    flight_no: str
+    departure_airport: str
+    arrival_airport: str
+    departure: int
+    arrival: int
+
+
+class RouteGraph:
+    """Danh sach ke: san bay khoi hanh -> cac chang sap xep theo gio khoi hanh."""
+
+    def __init__(self, legs: Iterable[Leg]):
+        by_airport: dict[str, list[Leg]] = {}
+        for leg in legs:
+            if leg.arrival > leg.departure:
+                by_airport.setdefault(leg.departure_airport, []).append(leg)
+        self._legs: dict[str, list[Leg]] = {}
+        self._departures: dict[str, list[int]] = {}
+        for airport, items in by_airport.items():
+            items.sort(key=lambda leg: leg.departure)
+            self._legs[airport] = items
+            self._departures[airport] = [leg.departure for leg in items]
+        self.flight_count = sum(len(items) for items in self._legs.values())
+        self.built_at = time.time()
+
+    def departures(self, airport: str, earliest: int, latest: int) -> list[Leg]:
+        """Cac chang khoi hanh tu ``airport`` trong [earliest, latest)."""
+        times = self._departures.get(airport)
+        if not times:
+            return []
+        return self._legs[airport][bisect_left(times, earliest):bisect_left(times, latest)]
+
+    def search(
+        self,
+        origins: Collection[str],
+        destinations: Collection[str],
+        start: int,
+        end: int,
+        max_connections: int = 1,
+        min_layover: int = 3600,
+        max_layover: int = 86400,
+        limit: int = 5,
+        max_expansions: int = 20000,
+    ) -> list[tuple[Leg, ...]]:
+        """Hanh trinh tu ``origins`` toi ``destinations``, chang dau khoi hanh trong [start, end).
+
+        Ket qua sap xep theo gio den. Moi (san bay, so chang) chi duoc mo rong toi da
+        ``limit`` lan (k hanh trinh den som nhat), nen chi phi bi chan du do thi lon.
+        """
+        origins, destinations = set(origins), set(destinations)
+        counter = itertools.count()
+        heap: list[tuple[int, int, tuple[Leg, ...]]] = []
+        for origin in origins:
+            for leg in self.departures(origin, start, end):
+                if leg.arrival_airport not in origins:
+                    heapq.heappush(heap, (leg.arrival, next(counter), (leg,)))
+
+        results: list[tuple[Leg, ...]] = []
+        settled: dict[tuple[str, int], int] = {}
+        expansions = 0
+        while heap and len(results) < limit:
+            arrival, _, legs = heapq.heappop(heap)
+            airport = legs[-1].arrival_airport
+            if airport in destinations:
+                results.append(legs)
+                continue
+            if len(legs) > max_connections:
+                continue
+            state = (airport, len(legs))
+            if settled.get(state, 0) >= limit:
+                continue
+            settled[state] = settled.get(state, 0) + 1
+
+            visited = origins | {leg.arrival_airport for leg in legs}
+            for leg in self.departures(airport, arrival + min_layover, arrival + max_layover + 1):
+                if leg.arrival_airport in visited:
+                    continue
+                heapq.heappush(heap, (leg.arrival, next(counter), legs + (leg,)))
+            expansions += 1
+            if expansions >= max_expansions:
+                logger.warning(f"Route search stopped after {expansions} expansions.")
+                break
+        return results
+
+
+def _format_time(epoch: int) -> str:
+    return from_epoch(epoch).strftime("%Y-%m-%d %H:%M")
+
+
+def itinerary_row(legs: tuple[Leg, ...]) -> dict:
+    """Mot hanh trinh thanh mot dong gon cho LLM."""
+    layovers = [
+        (nxt.departure - prev.arrival) // 60 for prev, nxt in zip(legs, legs[1:])
+    ]
+    return {
+        "route": " -> ".join([legs[0].departure_airport] + [leg.arrival_airport for leg in legs]),
+        "connections": len(legs) - 1,
+        "flight_ids": ", ".join(str(leg.flight_id) for leg in legs),
+        "flight_nos": ", ".join(leg.flight_no for leg in legs),
+        "departure": _format_time(legs[0].departure),
+        "arrival": _format_time(legs[-1].arrival),
+        "total_minutes": (legs[-1].arrival - legs[0].departure) // 60,
+        "layover_minutes": ", ".join(str(minutes) for minutes in layovers),
+    }
+
+
+_graph: Optional[RouteGraph] = None
+_graph_lock = threading.Lock()
+
+
+def load_route_graph() -> RouteGraph:
+    started = time.perf_counter()
+    with catalog_connection() as conn:
+        rows = conn.execute(ROUTE_GRAPH_QUERY).fetchall()
+    graph = RouteGraph(Leg(*row) for row in rows)
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"Loaded route graph with {graph.flight_count} flights ({elapsed_ms} ms).")
+    return graph
+
+
+def get_route_graph() -> RouteGraph:
+    """Do thi dung chung, nap lai khi qua ``ROUTE_GRAPH_TTL_SECONDS``."""
+    global _graph
+    graph = _graph
+    ttl = settings.ROUTE_GRAPH_TTL_SECONDS
+    if graph is not None and (ttl <= 0 or time.time() - graph.built_at < ttl):
+        return graph
+    with _graph_lock:
+        graph = _graph
+        if graph is None or (ttl > 0 and time.time() - graph.built_at >= ttl):
+            _graph = graph = load_route_graph()
+    return graph
+
+
+def reset_route_graph():
+    global _graph
+    with _graph_lock:
+        _graph = None
@@ -0,0 +1,105 @@
+"""Ton kho ghe theo chuyen bay va hang ve.
+
+Bang ``flight_seat_inventory(flight_id, fare_conditions, capacity, sold)`` (xem
+migration 006) luu so ghe cua tau bay va so ve da ban cho moi hang ve, nen kiem
+tra con ghe la mot lan tim theo khoa chinh thay vi dem ``seats`` x
+``ticket_flights`` moi request. Chuyen bay them sau migration duoc tao dong ton
+kho khi can (``ensure_flight_seats``).
+
+Cac ham ``reserve_seat``/``release_seat`` phai duoc goi trong transaction ghi
+(``BEGIN IMMEDIATE``) cung voi thao tac tren ``ticket_flights``.
+"""
+import sqlite3
+from typing import Collection, Optional
+
+ENSURE_FLIGHT_SEATS_QUERY = """
+INSERT INTO flight_seat_inventory (flight_id, fare_conditions, capacity, sold)
+SELECT
+    f.flight_id,
+    s.fare_conditions,
+    COUNT(*),
+    (
+        SELECT COUNT(*) FROM ticket_flights tf
+        WHERE tf.flight_id = f.flight_id AND tf.fare_conditions = s.fare_conditions
+    )
+FROM flights f
+JOIN seats s ON s.aircraft_code = f.aircraft_code
+WHERE f.flight_id = ?
+GROUP BY f.flight_id, s.fare_conditions
+ON CONFLICT (flight_id, fare_conditions) DO NOTHING
+"""
+
+FREE_SEATS_QUERY = """
+SELECT capacity - sold FROM flight_seat_inventory
+WHERE flight_id = ? AND fare_conditions = ?
+"""
+
+SELL_SEATS_QUERY = """
+UPDATE flight_seat_inventory
+SET sold = sold + ?
+WHERE flight_id = ? AND fare_conditions = ?
+"""
+
+RELEASE_SEATS_QUERY = """
+UPDATE flight_seat_inventory
+SET sold = MAX(sold - ?, 0)
+WHERE flight_id = ? AND fare_conditions = ?
+"""
+
+
+def flight_seats_query(count: int) -> str:
+    """Ghe trong theo hang ve cho ``count`` chuyen bay."""
+    placeholders = ", ".join("?" for _ in range(count))
+    return f"""
+    SELECT flight_id, fare_conditions, capacity - sold AS free_seats
+    FROM flight_seat_inventory
+    WHERE flight_id IN ({placeholders})
+    """
+
+
+class SeatUnavailableError(ValueError):
+    """Chuyen bay da het ghe cua hang ve yeu cau."""
+
+
+def ensure_flight_seats(conn: sqlite3.Connection, flight_id: int):
+    conn.execute(ENSURE_FLIGHT_SEATS_QUERY, (flight_id,))
+
+
+def free_seats(conn: sqlite3.Connection, flight_id: int, fare_conditions: str) -> Optional[int]:
+    """So ghe con trong; None neu tau bay khong co hang ve nay."""
+    row = conn.execute(FREE_SEATS_QUERY, (flight_id, fare_conditions)).fetchone()
+    return row[0] if row is not None else None
+
+
+def reserve_seat(conn: sqlite3.Connection, flight_id: int, fare_conditions: str, seats: int = 1):
+    """Ban ``seats`` ghe; nem SeatUnavailableError neu khong du.
+
+    Goi trong ``BEGIN IMMEDIATE`` de kiem tra va cap nhat la mot buoc nguyen tu.
+    """
+    ensure_flight_seats(conn, flight_id)
+    free = free_seats(conn, flight_id, fare_conditions)
+    if free is None or free < seats:
+        raise SeatUnavailableError(
+            f"Chuyen bay {flight_id} da het ghe hang {fare_conditions}."
+        )
+    conn.execute(SELL_SEATS_QUERY, (seats, flight_id, fare_conditions))
+
+
+def release_seat(conn: sqlite3.Connection, flight_id: int, fare_conditions: str, seats: int = 1):
+    """Tra lai ghe khi doi ve hoac huy ve."""
+    conn.execute(RELEASE_SEATS_QUERY, (seats, flight_id, fare_conditions))
+
+
+def seat_availability(conn: sqlite3.Connection, flight_ids: Collection[int]) -> dict[int, dict[str, int]]:
+    """flight_id -> {hang ve: so ghe trong}; chuyen bay chua co ton kho bi bo qua."""
+    ids = sorted(set(flight_ids))
+    if not ids:
+        return {}
+    availability: dict[int, dict[str, int]] = {}
+    for flight_id, fare_conditions, free in conn.execute(flight_seats_query(len(ids)), ids):
+        availability.setdefault(flight_id, {})[fare_conditions] = max(free, 0)
+    return availability
+
+
+def format_availability(seats: dict[str, int]) -> str:
+    return ", ".join(f"{fare}: {free}" for fare, free in sorted(seats.items()))
@@ -0,0 +1,161 @@
+"""Cache ket qua tim kiem theo do tuong dong ngu nghia cua cau hoi.
+
+Moi muc luu vector cau hoi (da chuan hoa do dai) cung danh sach hit cua
+``query_milvus``. Cau hoi moi co cosine >= ``SEMANTIC_CACHE_THRESHOLD`` voi mot
+cau hoi da luu (cung collection, che do tim kiem va top_k) duoc tra ket qua cu,
+bo qua buoc search. Muc het han sau ``SEMANTIC_CACHE_TTL_SECONDS``; khi vuot
+``SEMANTIC_CACHE_MAX_ENTRIES`` thi bo muc it dung nhat. Che do co BM25 truyen them
+tap token cua cau hoi: chi tra muc cu khi tap token trung khop, vi hai cau chi khac
+nhau o tu khoa chinh xac ("7kg" / "10kg") thuong van co cosine rat cao. ``upload_chunks_to_milvus``
+goi ``invalidate_semantic_cache`` sau khi ghi vao collection.
+"""
+import copy
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+import numpy as np
+from app.config import settings
+
+
+@dataclass
+class _Entry:
+    vector: np.ndarray
+    hits: list[dict]
+    expires_at: float
+    last_used: float = field(default_factory=time.monotonic)
+    terms: Optional[frozenset] = None
+
+
+class SemanticCache:
+    """Cache theo (collection, che do tim kiem, top_k); tra cuu bang mot phep nhan ma tran."""
+
+    def __init__(self, maxsize: int, ttl: float, threshold: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: dict[tuple[str, str, int], list[_Entry]] = {}
+        self._matrices: dict[tuple[str, str, int], np.ndarray] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def _normalize(vector: list[float]) -> Optional[np.ndarray]:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(array))
+        return array / norm if norm else None
+
+    def _size(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def _drop_expired(self, key: tuple[str, str, int], now: float):
+        entries = self._entries.get(key, [])
+        alive = [e for e in entries if e.expires_at > now]
+        if len(alive) != len(entries):
+            self._entries[key] = alive
+            self._matrices.pop(key, None)
+
+    def _matrix(self, key: tuple[str, str, int]) -> Optional[np.ndarray]:
+        matrix = self._matrices.get(key)
+        if matrix is None and self._entries.get(key):
+            matrix = np.stack([e.vector for e in self._entries[key]])
+            self._matrices[key] = matrix
+        return matrix
+
+    def get(
+        self,
+        collection_name: str,
+        top_k: int,
+        vector: list[float],
+        mode: str = "vector",
+        terms: Optional[frozenset] = None,
+    ) -> Optional[list[dict]]:
+        query = self._normalize(vector)
+        key = (collection_name, mode, top_k)
+        now = time.monotonic()
+        with self._lock:
+            self._drop_expired(key, now)
+            matrix = self._matrix(key) if query is not None else None
+            if matrix is not None:
+                scores = matrix @ query
+                if terms is not None:
+                    entries = self._entries[key]
+                    mismatched = [i for i, e in enumerate(entries) if e.terms != terms]
+                    scores[mismatched] = -np.inf
+                best = int(np.argmax(scores))
+                if float(scores[best]) >= self.threshold:
+                    entry = self._entries[key][best]
+                    entry.last_used = now
+                    self._stats["hits"] += 1
+                    return copy.deepcopy(entry.hits)
+            self._stats["misses"] += 1
+        return None
+
+    def set(
+        self,
+        collection_name: str,
+        top_k: int,
+        vector: list[float],
+        hits: list[dict],
+        mode: str = "vector",
+        terms: Optional[frozenset] = None,
+    ):
+        normalized = self._normalize(vector)
+        if normalized is None:
+            return
+        key = (collection_name, mode, top_k)
+        now = time.monotonic()
+        with self._lock:
+            self._entries.setdefault(key, []).append(
+                _Entry(normalized, copy.deepcopy(hits), now + self.ttl, now, terms)
+            )
+            self._matrices.pop(key, None)
+            while self._size() > self.maxsize:
+                self._evict_one()
+
+    def _evict_one(self):
+        key, index = min(
+            ((k, i) for k, entries in self._entries.items() for i in range(len(entries))),
+            key=lambda item: self._entries[item[0]][item[1]].last_used,
+        )
+        del self._entries[key][index]
+        self._matrices.pop(key, None)
+        self._stats["evictions"] += 1
+
+    def invalidate(self, collection_name: Optional[str] = None):
+        """Xoa cac muc cua collection (hoac tat ca neu khong truyen ten)."""
+        with self._lock:
+            for key in list(self._entries):
+                if collection_name is None or key[0] == collection_name:
+                    del self._entries[key]
+                    self._matrices.pop(key, None)
+            self._stats["invalidations"] += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._size()
+        stats["maxsize"] = self.maxsize
+        stats["threshold"] = self.threshold
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / total, 4) if total else 0.0
+        return stats
+
+
+_cache = SemanticCache(
+    maxsize=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl=settings.SEMANTIC_CACHE_TTL_SECONDS,
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+)
+
+
+def get_semantic_cache() -> SemanticCache:
+    return _cache
+
+
+def invalidate_semantic_cache(collection_name: Optional[str] = None):
+    _cache.invalidate(collection_name)
+
+
+def semantic_cache_metrics() -> dict:
+    return _cache.metrics()
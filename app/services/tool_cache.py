@@ -0,0 +1,191 @@
+"""Cache ket qua cho cac tool chi doc (tim chuyen bay, khach san, ...).
+
+Dung duoi ``@tool``::
+
+    @tool
+    @cached_tool("flights", "airports_data")
+    def search_flights(...): ...
+
+Key = ten tool + tham so da chuan hoa + "the he" cua tung tag (bang). Tool ghi goi
+``invalidate_tool_cache("hotel_bookings")`` sau khi commit: the he cua tag tang len
+nen moi key cu tu dong bi bo qua, ca trong process lan tren Redis.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+from langchain_core.runnables import RunnableConfig
+from app.config import settings
+from app.core.memory import safe_redis_call
+
+TAG_KEY = "tool_cache:tag:{tag}"
+ENTRY_KEY = "tool_cache:entry:{key}"
+
+
+class ToolResultCache:
+    """LRU + TTL trong process, co the dung chung qua Redis."""
+
+    def __init__(self, maxsize: int, ttl: int, use_redis: bool = True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict[str, int]] = {}
+
+    def _redis(self, fn: Callable, default=None):
+        if not self.use_redis:
+            return default
+        return safe_redis_call(fn, default, label="Tool cache")
+
+    def _count(self, name: str, field: str):
+        with self._lock:
+            stats = self._stats.setdefault(name, {"hits": 0, "misses": 0, "evictions": 0})
+            stats[field] += 1
+
+    def tag_generations(self, tags: tuple[str, ...]) -> list[int]:
+        """The he hien tai cua tung tag (Redis neu co, khong thi trong process)."""
+        if not tags:
+            return []
+        remote = self._redis(lambda r: r.mget([TAG_KEY.format(tag=t) for t in tags]))
+        with self._lock:
+            local = [self._generations.get(t, 0) for t in tags]
+        if remote is None:
+            return local
+        return [int(v) if v is not None else 0 for v in remote]
+
+    def make_key(self, name: str, arguments: dict, tags: tuple[str, ...]) -> str:
+        payload = json.dumps(
+            {"tool": name, "args": arguments, "tags": dict(zip(tags, self.tag_generations(tags)))},
+            sort_keys=True,
+            default=str,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, name: str, key: str) -> tuple[bool, Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    payload = entry[1]
+                else:
+                    del self._entries[key]
+                    payload = None
+            else:
+                payload = None
+
+        if payload is None:
+            payload = self._redis(lambda r: r.get(ENTRY_KEY.format(key=key)))
+            if payload is not None:
+                payload = payload.decode("utf-8") if isinstance(payload, bytes) else payload
+                self._store_local(name, key, payload)
+
+        if payload is None:
+            self._count(name, "misses")
+            return False, None
+        self._count(name, "hits")
+        # Moi lan hit tra ve ban sao moi, caller co the sua thoai mai
+        return True, json.loads(payload)
+
+    def set(self, name: str, key: str, value: Any, ttl: Optional[int] = None):
+        ttl = ttl or self.ttl
+        payload = json.dumps(value, default=str, ensure_ascii=False)
+        self._store_local(name, key, payload, ttl)
+        self._redis(lambda r: r.set(ENTRY_KEY.format(key=key), payload, ex=ttl))
+
+    def _store_local(self, name: str, key: str, payload: str, ttl: Optional[int] = None):
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                evicted += 1
+        for _ in range(evicted):
+            self._count(name, "evictions")
+
+    def invalidate_tags(self, *tags: str):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+        for tag in tags:
+            self._redis(lambda r, tag=tag: r.incr(TAG_KEY.format(tag=tag)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            tools = {name: dict(stats) for name, stats in self._stats.items()}
+            size = len(self._entries)
+        for stats in tools.values():
+            total = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = round(stats["hits"] / total, 4) if total else 0.0
+        return {"entries": size, "maxsize": self.maxsize, "tools": tools}
+
+
+_cache = ToolResultCache(
+    maxsize=settings.TOOL_CACHE_MAX_ENTRIES,
+    ttl=settings.TOOL_CACHE_TTL_SECONDS,
+    use_redis=settings.TOOL_CACHE_USE_REDIS,
+)
+
+
+def _canonical_arguments(signature: inspect.Signature, args: tuple, kwargs: dict) -> dict:
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = {}
+    for name, value in bound.arguments.items():
+        annotation = signature.parameters[name].annotation
+        if annotation is RunnableConfig:
+            continue
+        if isinstance(value, str):
+            value = " ".join(value.split())
+        arguments[name] = value
+    return arguments
+
+
+def cached_tool(*tags: str, ttl: Optional[int] = None):
+    """Decorator cache ket qua ham tool theo tham so, gan voi cac tag (ten bang) ``tags``."""
+
+    def decorator(fn: Callable) -> Callable:
+        signature = inspect.signature(fn)
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not settings.TOOL_CACHE_ENABLED:
+                return fn(*args, **kwargs)
+            key = _cache.make_key(name, _canonical_arguments(signature, args, kwargs), tags)
+            hit, value = _cache.get(name, key)
+            if hit:
+                return value
+            value = fn(*args, **kwargs)
+            _cache.set(name, key, value, ttl)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def invalidate_tool_cache(*tags: str):
+    """Lam moi cache cua moi tool doc cac bang ``tags``; goi sau khi tool ghi commit."""
+    _cache.invalidate_tags(*tags)
+
+
+def clear_tool_cache():
+    _cache.clear()
+
+
+def tool_cache_metrics() -> dict:
+    return _cache.metrics()
@@ -0,0 +1,25 @@
+import re
+import unicodedata
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_PUNCT_RE = re.compile(r"[^\w\s]", re.UNICODE)
+
+
+def remove_diacritics(text: str) -> str:
+    """Bo dau tieng Viet: 'Đà Nẵng' -> 'Da Nang'.
+
+    NFD tach dau thanh ky tu ket hop; rieng 'đ/Đ' khong tach duoc nen thay tay.
+    """
+    text = text.replace("đ", "d").replace("Đ", "D")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+
+
+def normalize_text(text: str, fold_diacritics: bool = True, strip_punctuation: bool = False) -> str:
+    """Chuan hoa chuoi de so sanh/lam key: casefold, gop khoang trang, (tuy chon) bo dau."""
+    text = unicodedata.normalize("NFC", text).casefold()
+    if fold_diacritics:
+        text = remove_diacritics(text)
+    if strip_punctuation:
+        text = _PUNCT_RE.sub(" ", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
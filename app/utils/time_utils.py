@@ -0,0 +1,68 @@
+"""Chuyen doi thoi gian <-> epoch UTC (giay) cho cac cot *_epoch cua bang flights.
+
+Thoi gian khong co mui gio duoc hieu theo gio dia phuong ``settings.LOCAL_TIMEZONE``
+(mac dinh Asia/Ho_Chi_Minh), giong cach tool doi ve truoc day xu ly. Mui gio nay
+phai co offset co dinh (khong DST) vi trigger tinh epoch dung mot offset duy nhat.
+"""
+from datetime import date, datetime, time, timedelta
+import pytz
+from app.config import settings
+
+
+def local_timezone():
+    return pytz.timezone(settings.LOCAL_TIMEZONE)
+
+
+def _format_offset(offset: timedelta) -> str:
+    minutes = int(offset.total_seconds() // 60)
+    sign = "+" if minutes >= 0 else "-"
+    return f"{sign}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+
+
+def local_utc_offset(years: int = 20) -> str:
+    """Offset co dinh cua mui gio dia phuong dang '+HH:MM' (dung trong SQL).
+
+    Trigger SQLite chi ap duoc mot offset co dinh, nen mui gio co DST (hoac doi
+    offset trong ``years`` nam quanh hien tai) bi tu choi bang RuntimeError.
+    """
+    tz = local_timezone()
+    current = datetime.now(tz).year
+    offsets = {
+        tz.localize(datetime(year, month, 1)).utcoffset() or timedelta(0)
+        for year in range(current - years, current + years + 1)
+        for month in range(1, 13)
+    }
+    if len(offsets) > 1:
+        raise RuntimeError(
+            f"LOCAL_TIMEZONE '{settings.LOCAL_TIMEZONE}' khong co offset co dinh "
+            f"({', '.join(sorted(_format_offset(o) for o in offsets))}); cot *_epoch can mui gio khong co DST."
+        )
+    return _format_offset(offsets.pop())
+
+
+def to_datetime(value: date | datetime | str) -> datetime:
+    """datetime co mui gio; date la 00:00 gio dia phuong."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time.min)
+    if value.tzinfo is None:
+        value = local_timezone().localize(value)
+    return value
+
+
+def to_epoch(value: date | datetime | str) -> int:
+    return int(to_datetime(value).timestamp())
+
+
+def end_epoch(value: date | datetime | str) -> int:
+    """Moc ket thuc (khong tinh) cua khoang: ngay -> het ngay do, datetime -> ngay sau giay do."""
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return to_epoch(value + timedelta(days=1))
+    if isinstance(value, str) and len(value) == 10:
+        return to_epoch(date.fromisoformat(value) + timedelta(days=1))
+    return to_epoch(value) + 1
+
+
+def from_epoch(epoch: int) -> datetime:
+    return datetime.fromtimestamp(epoch, local_timezone())
@@ -18,6 +18,27 @@ from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.db.milvus import connect_milvus
+from app.services.retrieval_service import close_retrieval_service, init_retrieval_service
+from app.llms.embedding_models import close_embedding_model
+from app.services.embedding_cache import embedding_cache_metrics
+from app.services.semantic_cache import semantic_cache_metrics
+from app.services.ingestion_jobs import start_ingestion_jobs, stop_ingestion_jobs
+from app.db.sqlite import close_sqlite_pool, get_sqlite_pool
+from app.db.sqlite_async import shutdown_db_executor
+from app.db.sqlite_writer import get_sqlite_writer, stop_sqlite_writer
+from app.db.migrations import migrate_database
+from app.db.catalog_snapshot import (
+    CATALOG_TABLES,
+    catalog_snapshot_metrics,
+    on_catalog_refresh,
+    start_catalog_snapshot,
+    stop_catalog_snapshot,
+)
+from app.services.airport_resolver import reset_airport_resolver
+from app.services.route_search import reset_route_graph
+from app.services.tool_cache import invalidate_tool_cache, tool_cache_metrics
+from app.agents.result_shaping import result_shaping_metrics
+from app.agents.tool_node import shutdown_tool_executors
 from app.agents.graph_builder import build_initialized_graph
 from langgraph.checkpoint.redis import RedisSaver
 from langgraph.store.redis import RedisStore
@@ -30,6 +51,26 @@ async def lifespan(app: FastAPI):
         # Connect to Milvus
         connect_milvus()
         logger.info("Connect to milvus...done!!")
+        # Retrieval service: load collection + warm embedding client once
+        init_retrieval_service()
+        logger.info("Init retrieval service...done!!")
+        # Migrate SQLite schema (indexes, ...)
+        if settings.SQLITE_RUN_MIGRATIONS:
+            migrate_database()
+            logger.info("Migrate SQLite...done!!!")
+        # Catalog snapshot in memory for read-only tools
+        if settings.CATALOG_SNAPSHOT_ENABLED:
+            on_catalog_refresh(lambda: invalidate_tool_cache(*CATALOG_TABLES))
+            on_catalog_refresh(reset_airport_resolver)
+            on_catalog_refresh(reset_route_graph)
+            start_catalog_snapshot()
+            logger.info("Load catalog snapshot...done!!!")
+        # Single writer for booking writes
+        get_sqlite_writer()
+        logger.info("Start SQLite writer...done!!!")
+        # Background ingestion jobs (resume unfinished uploads)
+        start_ingestion_jobs()
+        logger.info("Start ingestion jobs...done!!!")
         # Setup redis
         checkpointer, redis_store = get_redis_saver()
         logger.info("Create saver for agent...done!!!")
@@ -45,6 +86,22 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    # Shutdown actions
+    logger.info(f"SQLite pool metrics: {get_sqlite_pool().metrics()}")
+    logger.info(f"Tool cache metrics: {tool_cache_metrics()}")
+    logger.info(f"Tool result shaping metrics: {result_shaping_metrics()}")
+    logger.info(f"Catalog snapshot metrics: {catalog_snapshot_metrics()}")
+    logger.info(f"Embedding cache metrics: {embedding_cache_metrics()}")
+    logger.info(f"Semantic cache metrics: {semantic_cache_metrics()}")
+    shutdown_tool_executors()
+    stop_ingestion_jobs()
+    close_retrieval_service()
+    close_embedding_model()
+    stop_sqlite_writer()
+    stop_catalog_snapshot()
+    shutdown_db_executor()
+    close_sqlite_pool()
+
 app = FastAPI(
     title="Airline Chatbot API",
     description="API for Airline Chatbot",